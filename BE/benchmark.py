@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the backend.
+
+Runs N game generations (through the job queue and run_generation), GET /games,
+GET /progress and game file serving in-process against a local fake Gemini
+server that returns deterministic JSON and synthetic PNGs after a configurable
+delay. No network access or API key is needed. Reports throughput, p50/p99
+latency and peak memory.
+
+    python benchmark.py --games 8 --concurrency 4 --image-latency 0.3
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import base64
+import shutil
+import tempfile
+import threading
+import contextlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_TYPES = ("characters", "backgrounds", "effects", "ui")
+
+
+class FakeGemini:
+    """
+    Minimal stand-in for the Gemini generateContent API. Blueprint and production plan
+    requests get fenced JSON derived from a hash of the prompt; image requests get a
+    PNG drawn from the same hash. error_rate answers that share of requests with 503.
+    """
+
+    def __init__(self, text_latency=0.5, image_latency=1.0, jitter=0.2, image_size=512,
+                 assets=8, error_rate=0.0, seed=1):
+        self.text_latency = text_latency
+        self.image_latency = image_latency
+        self.jitter = jitter
+        self.image_size = image_size
+        self.assets = assets
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {"blueprint": 0, "plan": 0, "image": 0, "errors": 0}
+        self._server = None
+
+    def _delay(self, base):
+        with self._lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, base * factor))
+
+    def _fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    @staticmethod
+    def _digest(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def blueprint(self, text):
+        digest = self._digest(text)
+        return {
+            "meta": {"title": f"Bench {digest[:10]}", "description": f"Benchmark game {digest[:10]}"},
+            "gameplay": {"genre": ["Action", "Puzzle", "Platformer"][int(digest[10], 16) % 3]},
+            "characters": [{"name": f"hero_{digest[:4]}"}, {"name": f"enemy_{digest[4:8]}"}],
+        }
+
+    def production_plan(self, text):
+        digest = self._digest(text)
+        asset_prompts = {}
+        for i in range(self.assets):
+            asset_type = ASSET_TYPES[i % len(ASSET_TYPES)]
+            asset_prompts.setdefault(asset_type, {})[f"{asset_type}_{i}"] = f"{asset_type} asset {i} for {digest[:12]}"
+        modules = {
+            "loadAssets": "function loadAssets(scene) {\n" + "".join(
+                f"  scene.load.image('{name}', 'assets/{asset_type}/{name}.png');\n"
+                for asset_type, prompts in asset_prompts.items() for name in prompts) + "}",
+            "createAnimations": "function createAnimations(scene) {}",
+            "createScene": "function createScene(scene) {}",
+            "setupControls": "function setupControls(scene) {}",
+            "runCombatLoop": "function runCombatLoop(scene, delta) {}",
+        }
+        return {"asset_prompts": asset_prompts, "phaser_modules": modules}
+
+    @lru_cache(maxsize=256)
+    def image_png(self, prompt):
+        from PIL import Image, ImageDraw
+        rng = random.Random(self._digest(prompt))
+        size = self.image_size
+        image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x0, y0 = rng.randrange(size), rng.randrange(size)
+            x1, y1 = min(size, x0 + rng.randrange(16, size // 2)), min(size, y0 + rng.randrange(16, size // 2))
+            color = tuple(rng.randrange(256) for _ in range(3)) + (255,)
+            (draw.ellipse if rng.random() < 0.5 else draw.rectangle)([x0, y0, x1, y1], fill=color)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def handle(self, path, body):
+        """(status, response dict) for one generateContent request"""
+        text = "".join(part.get("text", "") for content in body.get("contents", [])
+                       for part in content.get("parts", []))
+        if "image-generation" in path:
+            kind, latency = "image", self.image_latency
+        elif "Game Tech Architect" in text:
+            kind, latency = "plan", self.text_latency
+        else:
+            kind, latency = "blueprint", self.text_latency
+        with self._lock:
+            self.requests[kind] += 1
+        self._delay(latency)
+        if self._fail():
+            with self._lock:
+                self.requests["errors"] += 1
+            return 503, {"error": {"code": 503, "message": "fake overload", "status": "UNAVAILABLE"}}
+        if kind == "image":
+            data = base64.b64encode(self.image_png(text)).decode("ascii")
+            part = {"inlineData": {"mimeType": "image/png", "data": data}}
+        else:
+            payload = self.blueprint(text) if kind == "blueprint" else self.production_plan(text)
+            part = {"text": f"```json\n{json.dumps(payload, indent=2)}\n```"}
+        return 200, {"candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}]}
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                status, response = fake.handle(self.path, body)
+                data = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values (0 < q <= 100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(q / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    """Latencies per operation plus the wall time of the phase that produced them"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.wall = {}
+        self.statuses = {}
+
+    def add(self, op, seconds, status=200):
+        self.latencies.setdefault(op, []).append(seconds)
+        counts = self.statuses.setdefault(op, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    @contextlib.contextmanager
+    def phase(self, op):
+        start = time.perf_counter()
+        yield
+        self.wall[op] = self.wall.get(op, 0.0) + time.perf_counter() - start
+
+    def summary(self):
+        result = {}
+        for op, values in self.latencies.items():
+            wall = self.wall.get(op)
+            result[op] = {
+                "count": len(values),
+                "throughput_per_s": round(len(values) / wall, 2) if wall else None,
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2),
+                "statuses": {str(k): v for k, v in sorted(self.statuses[op].items(), key=lambda kv: str(kv[0]))},
+            }
+        return result
+
+
+async def sample_rss(peak, interval=0.05):
+    """Track peak resident memory while the benchmark runs"""
+    import psutil
+    process = psutil.Process()
+    while True:
+        peak["rss"] = max(peak["rss"], process.memory_info().rss)
+        await asyncio.sleep(interval)
+
+
+async def run_requests(client, recorder, op, urls, concurrency, headers=None):
+    """GET every url with at most concurrency requests in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(url):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(url, headers=headers or {})
+            await response.aread()
+            recorder.add(op, time.perf_counter() - start, response.status_code)
+            return response
+
+    with recorder.phase(op):
+        return await asyncio.gather(*(one(url) for url in urls))
+
+
+async def benchmark(args):
+    import httpx
+    import main
+    from services.progress import is_final
+
+    # Game files are served from the benchmark's working directory
+    main.GAMES_BASE = os.path.abspath("games")
+    recorder = Recorder()
+    peak = {"rss": 0}
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with main.lifespan(main.app):
+        sampler = asyncio.create_task(sample_rss(peak))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # 1. N generations through POST /generate, each polled via GET /progress
+            async def generate(i):
+                start = time.perf_counter()
+                response = await client.post("/generate", json={"prompt": f"Benchmark game {i}"})
+                request_id = response.json()["request_id"]
+                while True:
+                    poll_start = time.perf_counter()
+                    progress = (await client.get(f"/progress/{request_id}")).json()
+                    recorder.add("progress_poll", time.perf_counter() - poll_start)
+                    if is_final(progress):
+                        break
+                    await asyncio.sleep(args.poll_interval)
+                recorder.add("generation", time.perf_counter() - start,
+                             "ok" if progress.get("status") == "completed" else "error")
+                return request_id
+
+            with recorder.phase("generation"):
+                request_ids = await asyncio.gather(*(generate(i) for i in range(args.games)))
+            recorder.wall["progress_poll"] = recorder.wall["generation"]
+
+            # 2. Catalog listing
+            list_urls = ["/games", "/games?limit=10", "/games?fields=id,title,config"] * (args.requests // 3 + 1)
+            await run_requests(client, recorder, "list_games", list_urls[:args.requests], args.http_concurrency)
+
+            # 3. Progress lookups after the fact (hits and misses)
+            progress_urls = [f"/progress/{request_ids[i % len(request_ids)]}" if i % 4 else f"/progress/missing_{i}"
+                             for i in range(args.requests)]
+            await run_requests(client, recorder, "progress", progress_urls, args.http_concurrency)
+
+            # 4. Game file serving: full responses, then conditional requests answered with 304
+            game_urls = []
+            for game_id in sorted(os.listdir("games")):
+                phaser_dir = os.path.join("games", game_id, "phaser")
+                for root, _, names in os.walk(phaser_dir):
+                    for name in names:
+                        rel = os.path.relpath(os.path.join(root, name), phaser_dir).replace(os.sep, "/")
+                        game_urls.append(f"/games/{game_id}/phaser/{rel}")
+            if game_urls:
+                urls = [game_urls[i % len(game_urls)] for i in range(args.requests)]
+                responses = await run_requests(client, recorder, "serve_file", urls, args.http_concurrency,
+                                               headers={"Accept-Encoding": "gzip, br"})
+                etag = responses[0].headers.get("etag")
+                await run_requests(client, recorder, "serve_file_304", [urls[0]] * args.requests,
+                                   args.http_concurrency, headers={"If-None-Match": etag or "", "Accept-Encoding": "gzip, br"})
+            gemini_calls = main.call_metrics.stats()
+        sampler.cancel()
+
+    return recorder, peak, gemini_calls
+
+
+def max_rss_mb():
+    """Process peak RSS as reported by the OS (ru_maxrss, or the peak working set on Windows)"""
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        return round(getattr(psutil.Process().memory_info(), "peak_wset", 0) / 2 ** 20, 1)
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def print_report(report):
+    print(f"\nGenerations: {report['config']['games']} games, {report['config']['concurrency']} at a time, "
+          f"{report['config']['assets']} assets each")
+    print(f"{'operation':<16}{'count':>8}{'per s':>10}{'p50 ms':>11}{'p99 ms':>11}{'max ms':>11}  statuses")
+    for op, row in report["operations"].items():
+        print(f"{op:<16}{row['count']:>8}{row['throughput_per_s'] or '-':>10}{row['p50_ms']:>11}"
+              f"{row['p99_ms']:>11}{row['max_ms']:>11}  {row['statuses']}")
+    memory = report["memory"]
+    print(f"\nPeak RSS: {memory['peak_rss_mb']} MB (sampled), {memory['max_rss_mb']} MB (OS peak)"
+          + (f", Python heap peak: {memory['tracemalloc_peak_mb']} MB" if "tracemalloc_peak_mb" in memory else ""))
+    print(f"Fake Gemini requests: {report['fake_gemini']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=4, help="number of games to generate")
+    parser.add_argument("--concurrency", type=int, default=2, help="generations running at the same time (JOB_WORKERS)")
+    parser.add_argument("--assets", type=int, default=8, help="asset images per game")
+    parser.add_argument("--text-latency", type=float, default=0.5, help="fake blueprint/plan latency in seconds")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="fake image latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of the latency")
+    parser.add_argument("--image-size", type=int, default=512, help="synthetic image width and height")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake requests answered with 503")
+    parser.add_argument("--requests", type=int, default=500, help="requests per HTTP phase")
+    parser.add_argument("--http-concurrency", type=int, default=16, help="in-flight requests per HTTP phase")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="seconds between progress polls")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--workdir", help="run in this directory instead of a temporary one")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary working directory")
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="show application output")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    fake = FakeGemini(args.text_latency, args.image_latency, args.jitter, args.image_size,
+                      args.assets, args.error_rate)
+    base_url = fake.start()
+
+    # Configure the app before it is imported; explicit environment settings win
+    os.environ["GEMINI_BASE_URL"] = base_url
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["JOB_WORKERS"] = str(args.concurrency)
+    os.environ.setdefault("GEMINI_TEXT_RPM", "0")
+    os.environ.setdefault("GEMINI_IMAGE_RPM", "0")
+    os.environ.setdefault("GEMINI_BACKOFF_BASE", "0.05")
+    os.environ.setdefault("LOG_LEVEL", "INFO" if args.verbose else "WARNING")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="gamebuilder_bench_")
+    os.makedirs(os.path.join(workdir, "games"), exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, BE_DIR)
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    try:
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                recorder, peak, gemini_calls = asyncio.run(benchmark(args))
+        memory = {
+            "peak_rss_mb": round(peak["rss"] / 2 ** 20, 1),
+            "max_rss_mb": max_rss_mb(),
+        }
+        if args.tracemalloc:
+            memory["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        report = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("json_path", "verbose", "keep")},
+            "operations": recorder.summary(),
+            "memory": memory,
+            "gemini_calls": gemini_calls,
+            "fake_gemini": dict(fake.requests),
+        }
+    finally:
+        os.chdir(cwd)
+        fake.stop()
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main_cli()
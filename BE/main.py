@@ -1,23 +1,21 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from services.gemini import generate_game_blueprint
 from services.storage import save_game_blueprint
 from fastapi import Path
 import shutil
 import os
 import json
-from services.storage import save_game_blueprint, save_production_plan
-from services.gemini import generate_game_blueprint, generate_production_plan
+from services.storage import save_game_blueprint, save_production_plan, publish_assets, adopt_published_assets
+from services.gemini import generate_game_blueprint_async, generate_production_plan_async
 import time
-from services.gemini import generate_image
+from services.gemini import generate_image_async
 import os
 import shutil
-from fastapi.staticfiles import StaticFiles
 from fastapi import APIRouter, HTTPException, Request
 import os
 from PIL import Image
-from services.gemini import generate_asset_image
+from services.gemini import generate_asset_image_async, call_metrics, retry_budget, text_limiter, image_limiter
 from fastapi.responses import StreamingResponse
 import asyncio
 import subprocess
@@ -27,17 +25,55 @@ import signal
 import threading
 import subprocess
 import psutil
+import uuid
+from contextlib import asynccontextmanager
+from services.jobs import JobQueue, JobWorkerPool, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from services.cache import response_cache
+from services import blobs
+from services.optimize import optimize_game_assets
+from services.resize import sheet_grids, normalize_asset
+from services.atlas import build_atlases
+from services.frames import build_frame_manifest
+from services.phash import (phash_index, duplicate_report, reuse_duplicates, find_prompt_match, near_matches,
+                            PHASH_MAX_DISTANCE)
+from services.progress import progress_broadcaster, format_sse, is_final, ProgressStore
+from services.catalog import GameCatalog, CATALOG_FIELDS, DEFAULT_FIELDS
+from fastapi import Response
+from services.static import serve_file
+from services.checkpoint import Checkpoint, prompt_hash
+from services.logs import setup_logging, get_logger
+from services.metrics import (registry as metrics_registry, stage_seconds, asset_seconds,
+                              fallbacks_total, placeholders_total)
 
-app = FastAPI()
+# Persistent generation queue; workers are started with the app
+job_queue = JobQueue()
+job_pool = None
+# Index behind GET /games, kept up to date on generate/delete
+game_catalog = GameCatalog()
 
-# Serve each game's phaser folder as static files
+logger = get_logger("api")
+# High-frequency progress logs are sampled (see services.logs)
+progress_log = get_logger("progress")
+
+@asynccontextmanager
+async def lifespan(app):
+    global job_pool
+    log_listener = setup_logging()
+    await asyncio.to_thread(game_catalog.load)
+    job_pool = JobWorkerPool(job_queue, {"generate": run_generation_job, "resume": run_resume_job,
+                                          "regenerate": run_regenerate_job, "modify_asset": run_modify_job})
+    job_pool.start()
+    sweeper = asyncio.create_task(progress_data.sweep_forever())
+    yield
+    sweeper.cancel()
+    await job_pool.stop()
+    log_listener.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Games are served by serve_game_file, which resolves the folder per request,
+# so newly generated games are playable without a restart
 GAMES_BASE = os.path.join(os.path.dirname(__file__), 'games')
-if os.path.exists(GAMES_BASE):
-    for game_folder in os.listdir(GAMES_BASE):
-        phaser_path = os.path.join(GAMES_BASE, game_folder, 'phaser')
-        if os.path.isdir(phaser_path):
-            mount_path = f'/games/{game_folder}/phaser'
-            app.mount(mount_path, StaticFiles(directory=phaser_path), name=f'{game_folder}_phaser')
 
 # Allow frontend access
 app.add_middleware(
@@ -46,18 +82,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
 class PromptRequest(BaseModel):
     prompt: str
+    # False asks Gemini again instead of reusing a cached blueprint and plan for the same prompt
+    use_cache: bool = True
 
-# Global variable to store progress for each request
-progress_data = {}
+# Maximum number of asset images generated at the same time per game
+ASSET_CONCURRENCY = max(1, int(os.getenv("ASSET_CONCURRENCY", "4")))
+# Reuse an image another game already generated from the identical prompt instead of calling Gemini
+ASSET_REUSE_PROMPTS = os.getenv("ASSET_REUSE_PROMPTS", "0") == "1"
+
+# Map for folder naming
+ASSET_TYPE_FOLDERS = {
+    "characters": "characters",
+    "backgrounds": "backgrounds",
+    "effects": "effects",
+    "audio": "audio",
+    "ui": "ui",
+    "ui_image": "ui",  # Map both to ui folder
+    # fallback for any new types
+}
 
-def send_progress_update(request_id, step, status, message, progress_percent):
+# Global variable to store progress for each request (bounded, expires by age)
+progress_data = ProgressStore()
+# Seconds between keepalive comments on idle progress streams
+SSE_KEEPALIVE_SECONDS = 15
+
+def send_progress_update(request_id, step, status, message, progress_percent, details=None):
     """Send progress update to the progress_data store"""
-    print(f"[DEBUG] Sending progress update: {request_id} - {step} - {status} - {progress_percent}%")
-    
     progress_data[request_id] = {
         "step": step,
         "status": status,  # "running", "completed", "error"
@@ -65,55 +120,144 @@ def send_progress_update(request_id, step, status, message, progress_percent):
         "progress_percent": progress_percent,
         "timestamp": time.time()
     }
+    if details:
+        # Optional sub-progress, e.g. {"asset": ..., "completed": 3, "total": 12}
+        progress_data[request_id]["details"] = details
+    progress_broadcaster.publish(request_id, progress_data[request_id])
     
-    print(f"[DEBUG] Progress data updated: {progress_data[request_id]}")
+    progress_log.debug("Progress %s: %s %s %s%% - %s", request_id, step, status, progress_percent, message)
     
-    # Clean up old progress data (older than 1 hour)
-    current_time = time.time()
-    expired_keys = [key for key, value in progress_data.items() 
-                   if current_time - value.get('timestamp', 0) > 3600]
-    for key in expired_keys:
-        del progress_data[key]
+    # Clean up old progress data (older than PROGRESS_TTL_SECONDS), oldest first
+    progress_data.expire()
 
 @app.get("/progress/{request_id}")
 async def get_progress(request_id: str):
     """Get progress for a specific request"""
-    print(f"[DEBUG] Progress request for: {request_id}")
-    print(f"[DEBUG] Available progress data: {list(progress_data.keys())}")
-    
-    if request_id in progress_data:
-        progress = progress_data[request_id]
-        print(f"[DEBUG] Found progress: {progress}")
+    progress = progress_data.get(request_id)
+    if progress is not None:
+        progress_log.debug("Progress request for %s: %s", request_id, progress["step"])
         return progress
-    else:
-        print(f"[DEBUG] Progress not found for: {request_id}")
-        return {"status": "not_found"}
+    job = job_queue.get(request_id)
+    if job is not None:
+        # e.g. still queued, or the process restarted since the last update
+        return job_progress(job)
+    progress_log.debug("Progress not found for %s", request_id)
+    return {"status": "not_found"}
 
-@app.get("/games")
-def list_games():
-    base_path = "games"
-    if not os.path.exists(base_path):
-        return []
+@app.get("/progress/{request_id}/stream")
+async def stream_progress(request_id: str, request: Request):
+    """Server-sent events: pushes every progress update for request_id until it completes or fails"""
+    queue = progress_broadcaster.subscribe(request_id)
+
+    async def events():
+        try:
+            # Start with the current state so late subscribers don't wait for the next update
+            current = progress_data.get(request_id)
+            if current is None:
+                job = job_queue.get(request_id)
+                current = job_progress(job) if job is not None else None
+            if current is not None:
+                yield format_sse(current)
+                if is_final(current):
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+                if is_final(event):
+                    return
+        finally:
+            progress_broadcaster.unsubscribe(request_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def job_progress(job):
+    """Progress-shaped view of a job, used when no live progress update exists"""
+    status = job["status"]
+    if status == "completed":
+        return {"step": "complete", "status": "completed", "message": "Game generation completed successfully! 🎮",
+                "progress_percent": 100, "timestamp": job["finished_at"]}
+    if status in ("failed", "cancelled"):
+        message = f"Error: {job['error']}" if status == "failed" else "Job cancelled"
+        return {"step": "error", "status": "error", "message": message,
+                "progress_percent": 0, "timestamp": job["finished_at"]}
+    message = "Waiting in queue..." if status == "queued" else "Generating game..."
+    return {"step": status, "status": "running", "message": message,
+            "progress_percent": 0, "timestamp": job["started_at"] or job["created_at"]}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.stats()
+
+# State tracked elsewhere, read when /metrics is scraped
+metrics_registry.callback(
+    "generation_jobs", "Jobs in the generation queue by status",
+    lambda: [({"status": status}, count) for status, count in job_queue.counts().items()], ("status",))
+metrics_registry.callback(
+    "progress_entries", "Progress entries held in memory", lambda: [({}, len(progress_data))])
+metrics_registry.callback(
+    "progress_stream_subscribers", "Open progress event streams",
+    lambda: [({}, progress_broadcaster.subscriber_count())])
+metrics_registry.callback(
+    "gemini_response_cache_lookups_total", "Gemini response cache lookups by result",
+    lambda: [({"result": "hit"}, response_cache.stats()["hits"]),
+             ({"result": "miss"}, response_cache.stats()["misses"])], ("result",), kind="counter")
+metrics_registry.callback(
+    "gemini_rate_limit_tokens", "Tokens currently available per model",
+    lambda: [({"model": l.name}, l.stats()["tokens"]) for l in (text_limiter, image_limiter)], ("model",))
+metrics_registry.callback(
+    "gemini_rate_limit_waiting", "Calls waiting for a rate-limit token per model",
+    lambda: [({"model": l.name}, l.stats()["waiting"]) for l in (text_limiter, image_limiter)], ("model",))
 
-    games = []
-    for folder in os.listdir(base_path):
-        blueprint_path = os.path.join(base_path, folder, "blueprint.json")
-        if os.path.exists(blueprint_path):
-            with open(blueprint_path, "r", encoding="utf-8") as f:
-                blueprint = json.load(f)
-                games.append({
-                    "id": folder,
-                    "title": blueprint.get("meta", {}).get("title", folder),
-                    "genre": blueprint.get("gameplay", {}).get("genre", "Custom"),
-                    "description": blueprint.get("meta", {}).get("description", ""),
-                    "thumbnail": "/assets/placeholder.png",
-                    "config": blueprint
-                })
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics_registry.render(), media_type=metrics_registry.content_type)
+
+@app.get("/gemini/stats")
+def gemini_stats():
+    """Latency and retry counters per Gemini call type"""
+    return {
+        "calls": call_metrics.stats(),
+        "retry_budget": round(retry_budget.tokens, 2),
+        "rate_limits": {"text": text_limiter.stats(), "image": image_limiter.stats()},
+    }
+
+@app.get("/games")
+def list_games(response: Response, offset: int = 0, limit: int = None, genre: str = None, fields: str = None):
+    """
+    List games from the catalog index, all of them unless limit is given. fields is a
+    comma-separated projection (id,title,genre,description,thumbnail,config); config
+    is only loaded when asked for.
+    """
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in selected if f not in CATALOG_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        selected = DEFAULT_FIELDS
+    offset = max(0, offset)
+    if limit is not None:
+        limit = max(1, min(limit, 1000))
+    total, games = game_catalog.list(offset=offset, limit=limit, genre=genre, fields=selected)
+    response.headers["X-Total-Count"] = str(total)
     return games
 
 @app.post("/generate")
 async def generate(prompt_req: PromptRequest):
-    request_id = f"gen_{int(time.time() * 1000)}"
+    request_id = f"gen_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}"
+    
+    # Queue the generation; a job worker picks it up when a slot is free
+    job_queue.enqueue(request_id, "generate", {"prompt": prompt_req.prompt, "use_cache": prompt_req.use_cache},
+                      priority=PRIORITY_BULK)
+    send_progress_update(request_id, "queued", "running", "Waiting in queue...", 0)
     
     # Return the request ID immediately so frontend can start polling
     response_data = {
@@ -122,130 +266,268 @@ async def generate(prompt_req: PromptRequest):
         "message": "Game generation started"
     }
     
-    # Start the generation process in the background
-    asyncio.create_task(run_generation(request_id, prompt_req.prompt))
-    
     return response_data
 
-async def run_generation(request_id: str, prompt: str):
-    """Run the actual generation process"""
+@app.get("/jobs")
+def list_jobs(status: str = None, limit: int = 50):
+    return job_queue.list(status=status, limit=limit)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_pool.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    send_progress_update(job_id, "error", "error", "Job cancelled", 0)
+    return job_queue.get(job_id)
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_queue.retry(job_id):
+        raise HTTPException(status_code=409, detail="Only failed or cancelled jobs can be retried")
+    send_progress_update(job_id, "queued", "running", "Waiting in queue...", 0)
+    return job_queue.get(job_id)
+
+def active_game_job(game_id):
+    """The queued or running job working on game_id, or None"""
+    for status in ("queued", "running"):
+        for job in job_queue.list(status=status, limit=1000):
+            if (job["result"] or {}).get("folder") == os.path.join("games", game_id) \
+                    or job["payload"].get("game_id") == game_id:
+                return job
+    return None
+
+def enqueue_game_job(game_id, kind, id_prefix, priority, extra_payload=None):
+    """Queue a job that works on an existing game folder; one such job per game at a time"""
+    if not game_id or game_id in (".", "..") or "/" in game_id or "\\" in game_id \
+            or not os.path.isfile(os.path.join("games", game_id, "blueprint.json")):
+        raise HTTPException(status_code=404, detail="Game not found")
+    active = active_game_job(game_id)
+    if active:
+        raise HTTPException(status_code=409, detail=f"Game is already being generated by {active['id']}")
+    request_id = f"{id_prefix}_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}"
+    job_queue.enqueue(request_id, kind, dict(extra_payload or {}, game_id=game_id), priority=priority)
+    send_progress_update(request_id, "queued", "running", "Waiting in queue...", 0)
+    return request_id
+
+@app.post("/resume/{game_id}")
+async def resume_game(game_id: str):
+    """Finish an interrupted or partly failed game, redoing only what its checkpoint lacks"""
+    request_id = enqueue_game_job(game_id, "resume", "res", PRIORITY_BULK)
+    return {"status": "started", "request_id": request_id, "game_id": game_id, "message": "Game resume started"}
+
+@app.post("/regenerate/{game_id}")
+async def regenerate_game(game_id: str):
+    """
+    Apply edits to a game's production_plan.json: only assets whose prompt is new or
+    changed are generated, and only the Phaser modules whose code changed are rewritten.
+    """
+    request_id = enqueue_game_job(game_id, "regenerate", "regen", PRIORITY_INTERACTIVE)
+    return {"status": "started", "request_id": request_id, "game_id": game_id, "message": "Game regeneration started"}
+
+async def run_generation_job(job):
+    """Job handler for kind 'generate'. A retried job resumes in the folder it already created."""
+    folder = (job.get("result") or {}).get("folder")
+    if folder and not os.path.isfile(os.path.join(folder, "blueprint.json")):
+        folder = None
+    folder = await run_generation(job["id"], job["payload"]["prompt"], folder=folder,
+                                  use_cache=job["payload"].get("use_cache", True))
+    return {"folder": folder}
+
+async def run_resume_job(job):
+    """Job handler for kind 'resume': finish an existing game from its checkpoint"""
+    folder = os.path.join("games", job["payload"]["game_id"])
+    checkpoint = Checkpoint.load(folder)
+    prompt = checkpoint.prompt
+    if not prompt:
+        blueprint = game_catalog.load_blueprint(job["payload"]["game_id"])
+        prompt = blueprint.get("meta", {}).get("description", "")
+    folder = await run_generation(job["id"], prompt, folder=folder)
+    return {"folder": folder}
+
+async def run_regenerate_job(job):
+    """Job handler for kind 'regenerate'"""
+    folder = await run_regeneration(job["id"], os.path.join("games", job["payload"]["game_id"]))
+    return {"folder": folder}
+
+def complete_stage(checkpoint, stage, started, **info):
+    """Mark stage done in the checkpoint and record how long it took"""
+    seconds = time.perf_counter() - started
+    stage_seconds.observe(seconds, stage=stage)
+    checkpoint.complete(stage, seconds=round(seconds, 3), **info)
+
+def load_json_file(path):
+    """Parsed JSON at path, or None if it is missing or unreadable"""
     try:
-        print(f"[DEBUG] Starting generation with request_id: {request_id}")
-        
-        # print("restarting server")
-        # # Restart the server silently
-        # restart_server_silently(
-        #     main_file="main:app",
-        #     port=8000,
-        #     host="0.0.0.0",
-        #     reload=True
-        # )
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-        
-        # print("restarted server")
-        
+async def run_generation(request_id: str, prompt: str, folder: str = None, use_cache: bool = True):
+    """
+    Run the actual generation process. With folder set, the run resumes from that
+    game's checkpoint.json: finished stages and valid assets are reused, and once a
+    stage has to run again every stage after it runs too. A new game always gets its
+    own folder. use_cache=False skips cached blueprint and plan responses.
+    """
+    try:
+        logger.info(f"Starting generation with request_id: {request_id}, resume folder: {folder}")
+        checkpoint = Checkpoint.load(folder) if folder else None
+        run_started = time.perf_counter()
+        # Set once a stage is redone, so everything downstream is rebuilt from its output
+        dirty = False
         
         # Initialize progress
         send_progress_update(request_id, "initializing", "running", "Starting game generation...", 0)
-        print(f"[DEBUG] Sent initial progress update")
+        logger.debug("Sent initial progress update")
         
         # Step 1: Generate blueprint (Prompt 1)
-        send_progress_update(request_id, "blueprint", "running", "Generating game blueprint...", 10)
-        print(f"[DEBUG] Starting blueprint generation...")
-        
-        
-        
-        
-        try:
-            blueprint = generate_game_blueprint(prompt)
-            print(f"[DEBUG] Blueprint generated successfully")
-        except Exception as e:
-            print(f"[DEBUG] Blueprint generation failed: {e}")
-            # For now, create a dummy blueprint to continue
-            blueprint = {
-                "meta": {
-                    "title": prompt[:30] + "..." if len(prompt) > 30 else prompt,
-                    "description": prompt
-                },
-                "gameplay": {
-                    "genre": "Action"
+        blueprint = None
+        if checkpoint and not checkpoint.fell_back("blueprint"):
+            blueprint = load_json_file(os.path.join(folder, "blueprint.json"))
+        if blueprint is not None:
+            if not checkpoint.is_done("blueprint"):
+                # Games from before checkpoints existed
+                checkpoint.complete("blueprint", fallback=False)
+            send_progress_update(request_id, "blueprint", "completed", "Reusing saved game blueprint", 20)
+            logger.debug(f"Reusing blueprint from {folder}")
+        else:
+            dirty = True
+            started = time.perf_counter()
+            send_progress_update(request_id, "blueprint", "running", "Generating game blueprint...", 10)
+            logger.debug("Starting blueprint generation...")
+            blueprint_fallback = False
+            try:
+                blueprint = await generate_game_blueprint_async(prompt, use_cache=use_cache)
+                logger.debug("Blueprint generated successfully")
+            except Exception as e:
+                logger.warning(f"Blueprint generation failed: {e}")
+                blueprint_fallback = True
+                fallbacks_total.inc(stage="blueprint")
+                # For now, create a dummy blueprint to continue
+                blueprint = {
+                    "meta": {
+                        "title": prompt[:30] + "..." if len(prompt) > 30 else prompt,
+                        "description": prompt
+                    },
+                    "gameplay": {
+                        "genre": "Action"
+                    }
                 }
-            }
-        send_progress_update(request_id, "blueprint", "completed", "Game blueprint generated successfully!", 20)
-        print(f"[DEBUG] Sent blueprint completion update")
+            send_progress_update(request_id, "blueprint", "completed", "Game blueprint generated successfully!", 20)
+            logger.debug("Sent blueprint completion update")
 
-        # Step 2: Save blueprint to folder
-        send_progress_update(request_id, "save_blueprint", "running", "Saving blueprint to folder...", 25)
-        print(f"[DEBUG] Starting blueprint save...")
-        try:
-            folder, blueprint_path = save_game_blueprint(blueprint)
-            print(f"[DEBUG] Blueprint saved to: {folder}")
-        except Exception as e:
-            print(f"[DEBUG] Blueprint save failed: {e}")
-            # Create folder manually
-            folder_name = f"game_{int(time.time())}"
-            folder = os.path.join("games", folder_name)
-            os.makedirs(folder, exist_ok=True)
-            blueprint_path = os.path.join(folder, "blueprint.json")
-            with open(blueprint_path, "w", encoding="utf-8") as f:
-                json.dump(blueprint, f, indent=2)
-        send_progress_update(request_id, "save_blueprint", "completed", "Blueprint saved successfully!", 30)
-        print(f"[DEBUG] Sent blueprint save completion update")
+            # Step 2: Save blueprint to folder
+            send_progress_update(request_id, "save_blueprint", "running", "Saving blueprint to folder...", 25)
+            logger.debug("Starting blueprint save...")
+            if folder:
+                # Resuming keeps the game's folder even if the new title differs
+                with open(os.path.join(folder, "blueprint.json"), "w", encoding="utf-8") as f:
+                    json.dump(blueprint, f, indent=2)
+            else:
+                try:
+                    folder, blueprint_path = save_game_blueprint(blueprint)
+                    logger.debug(f"Blueprint saved to: {folder}")
+                except Exception as e:
+                    logger.warning(f"Blueprint save failed: {e}")
+                    # Create folder manually
+                    folder_name = f"game_{int(time.time())}"
+                    folder = os.path.join("games", folder_name)
+                    os.makedirs(folder, exist_ok=True)
+                    blueprint_path = os.path.join(folder, "blueprint.json")
+                    with open(blueprint_path, "w", encoding="utf-8") as f:
+                        json.dump(blueprint, f, indent=2)
+                # A retry of this job resumes here instead of starting over
+                job_queue.set_result(request_id, {"folder": folder})
+            checkpoint = checkpoint or Checkpoint.load(folder)
+            checkpoint.set_prompt(prompt)
+            checkpoint.invalidate("blueprint")
+            complete_stage(checkpoint, "blueprint", started, fallback=blueprint_fallback)
+            game_catalog.upsert(os.path.basename(folder))
+            send_progress_update(request_id, "save_blueprint", "completed", "Blueprint saved successfully!", 30)
+            logger.debug("Sent blueprint save completion update")
+
+        await asyncio.to_thread(adopt_legacy_asset_edits, folder, checkpoint)
 
         # Step 3: Generate production plan (Prompt 2)
-        send_progress_update(request_id, "production_plan", "running", "Generating production plan...", 35)
-        print(f"[DEBUG] Starting production plan generation...")
-        try:
-            plan = generate_production_plan(blueprint)
-            print(f"[DEBUG] Production plan generated successfully")
-        except Exception as e:
-            print(f"[DEBUG] Production plan generation failed: {e}")
-            # Create a dummy production plan
-            plan = {
-                "asset_prompts": {
-                    "characters": {
-                        "player": "A heroic character sprite",
-                        "enemy": "A villain character sprite"
-                    },
-                    "backgrounds": {
-                        "level1": "A simple background scene"
+        production_plan_path = os.path.join(folder, "production_plan.json")
+        plan = None
+        if not dirty and not checkpoint.fell_back("plan"):
+            plan = load_json_file(production_plan_path)
+        if plan is not None:
+            if not checkpoint.is_done("plan"):
+                checkpoint.complete("plan", fallback=False)
+            send_progress_update(request_id, "production_plan", "completed", "Reusing saved production plan", 60)
+            logger.debug(f"Reusing production plan from {folder}")
+        else:
+            dirty = True
+            started = time.perf_counter()
+            checkpoint.invalidate("plan")
+            send_progress_update(request_id, "production_plan", "running", "Generating production plan...", 35)
+            logger.debug("Starting production plan generation...")
+            plan_fallback = False
+            try:
+                plan = await generate_production_plan_async(blueprint, use_cache=use_cache)
+                logger.debug("Production plan generated successfully")
+            except Exception as e:
+                logger.warning(f"Production plan generation failed: {e}")
+                plan_fallback = True
+                fallbacks_total.inc(stage="plan")
+                # Create a dummy production plan
+                plan = {
+                    "asset_prompts": {
+                        "characters": {
+                            "player": "A heroic character sprite",
+                            "enemy": "A villain character sprite"
+                        },
+                        "backgrounds": {
+                            "level1": "A simple background scene"
+                        },
+                        "effects": {
+                            "explosion": "An explosion effect"
+                        }
                     },
-                    "effects": {
-                        "explosion": "An explosion effect"
+                    "phaser_modules": {
+                        "loadAssets": "function loadAssets(scene) { console.log('Loading assets...'); }",
+                        "createAnimations": "function createAnimations(scene) { console.log('Creating animations...'); }",
+                        "createScene": "function createScene(scene) { console.log('Creating scene...'); }",
+                        "setupControls": "function setupControls(scene) { console.log('Setting up controls...'); }",
+                        "runCombatLoop": "function runCombatLoop(scene, delta) { console.log('Running combat loop...'); }"
                     }
-                },
-                "phaser_modules": {
-                    "loadAssets": "function loadAssets(scene) { console.log('Loading assets...'); }",
-                    "createAnimations": "function createAnimations(scene) { console.log('Creating animations...'); }",
-                    "createScene": "function createScene(scene) { console.log('Creating scene...'); }",
-                    "setupControls": "function setupControls(scene) { console.log('Setting up controls...'); }",
-                    "runCombatLoop": "function runCombatLoop(scene, delta) { console.log('Running combat loop...'); }"
                 }
-            }
-        send_progress_update(request_id, "production_plan", "completed", "Production plan generated successfully!", 50)
-        print(f"[DEBUG] Sent production plan completion update")
+            send_progress_update(request_id, "production_plan", "completed", "Production plan generated successfully!", 50)
+            logger.debug("Sent production plan completion update")
 
-        # Step 4: Save production plan
-        send_progress_update(request_id, "save_plan", "running", "Saving production plan...", 55)
-        print(f"[DEBUG] Starting production plan save...")
-        try:
-            save_production_plan(folder, plan)
-            print(f"[DEBUG] Production plan saved successfully")
-        except Exception as e:
-            print(f"[DEBUG] Production plan save failed: {e}")
-            # Save manually
-            production_plan_path = os.path.join(folder, "production_plan.json")
-            with open(production_plan_path, "w", encoding="utf-8") as f:
-                json.dump(plan, f, indent=2)
-        send_progress_update(request_id, "save_plan", "completed", "Production plan saved successfully!", 60)
-        print(f"[DEBUG] Sent production plan save completion update")
+            # Step 4: Save production plan
+            send_progress_update(request_id, "save_plan", "running", "Saving production plan...", 55)
+            logger.debug("Starting production plan save...")
+            try:
+                save_production_plan(folder, plan)
+                logger.debug("Production plan saved successfully")
+            except Exception as e:
+                logger.warning(f"Production plan save failed: {e}")
+                # Save manually
+                with open(production_plan_path, "w", encoding="utf-8") as f:
+                    json.dump(plan, f, indent=2)
+            complete_stage(checkpoint, "plan", started, fallback=plan_fallback)
+            send_progress_update(request_id, "save_plan", "completed", "Production plan saved successfully!", 60)
+            logger.debug("Sent production plan save completion update")
 
         # Step 5: Generate images from asset prompts and save to assets folder
         send_progress_update(request_id, "assets", "running", "Generating game assets...", 65)
-        print(f"[DEBUG] Starting asset generation...")
+        logger.debug("Starting asset generation...")
         
         # Read the production plan
-        production_plan_path = os.path.join(folder, "production_plan.json")
         with open(production_plan_path, "r", encoding="utf-8") as f:
             plan = json.load(f)
         asset_prompts = plan.get("asset_prompts", {})
@@ -254,72 +536,186 @@ async def run_generation(request_id: str, prompt: str):
         assets_folder = os.path.join(folder, "assets")
         os.makedirs(assets_folder, exist_ok=True)
 
-        # Map for folder naming
-        type_to_folder = {
-            "characters": "characters",
-            "backgrounds": "backgrounds",
-            "effects": "effects",
-            "audio": "audio",
-            "ui": "ui",
-            "ui_image": "ui",  # Map both to ui folder
-            # fallback for any new types
-        }
-
-        # Generate actual images from AI prompts
-        for type_key, folder_key in type_to_folder.items():
-            prompts = asset_prompts.get(type_key, {})
-            if prompts:
-                subfolder = os.path.join(assets_folder, folder_key)
-                os.makedirs(subfolder, exist_ok=True)
-                for name, prompt in prompts.items():
-                    # Make safe filename
-                    base_name = name.lower().replace(" ", "_").replace("(", "").replace(")", "").replace("/", "_")
-                    img_path = os.path.join(subfolder, f"{base_name}.png")
-                    try:
-                        generate_image(prompt, img_path)
-                        print(f"[DEBUG] Generated image: {img_path}")
-                    except Exception as e:
-                        print(f"[DEBUG] Image generation failed for {img_path}: {e}")
-                        # Create placeholder
-                        try:
-                            from PIL import Image, ImageDraw
-                            img = Image.new('RGB', (256, 256), color='#cccccc')
-                            draw = ImageDraw.Draw(img)
-                            draw.rectangle([50, 50, 206, 206], fill='#999999')
-                            img.save(img_path)
-                        except:
-                            with open(img_path, 'w') as f:
-                                f.write("placeholder")
+        # Assets already generated from the same prompt are skipped
+        started = time.perf_counter()
+        asset_stats = await generate_assets(request_id, asset_prompts, assets_folder, checkpoint=checkpoint,
+                                            grids=sheet_grids(plan))
+        asset_stats.pop("changed")
+        if asset_stats["generated"] or asset_stats["placeholders"] or asset_stats["reused"]:
+            dirty = True
+        if dirty or not checkpoint.is_done("assets"):
+            dirty = True
+            checkpoint.invalidate("assets")
+            complete_stage(checkpoint, "assets", started, **asset_stats)
         
-        send_progress_update(request_id, "assets", "completed", "Game assets generated successfully!", 75)
-        print(f"[DEBUG] Sent assets completion update")
+        send_progress_update(request_id, "assets", "completed", "Game assets generated successfully!", 75,
+                             details=asset_stats)
+        logger.debug(f"Sent assets completion update: {asset_stats}")
+
+        # Step 5b: Optimize generated images (re-encode, quantize over-budget files, optional WebP)
+        if dirty or not checkpoint.is_done("optimize"):
+            dirty = True
+            started = time.perf_counter()
+            checkpoint.invalidate("optimize")
+            send_progress_update(request_id, "optimize_assets", "running", "Optimizing game assets...", 76)
+            report = await asyncio.to_thread(optimize_game_assets, assets_folder, folder)
+            saved_kb = report["saved_bytes"] // 1024
+            complete_stage(checkpoint, "optimize", started, saved_bytes=report["saved_bytes"])
+            send_progress_update(request_id, "optimize_assets", "completed", f"Assets optimized, saved {saved_kb} KB", 78,
+                                 details={"saved_bytes": report["saved_bytes"], "over_budget": report["over_budget"]})
+            logger.info(f"Asset optimization saved {saved_kb} KB, over budget: {report['over_budget']}")
 
         # Step 6: Create /phaser folder and generate Phaser game files
-        send_progress_update(request_id, "phaser_files", "running", "Generating Phaser game files...", 80)
-        print(f"[DEBUG] Starting Phaser file generation...")
-        
-        phaser_dir = os.path.join(folder, "phaser")
-        scenes_dir = os.path.join(phaser_dir, "scenes")
-        os.makedirs(scenes_dir, exist_ok=True)
+        if dirty or not checkpoint.is_done("phaser_files"):
+            started = time.perf_counter()
+            checkpoint.invalidate("phaser_files")
+            send_progress_update(request_id, "phaser_files", "running", "Generating Phaser game files...", 80)
+            logger.debug("Starting Phaser file generation...")
+            await build_phaser_files(folder, plan)
+            checkpoint.record_modules(plan.get("phaser_modules", {}))
+            complete_stage(checkpoint, "phaser_files", started)
+            send_progress_update(request_id, "phaser_files", "completed", "Phaser game files generated successfully!", 90)
+            logger.debug("Sent Phaser files completion update")
+        else:
+            send_progress_update(request_id, "phaser_files", "completed", "Phaser game files are up to date", 90)
+
+        # Final step: Complete
+        stage_seconds.observe(time.perf_counter() - run_started, stage="total")
+        send_progress_update(request_id, "complete", "completed", "Game generation completed successfully! 🎮", 100)
+        logger.info(f"Generation {request_id} completed in {folder}")
+        return folder
+
+    except asyncio.CancelledError:
+        send_progress_update(request_id, "error", "error", "Job cancelled", 0)
+        raise
+    except Exception as e:
+        logger.exception(f"Exception in run_generation {request_id}")
+        send_progress_update(request_id, "error", "error", f"Error: {str(e)}", 0)
+        # Let the job worker record the failure
+        raise
+
+async def run_regeneration(request_id: str, folder: str):
+    """
+    Bring a finished game in line with its (edited) production_plan.json. Prompts are
+    compared by hash with the ones recorded in checkpoint.json, so unchanged assets and
+    modules are left alone; assets dropped from the plan are deleted.
+    """
+    try:
+        logger.info(f"Starting regeneration of {folder} with request_id: {request_id}")
+        run_started = time.perf_counter()
+        send_progress_update(request_id, "initializing", "running", "Comparing production plan with existing assets...", 0)
+        checkpoint = Checkpoint.load(folder)
+        plan = load_json_file(os.path.join(folder, "production_plan.json"))
+        if not isinstance(plan, dict):
+            raise ValueError("production_plan.json is missing or invalid")
+        assets_folder = os.path.join(folder, "assets")
+        asset_prompts = plan.get("asset_prompts", {})
+
+        await asyncio.to_thread(adopt_legacy_asset_edits, folder, checkpoint)
+        removed = await asyncio.to_thread(remove_stale_assets, checkpoint, asset_prompts, assets_folder)
+        send_progress_update(request_id, "assets", "running", "Generating new and changed assets...", 10)
+        asset_stats = await generate_assets(request_id, asset_prompts, assets_folder,
+                                            start_percent=10, end_percent=70, checkpoint=checkpoint,
+                                            priority=PRIORITY_INTERACTIVE, grids=sheet_grids(plan))
+        changed = asset_stats.pop("changed")
+        asset_stats["removed"] = len(removed)
+        send_progress_update(request_id, "assets", "completed",
+                             f"{len(changed)} assets regenerated, {asset_stats['skipped']} unchanged", 70,
+                             details=asset_stats)
+
+        if changed:
+            send_progress_update(request_id, "optimize_assets", "running", "Optimizing changed assets...", 75)
+            report = await asyncio.to_thread(optimize_game_assets, assets_folder, folder, changed)
+            saved = sum(report["files"].get(rel, {}).get("saved_bytes", 0) for rel in changed)
+            send_progress_update(request_id, "optimize_assets", "completed",
+                                 f"Assets optimized, saved {saved // 1024} KB", 80)
+
+        phaser_modules = plan.get("phaser_modules", {})
+        modules = [m for m in checkpoint.changed_modules(phaser_modules) if m in PHASER_MODULES]
+        assets_changed = bool(changed or removed)
+        if modules or assets_changed or not checkpoint.is_done("phaser_files"):
+            send_progress_update(request_id, "phaser_files", "running", "Rebuilding affected Phaser files...", 85)
+            started = time.perf_counter()
+            if checkpoint.is_done("phaser_files"):
+                await build_phaser_files(folder, plan, modules=modules, assets_changed=assets_changed)
+            else:
+                await build_phaser_files(folder, plan)
+            checkpoint.record_modules(phaser_modules)
+            complete_stage(checkpoint, "phaser_files", started)
+            send_progress_update(request_id, "phaser_files", "completed", "Phaser game files updated", 95,
+                                 details={"modules": modules, "assets_changed": assets_changed})
+        logger.info(f"Regeneration of {folder}: {asset_stats}, modules rewritten: {modules}")
+
+        stage_seconds.observe(time.perf_counter() - run_started, stage="regenerate")
+        send_progress_update(request_id, "complete", "completed", "Game regeneration completed successfully! 🎮", 100)
+        return folder
+
+    except asyncio.CancelledError:
+        send_progress_update(request_id, "error", "error", "Job cancelled", 0)
+        raise
+    except Exception as e:
+        logger.exception(f"Exception in run_regeneration {request_id}")
+        send_progress_update(request_id, "error", "error", f"Error: {str(e)}", 0)
+        raise
+
+def remove_stale_assets(checkpoint, asset_prompts, assets_folder):
+    """Delete generated assets whose entry was removed from asset_prompts. Returns their paths."""
+    wanted = {task[3] for task in asset_tasks(asset_prompts, assets_folder)}
+    removed = [rel for rel in checkpoint.data["assets"] if rel not in wanted]
+    for rel in removed:
+        path = os.path.join(assets_folder, rel)
+        if os.path.exists(path):
+            os.remove(path)
+        checkpoint.forget_asset(rel)
+    return removed
+
+def adopt_legacy_asset_edits(folder, checkpoint):
+    """
+    Once per game, before anything publishes: copy images that were edited in
+    phaser/assets (games from before assets/ was the source of truth) back into assets/
+    and mark them edited. Returns the adopted paths.
+    """
+    if checkpoint.assets_adopted:
+        return []
+    adopted = adopt_published_assets(os.path.join(folder, "assets"), os.path.join(folder, "phaser", "assets"))
+    for rel in adopted:
+        checkpoint.mark_edited(rel)
+    checkpoint.mark_assets_adopted()
+    if adopted:
+        logger.info(f"Adopted {len(adopted)} asset(s) edited in {folder}/phaser/assets: {adopted}")
+    return adopted
+
+PHASER_MODULES = ["loadAssets", "createAnimations", "createScene", "setupControls", "runCombatLoop"]
 
-        # Copy assets folder (if not already present) BEFORE generating JS files
+async def build_phaser_files(folder, plan, modules=None, assets_changed=True):
+    """
+    Publish assets and write the Phaser game into folder/phaser. modules limits which
+    module JS files are rewritten; with modules given the template files are left as
+    they are. assets_changed=False skips publishing and atlas packing; the frame manifest
+    is still rebuilt when loadAssets is rewritten.
+    """
+    phaser_dir = os.path.join(folder, "phaser")
+    scenes_dir = os.path.join(phaser_dir, "scenes")
+    os.makedirs(scenes_dir, exist_ok=True)
+
+    # Each step is timed on its own (stage="phaser_*"), so /metrics shows where the stage goes
+    # Publish assets into phaser/assets BEFORE generating JS files (only changed files are touched)
+    if assets_changed:
         src_assets = os.path.join(folder, "assets")
         dst_assets = os.path.join(phaser_dir, "assets")
-        if os.path.exists(dst_assets):
-            shutil.rmtree(dst_assets)
-        shutil.copytree(src_assets, dst_assets)
-        
-        # Read phaser_modules from production_plan.json
-        phaser_modules = plan.get("phaser_modules", {})
-        def write_js(filename, code):
-            with open(os.path.join(phaser_dir, filename), "w", encoding="utf-8") as f:
-                f.write(code)
-        def write_scene_js(filename, code):
-            with open(os.path.join(scenes_dir, filename), "w", encoding="utf-8") as f:
-                f.write(code)
-
-        # Write module JS files from actual code in production_plan.json
-        for module_name in ["loadAssets", "createAnimations", "createScene", "setupControls", "runCombatLoop"]:
+        with stage_seconds.time(stage="phaser_publish"):
+            publish_stats = await asyncio.to_thread(publish_assets, src_assets, dst_assets)
+        logger.debug(f"Published assets: {publish_stats}")
+
+    # Read phaser_modules from production_plan.json
+    phaser_modules = plan.get("phaser_modules", {})
+    def write_js(filename, code):
+        with open(os.path.join(phaser_dir, filename), "w", encoding="utf-8") as f:
+            f.write(code)
+
+    # Write module JS files from actual code in production_plan.json
+    with stage_seconds.time(stage="phaser_modules"):
+        for module_name in PHASER_MODULES if modules is None else modules:
             code = phaser_modules.get(module_name, "")
             # If the code doesn't already attach itself to window, do it (for helpers)
             if module_name != "GameScene" and code and f"window.{module_name}" not in code:
@@ -327,45 +723,288 @@ async def run_generation(request_id: str, prompt: str):
                 code += f"\nwindow.{module_name} = {module_name};\n"
             write_js(f"{module_name}.js", code)
 
-        # Generate standard template files (main.js, index.html, GameScene.js)
-        generate_standard_template_files(phaser_dir, scenes_dir)
+    # Generate standard template files (main.js, index.html, GameScene.js)
+    if modules is None:
+        with stage_seconds.time(stage="phaser_templates"):
+            generate_standard_template_files(phaser_dir, scenes_dir)
 
-        # Copy assets folder (if not already present)
-        src_assets = os.path.join(folder, "assets")
-        dst_assets = os.path.join(phaser_dir, "assets")
-        if os.path.exists(dst_assets):
-            shutil.rmtree(dst_assets)
-        shutil.copytree(src_assets, dst_assets)
+    # Detect the real frame grid of every sheet for frameLoader.js. Declared frame sizes come
+    # from loadAssets, so a corrected frameWidth/frameHeight there is checked again too.
+    if assets_changed or "loadAssets" in (modules or ()):
+        with stage_seconds.time(stage="phaser_frames"):
+            frame_stats = await asyncio.to_thread(build_frame_manifest, phaser_dir, plan, folder)
+        logger.debug(f"Frame manifest built: {frame_stats}")
 
-        # Copy goku_portrait.png from games folder to phaser directory for favicon
-        goku_src = os.path.join("games", "goku_portrait.png")
-        goku_dst = os.path.join(phaser_dir, "goku_portrait.png")
-        if os.path.exists(goku_src):
-            shutil.copy2(goku_src, goku_dst)
+    if assets_changed:
+        # Pack character/effect/ui images into texture atlases served through atlasLoader.js
+        with stage_seconds.time(stage="phaser_atlas"):
+            atlas_stats = await asyncio.to_thread(build_atlases, phaser_dir)
+        logger.debug(f"Texture atlases built: {atlas_stats}")
 
-        send_progress_update(request_id, "phaser_files", "completed", "Phaser game files generated successfully!", 90)
-        print(f"[DEBUG] Sent Phaser files completion update")
+        # Replace duplicate asset files with hardlinks into the shared blob store
+        with stage_seconds.time(stage="phaser_blobs"):
+            await asyncio.to_thread(blobs.ingest_game_assets, folder)
 
-        # Final step: Complete
-        send_progress_update(request_id, "complete", "completed", "Game generation completed successfully! 🎮", 100)
-        print(f"[DEBUG] Sent final completion update")
+    # Copy goku_portrait.png from games folder to phaser directory for favicon
+    goku_src = os.path.join("games", "goku_portrait.png")
+    goku_dst = os.path.join(phaser_dir, "goku_portrait.png")
+    if os.path.exists(goku_src):
+        shutil.copy2(goku_src, goku_dst)
 
+def safe_asset_name(name):
+    """Turn an asset prompt name into a safe file base name"""
+    return name.lower().replace(" ", "_").replace("(", "").replace(")", "").replace("/", "_")
 
+def create_placeholder_image(img_path):
+    """
+    Write a grey placeholder image when asset generation fails and the asset has no
+    image yet. Written to a temp file and renamed, so an existing image is never lost.
+    Returns True if the placeholder was written.
+    """
+    tmp_path = f"{img_path}.part"
+    try:
+        from PIL import Image, ImageDraw
+        img = Image.new('RGB', (256, 256), color='#cccccc')
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([50, 50, 206, 206], fill='#999999')
+        img.save(tmp_path, format="PNG")
+    except:
+        with open(tmp_path, 'w') as f:
+            f.write("placeholder")
+    try:
+        if os.path.exists(img_path):
+            return False
+        os.replace(tmp_path, img_path)
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def asset_tasks(asset_prompts, assets_folder):
+    """
+    (name, prompt, image path, path relative to assets_folder, prompt hash) for every
+    asset prompt. Prompts that map to the same file (ui and ui_image share ui/, and
+    safe_asset_name can merge names) keep only the last one, as sequential writes did.
+    """
+    tasks = {}
+    for type_key, folder_key in ASSET_TYPE_FOLDERS.items():
+        prompts = asset_prompts.get(type_key, {})
+        if prompts:
+            for name, prompt in prompts.items():
+                file_name = f"{safe_asset_name(name)}.png"
+                img_path = os.path.join(assets_folder, folder_key, file_name)
+                tasks.pop(img_path, None)
+                tasks[img_path] = (name, prompt, img_path, f"{folder_key}/{file_name}", prompt_hash(prompt))
+    return list(tasks.values())
+
+async def generate_assets(request_id, asset_prompts, assets_folder, start_percent=65, end_percent=75, checkpoint=None,
+                          priority=PRIORITY_BULK, grids=None):
+    """
+    Generate every image in asset_prompts concurrently (at most ASSET_CONCURRENCY
+    at a time) and report per-asset progress between start_percent and end_percent.
+    Spritesheets listed in grids (see sheet_grids) are snapped onto their frame grid.
+    With ASSET_REUSE_PROMPTS, images other games generated from the identical prompt
+    are linked instead of generated. New images that nearly duplicate an existing one
+    are listed under "near_duplicates".
+    With a checkpoint, assets already generated from the same prompt are skipped and
+    each result is recorded as soon as it is written.
+    When a call fails, an existing image is kept ("kept") and a placeholder is only
+    written for assets that have no image yet.
+    Returns counts of generated, skipped and placeholder images, plus the list of
+    written files ("changed", relative to assets_folder).
+    """
+    tasks = asset_tasks(asset_prompts, assets_folder)
+    for _, _, img_path, _, _ in tasks:
+        os.makedirs(os.path.dirname(img_path), exist_ok=True)
+
+    stats = {"generated": 0, "skipped": 0, "placeholders": 0, "reused": 0, "kept": 0, "changed": [], "near_duplicates": {}}
+    if checkpoint is not None:
+        ready = await asyncio.to_thread(
+            lambda: [checkpoint.asset_ready(rel, digest) for _, _, _, rel, digest in tasks])
+        stats["skipped"] = sum(ready)
+        tasks = [task for task, done in zip(tasks, ready) if not done]
+        if stats["skipped"]:
+            send_progress_update(request_id, "assets", "running",
+                                 f"Reusing {stats['skipped']} existing assets", start_percent,
+                                 details={"skipped": stats["skipped"]})
+
+    total = len(tasks)
+    if not total:
+        return stats
+    semaphore = asyncio.Semaphore(ASSET_CONCURRENCY)
+    completed = 0
+
+    reusable = {}
+    if ASSET_REUSE_PROMPTS:
+        try:
+            entries = await asyncio.to_thread(phash_index.scan, "games")
+            own = {os.path.abspath(task[2]) for task in tasks}
+            entries = [e for e in entries if os.path.abspath(e["path"]) not in own]
+            for _, _, _, rel_path, digest in tasks:
+                match = find_prompt_match(entries, digest, rel_path.split("/", 1)[0])
+                if match:
+                    reusable[rel_path] = match["path"]
+        except Exception as e:
+            logger.warning(f"Could not look up reusable assets: {e}")
+
+    async def generate_one(name, prompt, img_path, rel_path, digest):
+        nonlocal completed
+        async with semaphore:
+            # Images are written to a temp file and renamed, so a failed call keeps the
+            # current image and never writes through a hardlink shared with other games
+            started = time.perf_counter()
+            source = reusable.get(rel_path)
+            try:
+                if source:
+                    await asyncio.to_thread(blobs.link_or_copy, source, img_path)
+                else:
+                    await generate_image_async(prompt, img_path, priority=priority)
+                if grids and rel_path in grids:
+                    await asyncio.to_thread(normalize_asset, img_path, grids[rel_path])
+                logger.debug(f"{'Reused' if source else 'Generated'} image: {img_path}")
+                ok, kept = True, False
+            except Exception as e:
+                logger.warning(f"Image generation failed for {img_path}: {e}")
+                ok = False
+                kept = not await asyncio.to_thread(create_placeholder_image, img_path)
+            seconds = time.perf_counter() - started
+        asset_folder = rel_path.split("/", 1)[0]
+        outcome = "kept" if kept else "placeholder" if not ok else "reused" if source else "ok"
+        asset_seconds.observe(seconds, folder=asset_folder, outcome=outcome)
+        if outcome == "placeholder":
+            placeholders_total.inc(folder=asset_folder)
+        if kept:
+            # The previous image stays, and its checkpoint entry still describes it
+            stats["kept"] += 1
+        else:
+            if checkpoint is not None:
+                checkpoint.record_asset(rel_path, digest, ok)
+            stats["placeholders" if not ok else "reused" if source else "generated"] += 1
+            stats["changed"].append(rel_path)
+        completed += 1
+        percent = start_percent + (end_percent - start_percent) * completed / total
+        send_progress_update(
+            request_id, "assets", "running",
+            f"{'Reused' if outcome == 'reused' else 'Generated'} asset {completed}/{total}: {name}", round(percent, 1),
+            details={"asset": name, "path": img_path, "ok": ok, "reused": outcome == "reused",
+                     "seconds": round(seconds, 2), "completed": completed, "total": total}
+        )
+
+    await asyncio.gather(*(generate_one(*task) for task in tasks))
+    stats["near_duplicates"] = await asyncio.to_thread(flag_near_duplicates, assets_folder, stats["changed"])
+    return stats
+
+def flag_near_duplicates(assets_folder, files):
+    """
+    {"<folder>/<file>": [closest matches]} for new images that nearly duplicate an image
+    already in some game: a sign the prompts overlap and a generation call was wasted.
+    Never raises; flagging must not fail a generation.
+    """
+    try:
+        entries = phash_index.scan("games")
+        paths = [os.path.join(assets_folder, rel) for rel in files]
+        flagged = {os.path.relpath(path, assets_folder).replace(os.sep, "/"): matches[:3]
+                   for path, matches in near_matches(paths, entries).items()}
+        if flagged:
+            logger.warning(f"{len(flagged)} new assets nearly duplicate existing images: {sorted(flagged)}")
+        return flagged
     except Exception as e:
-        import traceback
-        print("[FastAPI] Exception in run_generation:")
-        traceback.print_exc()
-        send_progress_update(request_id, "error", "error", f"Error: {str(e)}", 0)
+        logger.warning(f"Near-duplicate check failed for {assets_folder}: {e}")
+        return {}
 
 @app.delete("/delete/{folder_name}")
 def delete_game(folder_name: str = Path(...)):
     game_folder = os.path.join("games", folder_name)
     if os.path.exists(game_folder):
+        # A queued or running job would write into the deleted tree and recreate it
+        active = active_game_job(folder_name)
+        if active:
+            raise HTTPException(status_code=409, detail=f"Game is being modified by {active['id']}")
         shutil.rmtree(game_folder)
+        _game_dir_cache.pop(folder_name, None)
+        game_catalog.remove(folder_name)
+        blobs.gc_blobs()
         return {"status": "deleted", "folder": folder_name}
     else:
         raise HTTPException(status_code=404, detail="Game folder not found")
 
+# game id -> real path of its game folder, filled on first request
+_game_dir_cache = {}
+
+def resolve_game_dir(game_id):
+    """Cached lookup of a game's folder; misses are re-checked so new games go live at once"""
+    game_dir = _game_dir_cache.get(game_id)
+    if game_dir is not None and os.path.isdir(game_dir):
+        return game_dir
+    _game_dir_cache.pop(game_id, None)
+    if not game_id or game_id in (".", "..") or "/" in game_id or "\\" in game_id:
+        return None
+    game_dir = os.path.realpath(os.path.join(GAMES_BASE, game_id))
+    if not os.path.isdir(os.path.join(game_dir, "phaser")):
+        return None
+    _game_dir_cache[game_id] = game_dir
+    return game_dir
+
+@app.api_route("/games/{game_id}/phaser/{file_path:path}", methods=["GET", "HEAD"])
+def serve_game_file(game_id: str, file_path: str, request: Request):
+    game_dir = resolve_game_dir(game_id)
+    if game_dir is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    phaser_dir = os.path.join(game_dir, "phaser")
+    full_path = os.path.realpath(os.path.join(phaser_dir, file_path))
+    # phaser/assets may be a symlink to ../assets (ASSET_PUBLISH_MODE=symlink)
+    roots = {os.path.realpath(phaser_dir), os.path.realpath(os.path.join(phaser_dir, "assets"))}
+    if not any(os.path.commonpath([full_path, root]) == root for root in roots) or not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return serve_file(request, full_path)
+
+@app.api_route("/blobs/{digest}", methods=["GET", "HEAD"])
+def get_blob(digest: str, request: Request):
+    """Serve an asset by its content hash"""
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        raise HTTPException(status_code=400, detail="Invalid digest")
+    path = blobs.find_blob(digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    # Content-addressed, so the response never changes
+    return serve_file(request, path, immutable=True)
+
+@app.get("/assets/duplicates")
+async def get_duplicate_assets(max_distance: int = PHASH_MAX_DISTANCE):
+    """Groups of near-identical images (perceptual hash) across every game's assets"""
+    if not 0 <= max_distance <= 64:
+        raise HTTPException(status_code=400, detail="max_distance must be between 0 and 64")
+    return await asyncio.to_thread(duplicate_report, "games", max_distance)
+
+@app.post("/assets/duplicates/reuse")
+async def reuse_duplicate_assets(max_distance: int = PHASH_MAX_DISTANCE):
+    """
+    Link every same-size near-duplicate to its group's canonical image and republish
+    the games that changed. Groups touching a game with an active job are skipped.
+    """
+    if not 0 <= max_distance <= 64:
+        raise HTTPException(status_code=400, detail="max_distance must be between 0 and 64")
+    # Linking into assets/ and republishing would otherwise overwrite older edits made in phaser/assets
+    games = sorted(os.listdir("games")) if os.path.isdir("games") else []
+    for game in games:
+        game_folder = os.path.join("games", game)
+        if os.path.isdir(game_folder) and not active_game_job(game):
+            await asyncio.to_thread(adopt_legacy_asset_edits, game_folder, Checkpoint.load(game_folder))
+    report = await asyncio.to_thread(duplicate_report, "games", max_distance)
+    games = {m["game"] for group in report["groups"] for m in group["members"]}
+    busy = sorted(game for game in games if active_game_job(game))
+    report["groups"] = [g for g in report["groups"] if not any(m["game"] in busy for m in g["members"])]
+    replaced = await asyncio.to_thread(reuse_duplicates, report)
+    for game in replaced:
+        game_folder = os.path.join("games", game)
+        plan = await asyncio.to_thread(load_json_file, os.path.join(game_folder, "production_plan.json"))
+        await asyncio.to_thread(republish_assets, game_folder, plan)
+    if replaced:
+        await asyncio.to_thread(blobs.gc_blobs)
+    logger.info(f"Reused near-duplicate assets: {replaced}")
+    return {"replaced": replaced, "skipped_games": busy,
+            "reclaimable_bytes": sum(g["reclaimable_bytes"] for g in report["groups"] if not g["placeholders"])}
+
 @app.get("/asset_folders/{game_id}")
 def get_asset_folders(game_id: str):
     assets_path = os.path.join("games", game_id, "phaser", "assets")
@@ -375,35 +1014,177 @@ def get_asset_folders(game_id: str):
         os.path.join(assets_path, f))]
     return folders
 
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+# Upper bound on edits accepted in one /modify_asset request
+MAX_ASSET_EDITS = 32
+
+def resolve_asset_edit(game_id, edit):
+    """
+    Validate one {"folder", "file", "description"} edit and locate its files. file may be
+    omitted, in which case the first image in the folder is used. Raises ValueError for
+    malformed edits and FileNotFoundError for missing folders or images.
+    """
+    if not isinstance(edit, dict):
+        raise ValueError("Each edit must be an object")
+    folder = edit.get("folder")
+    description = edit.get("description")
+    file_name = edit.get("file")
+    if not folder or not description:
+        raise ValueError("Missing folder or description")
+    for part in (folder, file_name or ""):
+        if part in (".", "..") or "/" in part or "\\" in part:
+            raise ValueError(f"Invalid asset name: {part}")
+
+    assets_dir = os.path.join("games", game_id, "phaser", "assets", folder)
+    if not os.path.isdir(assets_dir):
+        raise FileNotFoundError(f"Asset folder not found: {folder}")
+    if file_name is None:
+        # Previous API: replace the first image in the folder
+        image_files = sorted(f for f in os.listdir(assets_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not image_files:
+            raise FileNotFoundError(f"No image found in {folder}")
+        file_name = image_files[0]
+    image_path = os.path.join(assets_dir, file_name)
+    if not file_name.lower().endswith(IMAGE_EXTENSIONS) or not os.path.isfile(image_path):
+        raise FileNotFoundError(f"Image not found: {folder}/{file_name}")
+
+    # assets/ is the source of truth; phaser/assets is republished from it
+    source_dir = os.path.join("games", game_id, "assets", folder)
+    target_path = os.path.join(source_dir, file_name) if os.path.isdir(source_dir) else image_path
+    return {"folder": folder, "file": file_name, "description": description,
+            "image_path": image_path, "target_path": target_path}
+
 @app.post("/modify_asset/{game_id}")
 async def modify_asset(game_id: str, request: Request):
+    """
+    Queue asset edits and return a job id at once. The body is either one edit
+    {"folder", "file"?, "description"} or {"edits": [edit, ...]}; edits in a batch are
+    generated concurrently and reported on /progress/{request_id}.
+    """
     data = await request.json()
-    folder = data.get('folder')
-    description = data.get('description')
-    if not folder or not description:
-        raise HTTPException(status_code=400, detail="Missing folder or description")
+    edits = data.get("edits") if isinstance(data, dict) and "edits" in data else [data]
+    if not isinstance(edits, list) or not edits:
+        raise HTTPException(status_code=400, detail="No edits given")
+    if len(edits) > MAX_ASSET_EDITS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ASSET_EDITS} edits per request")
+    resolved = []
+    for edit in edits:
+        try:
+            resolved.append(resolve_asset_edit(game_id, edit))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    targets = [(r["folder"], r["file"]) for r in resolved]
+    if len(set(targets)) != len(targets):
+        raise HTTPException(status_code=400, detail="Each image can only be edited once per request")
 
-    assets_dir = os.path.join("games", game_id, "phaser", "assets", folder)
-    if not os.path.exists(assets_dir):
-        raise HTTPException(status_code=404, detail="Asset folder not found")
+    payload_edits = [{"folder": r["folder"], "file": r["file"], "description": r["description"]} for r in resolved]
+    request_id = enqueue_game_job(game_id, "modify_asset", "edit", PRIORITY_INTERACTIVE,
+                                  extra_payload={"edits": payload_edits})
+    return {
+        "status": "started",
+        "request_id": request_id,
+        "edits": [{"folder": folder, "file": file_name} for folder, file_name in targets],
+        "message": "Asset modification started",
+    }
 
-    # Find the first image file in the folder
-    image_files = [f for f in os.listdir(assets_dir) if f.lower().endswith((".png", ".jpg", ".jpeg"))]
-    if not image_files:
-        raise HTTPException(status_code=404, detail="No image found in selected folder")
-    image_path = os.path.join(assets_dir, image_files[0])
+async def run_modify_job(job):
+    """Job handler for kind 'modify_asset'"""
+    return await run_asset_edits(job["id"], job["payload"]["game_id"], job["payload"]["edits"])
 
-    # Get image size
-    with Image.open(image_path) as img:
-        width, height = img.size
+def republish_assets(game_folder, plan, publish=True):
+    """
+    Publish a game's changed source assets to phaser/assets and rebuild what is derived
+    from them: the frame manifest, the texture atlases (edited images live inside them
+    too) and the blob store links.
+    """
+    phaser_dir = os.path.join(game_folder, "phaser")
+    if publish:
+        with stage_seconds.time(stage="phaser_publish"):
+            publish_assets(os.path.join(game_folder, "assets"), os.path.join(phaser_dir, "assets"))
+    with stage_seconds.time(stage="phaser_frames"):
+        build_frame_manifest(phaser_dir, plan, game_folder)
+    with stage_seconds.time(stage="phaser_atlas"):
+        build_atlases(phaser_dir)
+    with stage_seconds.time(stage="phaser_blobs"):
+        blobs.ingest_game_assets(game_folder)
 
-    # Generate and replace image
+async def run_asset_edits(request_id, game_id, edits):
+    """
+    Regenerate the edited images concurrently, then republish, re-optimize and repack
+    the game's assets once for the whole batch. Fails only if every edit failed.
+    """
     try:
-        
-        generate_asset_image(description, image_path, width, height, asset_type=folder)
-        return {"status": "success", "message": "Image replaced.", "filename": image_files[0]}
+        game_folder = os.path.join("games", game_id)
+        total = len(edits)
+        send_progress_update(request_id, "assets", "running", f"Generating {total} new asset(s)...", 5)
+        plan = await asyncio.to_thread(load_json_file, os.path.join(game_folder, "production_plan.json"))
+        checkpoint = Checkpoint.load(game_folder)
+        # Before the edits land in assets/, so an older edit of the same image cannot overwrite them
+        await asyncio.to_thread(adopt_legacy_asset_edits, game_folder, checkpoint)
+        # Replaced spritesheets must keep the frame grid the Phaser loader slices them by
+        grids = sheet_grids(plan) if isinstance(plan, dict) else {}
+        semaphore = asyncio.Semaphore(ASSET_CONCURRENCY)
+        completed = 0
+
+        async def edit_one(edit):
+            nonlocal completed
+            result = {"folder": edit["folder"], "file": edit["file"], "ok": False}
+            async with semaphore:
+                tmp_path = None
+                try:
+                    target = await asyncio.to_thread(resolve_asset_edit, game_id, edit)
+                    with Image.open(target["image_path"]) as img:
+                        width, height = img.size
+                    # Generate next to the old image and swap it in, so hardlinked copies in the blob store stay intact
+                    base, ext = os.path.splitext(target["target_path"])
+                    tmp_path = f"{base}.tmp{ext}"
+                    await generate_asset_image_async(edit["description"], tmp_path, width, height,
+                                                     asset_type=edit["folder"],
+                                                     grid=grids.get(f"{edit['folder']}/{edit['file']}"),
+                                                     priority=PRIORITY_INTERACTIVE)
+                    os.replace(tmp_path, target["target_path"])
+                    result.update(ok=True, source=target["target_path"] != target["image_path"])
+                except Exception as e:
+                    logger.warning(f"Asset edit {edit['folder']}/{edit['file']} failed: {e}")
+                    result["error"] = str(e)
+                    if tmp_path and os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            completed += 1
+            send_progress_update(
+                request_id, "assets", "running",
+                f"{'Replaced' if result['ok'] else 'Failed to replace'} {edit['folder']}/{edit['file']} ({completed}/{total})",
+                round(5 + 75 * completed / total, 1),
+                details=dict(result, completed=completed, total=total))
+            return result
+
+        results = await asyncio.gather(*(edit_one(edit) for edit in edits))
+        replaced = [r for r in results if r["ok"]]
+        if not replaced:
+            raise RuntimeError(f"No asset could be replaced: {results[0].get('error')}")
+
+        send_progress_update(request_id, "phaser_files", "running", "Publishing updated assets...", 85)
+        changed_sources = [f"{r['folder']}/{r['file']}" for r in replaced if r["source"]]
+        if changed_sources:
+            for rel in changed_sources:
+                checkpoint.mark_edited(rel)
+            await asyncio.to_thread(optimize_game_assets, os.path.join(game_folder, "assets"), game_folder,
+                                    changed_sources)
+        await asyncio.to_thread(republish_assets, game_folder, plan, publish=bool(changed_sources))
+
+        message = f"Replaced {len(replaced)} of {total} asset(s). Reload the game to see changes."
+        send_progress_update(request_id, "complete", "completed", message, 100,
+                             details={"edits": results})
+        return {"game_id": game_id, "edits": results}
+
+    except asyncio.CancelledError:
+        send_progress_update(request_id, "error", "error", "Job cancelled", 0)
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate/replace image: {e}")
+        logger.exception(f"Exception in run_asset_edits {request_id}")
+        send_progress_update(request_id, "error", "error", f"Error: {str(e)}", 0)
+        raise
 
 def generate_standard_template_files(phaser_dir, scenes_dir):
     """Generate standard template files that work for any game"""
@@ -456,6 +1237,10 @@ document.addEventListener('DOMContentLoaded', () => {
     <div id="phaser-game"></div>
     <script src="https://cdn.jsdelivr.net/npm/phaser@3/dist/phaser.js"></script>
     <script src="./loadAssets.js"></script>
+    <script src="./frameManifest.js"></script>
+    <script src="./frameLoader.js"></script>
+    <script src="./atlasManifest.js"></script>
+    <script src="./atlasLoader.js"></script>
     <script src="./createAnimations.js"></script>
     <script src="./createScene.js"></script>
     <script src="./setupControls.js"></script>
@@ -499,59 +1284,3 @@ window.GameScene = GameScene;
     
     with open(os.path.join(scenes_dir, "GameScene.js"), "w", encoding="utf-8") as f:
         f.write(gamescene_template)
-
-
-# def restart_server_silently(
-#         main_file: str = "main:app",
-#     port: int = 8000,
-#     host: str = "127.0.0.1",
-#     reload: bool = True
-# ):
-#     """
-#     Cross-platform restart function that safely targets uvicorn processes.
-#     """
-#     print("🔄 Restarting FastAPI server...")
-
-#     # Kill existing uvicorn processes (safer approach)
-#     try:
-#         if os.name == 'nt':  # Windows
-#             # Kill processes listening on the specific port
-#             os.system(
-#                 f'for /f "tokens=5" %a in (\'netstat -aon ^| find ":{port}" ^| find "LISTENING"\') do taskkill /f /pid %a')
-#             time.sleep(1)
-#             # Also try to kill by command line (more targeted)
-#             os.system(
-#                 'wmic process where "commandline like \'%uvicorn%\'" delete')
-#         else:  # Unix-like (Linux, macOS)
-#             os.system("pkill -f uvicorn")
-#         time.sleep(2)
-#         print("✅ Stopped existing server")
-#     except Exception as e:
-#         print(f"Note: {e}")
-
-#     # Build command with parameters
-#     cmd = f"uvicorn {main_file}"
-
-#     if host != "127.0.0.1":
-#         cmd += f" --host {host}"
-#     if port != 8000:
-#         cmd += f" --port {port}"
-#     if reload:
-#         cmd += " --reload"
-
-#     print(f"Starting: {cmd}")
-
-#     # Start server
-#     try:
-#         if os.name == 'nt':  # Windows
-#             # Use subprocess to start in background
-#             import subprocess
-#             subprocess.Popen(
-#                 cmd.split(), creationflags=subprocess.CREATE_NEW_CONSOLE)
-#         else:  # Unix-like
-#             os.system(f"{cmd} &")
-
-#         time.sleep(1)
-#         print("✅ Server restart initiated")
-#     except Exception as e:
-#         print(f"❌ Error starting server: {e}")
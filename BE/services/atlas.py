@@ -0,0 +1,242 @@
+import os
+import json
+import hashlib
+from PIL import Image
+
+# Texture atlases built from phaser/assets/{characters,effects,ui}
+ATLAS_FOLDERS = ("characters", "effects", "ui")
+ATLAS_MAX_SIZE = int(os.getenv("ATLAS_MAX_SIZE", "2048"))
+ATLAS_PADDING = int(os.getenv("ATLAS_PADDING", "2"))
+ATLAS_DIR = "atlas"
+MANIFEST_JS = "atlasManifest.js"
+LOADER_JS = "atlasLoader.js"
+
+# Wraps window.loadAssets: load.image/load.spritesheet calls for packed files are
+# collected, the atlases are queued instead, and once loading completes each key is
+# registered as its own (sprite sheet) texture backed by the atlas frame.
+ATLAS_LOADER_TEMPLATE = '''// Auto-generated by backend: serves packed images from texture atlases
+// and pins every asset URL to its content hash (?v=) so it can be cached forever.
+// Requires atlasManifest.js and loadAssets.js to be loaded first.
+(function () {
+    var manifest = window.ATLAS_MANIFEST;
+    var loadAssets = window.loadAssets;
+    if (!manifest || !loadAssets) return;
+    var versions = manifest.versions || {};
+
+    function normalize(url) {
+        return typeof url === 'string' ? url.replace(/^\\.?\\//, '').split('?')[0] : url;
+    }
+    function versioned(url) {
+        var v = versions[normalize(url)];
+        if (!v || typeof url !== 'string') return url;
+        return url + (url.indexOf('?') < 0 ? '?v=' : '&v=') + v;
+    }
+    function passthrough(method, load, args) {
+        args = Array.prototype.slice.call(args);
+        if (typeof args[0] === 'string') args[1] = versioned(args[1]);
+        return method.apply(load, args);
+    }
+
+    window.loadAssets = function (scene) {
+        var load = scene.load;
+        var image = load.image;
+        var spritesheet = load.spritesheet;
+        var packed = [];
+
+        load.image = function (key, url) {
+            var atlas = manifest.frames[normalize(url)];
+            if (typeof key !== 'string' || !atlas) return passthrough(image, load, arguments);
+            packed.push({ key: key, atlas: atlas, frame: normalize(url) });
+            return load;
+        };
+        load.spritesheet = function (key, url, config) {
+            var atlas = manifest.frames[normalize(url)];
+            if (typeof key !== 'string' || !atlas) return passthrough(spritesheet, load, arguments);
+            packed.push({ key: key, atlas: atlas, frame: normalize(url), config: config });
+            return load;
+        };
+        try {
+            loadAssets(scene);
+        } finally {
+            load.image = image;
+            load.spritesheet = spritesheet;
+        }
+        if (!packed.length) return;
+
+        var used = {};
+        packed.forEach(function (p) { used[p.atlas] = true; });
+        manifest.atlases.forEach(function (a) {
+            if (used[a.key]) load.atlas(a.key, versioned(a.image), versioned(a.json));
+        });
+
+        // Runs before the scene's create(), which waits for the same event
+        load.once('complete', function () {
+            packed.forEach(function (p) {
+                var frame = scene.textures.getFrame(p.atlas, p.frame);
+                if (!frame || scene.textures.exists(p.key)) return;
+                var config = Object.assign({ frameWidth: frame.width, frameHeight: frame.height }, p.config || {});
+                config.atlas = p.atlas;
+                config.frame = p.frame;
+                scene.textures.addSpriteSheetFromAtlas(p.key, config);
+            });
+        });
+    };
+})();
+'''
+
+
+def _candidate_sizes(max_size):
+    """Power-of-two (width, height) pairs up to max_size, smallest area first"""
+    sizes = []
+    w = 64
+    while w <= max_size:
+        h = 64
+        while h <= w:
+            if w <= 2 * h:
+                sizes.append((w, h))
+            h *= 2
+        w *= 2
+    return sorted(sizes, key=lambda s: (s[0] * s[1], s[0]))
+
+
+def _shelf_pack(items, width, height, padding):
+    """Place items (sorted tallest first) on horizontal shelves. Returns (placed, rest)."""
+    placed, rest = [], []
+    x = y = shelf_height = 0
+    for item in items:
+        w, h = item["size"]
+        if x and x + w > width:
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        if w > width or y + h > height:
+            rest.append(item)
+            continue
+        placed.append(dict(item, position=(x, y)))
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+    return placed, rest
+
+
+def plan_atlases(items, max_size=ATLAS_MAX_SIZE, padding=ATLAS_PADDING):
+    """Split items ({"name", "size"}) across as few power-of-two atlases as possible"""
+    remaining = sorted(items, key=lambda i: (-i["size"][1], -i["size"][0]))
+    atlases = []
+    while remaining:
+        for width, height in _candidate_sizes(max_size):
+            placed, rest = _shelf_pack(remaining, width, height, padding)
+            if not rest:
+                break
+        if not placed:
+            break
+        atlases.append({"size": (width, height), "frames": placed})
+        remaining = rest
+    return atlases
+
+
+def collect_images(phaser_dir, max_size=ATLAS_MAX_SIZE):
+    """PNG files that can be packed, keyed by the URL loadAssets.js uses (assets/<folder>/<file>)"""
+    items = []
+    for folder in ATLAS_FOLDERS:
+        folder_path = os.path.join(phaser_dir, "assets", folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if not name.lower().endswith(".png"):
+                continue
+            path = os.path.join(folder_path, name)
+            try:
+                with Image.open(path) as img:
+                    size = img.size
+            except Exception:
+                continue
+            if size[0] <= max_size and size[1] <= max_size:
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+                items.append({"name": f"assets/{folder}/{name}", "path": path, "size": size, "sha256": digest})
+    return items
+
+
+def asset_versions(phaser_dir, folders=("assets", ATLAS_DIR), length=16):
+    """URL (relative to phaser/) -> sha256 prefix for every published asset file"""
+    versions = {}
+    for folder in folders:
+        root_dir = os.path.join(phaser_dir, folder)
+        for root, _, names in os.walk(root_dir):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+                rel = os.path.relpath(path, phaser_dir).replace(os.sep, "/")
+                versions[rel] = digest[:length]
+    return versions
+
+
+def build_atlases(phaser_dir, max_size=ATLAS_MAX_SIZE, padding=ATLAS_PADDING):
+    """
+    Pack character/effect/ui images into phaser/atlas/atlas_<n>.png + .json (Phaser JSON hash)
+    and write atlasManifest.js / atlasLoader.js. Returns a summary dict.
+    """
+    atlas_dir = os.path.join(phaser_dir, ATLAS_DIR)
+    os.makedirs(atlas_dir, exist_ok=True)
+    for name in os.listdir(atlas_dir):
+        os.remove(os.path.join(atlas_dir, name))
+
+    items = collect_images(phaser_dir, max_size)
+    # Byte-identical files (e.g. hit_fx.png / hit_effect.png) share one region
+    aliases = {}
+    unique = []
+    for item in items:
+        if item["sha256"] in aliases:
+            aliases[item["sha256"]].append(item["name"])
+        else:
+            aliases[item["sha256"]] = [item["name"]]
+            unique.append(item)
+    # An atlas holding a single image saves no requests, so those stay as separate files
+    atlases = [a for a in plan_atlases(unique, max_size, padding)
+               if sum(len(aliases[f["sha256"]]) for f in a["frames"]) > 1]
+
+    manifest = {"atlases": [], "frames": {}}
+    for index, atlas in enumerate(atlases):
+        key = f"__atlas_{index}"
+        width, height = atlas["size"]
+        sheet = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        frames = {}
+        for frame in atlas["frames"]:
+            x, y = frame["position"]
+            w, h = frame["size"]
+            with Image.open(frame["path"]) as img:
+                sheet.paste(img.convert("RGBA"), (x, y))
+            for name in aliases[frame["sha256"]]:
+                frames[name] = {
+                    "frame": {"x": x, "y": y, "w": w, "h": h},
+                    "rotated": False,
+                    "trimmed": False,
+                    "spriteSourceSize": {"x": 0, "y": 0, "w": w, "h": h},
+                    "sourceSize": {"w": w, "h": h},
+                }
+                manifest["frames"][name] = key
+
+        image_name = f"atlas_{index}.png"
+        json_name = f"atlas_{index}.json"
+        sheet.save(os.path.join(atlas_dir, image_name), format="PNG")
+        with open(os.path.join(atlas_dir, json_name), "w", encoding="utf-8") as f:
+            json.dump({"frames": frames, "meta": {
+                "app": "2D Game Builder", "image": image_name, "format": "RGBA8888",
+                "size": {"w": width, "h": height}, "scale": "1"}}, f, indent=2)
+        manifest["atlases"].append({"key": key, "image": f"{ATLAS_DIR}/{image_name}", "json": f"{ATLAS_DIR}/{json_name}"})
+
+    manifest["versions"] = asset_versions(phaser_dir)
+    with open(os.path.join(phaser_dir, MANIFEST_JS), "w", encoding="utf-8") as f:
+        f.write("// Auto-generated by backend: packed texture atlases\n")
+        f.write(f"window.ATLAS_MANIFEST = {json.dumps(manifest, indent=2)};\n")
+    with open(os.path.join(phaser_dir, LOADER_JS), "w", encoding="utf-8") as f:
+        f.write(ATLAS_LOADER_TEMPLATE)
+
+    packed = len(manifest["frames"])
+    return {
+        "atlases": len(atlases),
+        "packed_images": packed,
+        # each atlas costs an image and a json request
+        "requests_saved": packed - 2 * len(atlases),
+    }
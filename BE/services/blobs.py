@@ -0,0 +1,163 @@
+import os
+import json
+import shutil
+import hashlib
+
+# Content-addressed store shared by every game's assets
+BLOB_DIR = os.getenv("ASSET_BLOB_DIR", os.path.join("data", "blobs"))
+MANIFEST_NAME = "assets_manifest.json"
+
+
+def file_digest(path):
+    """sha256 of a file, read in chunks"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def blob_path(digest, ext="", blob_dir=BLOB_DIR):
+    return os.path.join(blob_dir, digest[:2], f"{digest}{ext}")
+
+
+def find_blob(digest, blob_dir=BLOB_DIR):
+    """Return the stored path for a digest (any extension) or None"""
+    folder = os.path.join(blob_dir, digest[:2])
+    if not os.path.isdir(folder):
+        return None
+    for name in os.listdir(folder):
+        if name.split(".", 1)[0] == digest:
+            return os.path.join(folder, name)
+    return None
+
+
+def link_or_copy(src, dst):
+    """
+    Hardlink src to dst (replacing dst atomically), falling back to a copy across
+    devices. Returns True if a link was made.
+    """
+    tmp = f"{dst}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        linked = True
+    except OSError:
+        shutil.copy2(src, tmp)
+        linked = False
+    os.replace(tmp, dst)
+    return linked
+
+
+def store_file(path, blob_dir=BLOB_DIR):
+    """Move a file's content into the blob store and leave a hardlink at path. Returns the digest."""
+    digest = file_digest(path)
+    ext = os.path.splitext(path)[1].lower()
+    target = blob_path(digest, ext, blob_dir)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not link_or_copy(path, target):
+            # No hardlinks between the games tree and the store; keep the copy as is
+            return digest
+    if not _same_file(path, target):
+        link_or_copy(target, path)
+    return digest
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def ingest_folder(folder, blob_dir=BLOB_DIR):
+    """Store every file under folder. Returns {relative_path: {"sha256", "size"}}."""
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in sorted(names):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, folder).replace(os.sep, "/")
+            files[rel] = {"sha256": store_file(path, blob_dir), "size": os.path.getsize(path)}
+    return files
+
+
+def ingest_game_assets(game_folder, blob_dir=BLOB_DIR):
+    """
+    Deduplicate a game's assets/ (and phaser/assets/ if present) into the blob store
+    and write assets_manifest.json in the game folder.
+    """
+    manifest = {"files": {}, "phaser_files": {}}
+    assets_dir = os.path.join(game_folder, "assets")
+    if os.path.isdir(assets_dir):
+        manifest["files"] = ingest_folder(assets_dir, blob_dir)
+    phaser_assets_dir = os.path.join(game_folder, "phaser", "assets")
+    if os.path.isdir(phaser_assets_dir) and not os.path.islink(phaser_assets_dir):
+        manifest["phaser_files"] = ingest_folder(phaser_assets_dir, blob_dir)
+
+    entries = list(manifest["files"].values()) + list(manifest["phaser_files"].values())
+    unique = {e["sha256"]: e["size"] for e in entries}
+    manifest["total_bytes"] = sum(e["size"] for e in entries)
+    manifest["unique_bytes"] = sum(unique.values())
+    save_manifest(game_folder, manifest)
+    return manifest
+
+
+def load_manifest(game_folder):
+    path = os.path.join(game_folder, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(game_folder, manifest):
+    path = os.path.join(game_folder, MANIFEST_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+
+def gc_blobs(base_dir="games", blob_dir=BLOB_DIR):
+    """Delete blobs no game manifest references any more. Returns bytes freed."""
+    if not os.path.isdir(blob_dir):
+        return 0
+    referenced = set()
+    if os.path.isdir(base_dir):
+        for game in os.listdir(base_dir):
+            manifest = load_manifest(os.path.join(base_dir, game))
+            if manifest:
+                for section in ("files", "phaser_files"):
+                    referenced.update(e["sha256"] for e in manifest.get(section, {}).values())
+    freed = 0
+    for root, _, names in os.walk(blob_dir):
+        for name in names:
+            if name.split(".", 1)[0] not in referenced:
+                path = os.path.join(root, name)
+                freed += os.path.getsize(path)
+                os.remove(path)
+    return freed
+
+
+def dedupe_games(base_dir="games", blob_dir=BLOB_DIR):
+    """Ingest every existing game folder. Returns totals across all games."""
+    total = 0
+    digests = {}
+    for game in sorted(os.listdir(base_dir)):
+        game_folder = os.path.join(base_dir, game)
+        if not os.path.isdir(game_folder):
+            continue
+        manifest = ingest_game_assets(game_folder, blob_dir)
+        total += manifest["total_bytes"]
+        for section in ("files", "phaser_files"):
+            for e in manifest[section].values():
+                digests[e["sha256"]] = e["size"]
+    return {"games_bytes": total, "unique_bytes": sum(digests.values()), "blobs": len(digests)}
+
+
+if __name__ == "__main__":
+    # python -m services.blobs  (run from BE/) deduplicates the existing games tree
+    print(dedupe_games())
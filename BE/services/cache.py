@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# On-disk cache for Gemini text responses (blueprints, production plans)
+CACHE_DIR = os.getenv("GEMINI_CACHE_DIR", os.path.join("data", "cache"))
+CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("GEMINI_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    Content-addressed JSON cache. Entries are files named by the sha256 of
+    model name + request body, expire after ttl seconds and are evicted
+    least-recently-used first once the directory grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._sizes = {}  # key -> file size
+        if os.path.isdir(cache_dir):
+            for name in os.listdir(cache_dir):
+                if name.endswith(".json"):
+                    path = os.path.join(cache_dir, name)
+                    self._sizes[name[:-5]] = os.path.getsize(path)
+        self._total = sum(self._sizes.values())
+
+    @staticmethod
+    def key(model, body):
+        raw = model + "\n" + json.dumps(body, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        self._total -= self._sizes.pop(key, 0)
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except OSError:
+                self.misses += 1
+                return None
+            if age > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                self._remove(key)
+                self.misses += 1
+                return None
+            # Refresh mtime so eviction is least-recently-used
+            os.utime(path)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total += len(data) - self._sizes.get(key, 0)
+            self._sizes[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        entries = []
+        for key in self._sizes:
+            try:
+                entries.append((os.path.getmtime(self._path(key)), key))
+            except OSError:
+                entries.append((0, key))
+        entries.sort()
+        for _, key in entries:
+            if self._total <= self.max_bytes:
+                break
+            self._remove(key)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._sizes),
+                "bytes": self._total,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache()
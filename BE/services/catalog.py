@@ -0,0 +1,138 @@
+import os
+import json
+import threading
+from services.logs import get_logger
+
+# Persisted index of generated games, so GET /games doesn't parse every blueprint
+CATALOG_PATH = os.getenv("GAME_CATALOG_PATH", os.path.join("data", "games.json"))
+CATALOG_FIELDS = ("id", "title", "genre", "description", "thumbnail", "config")
+DEFAULT_FIELDS = ("id", "title", "genre", "description", "thumbnail")
+
+logger = get_logger("catalog")
+
+
+class GameCatalog:
+    """
+    In-memory game index backed by a JSON file. Entries are rebuilt from a game's
+    blueprint.json only when its modification time changes.
+    """
+
+    def __init__(self, base_dir="games", path=CATALOG_PATH):
+        self.base_dir = base_dir
+        self.path = path
+        self._entries = {}  # game id -> summary entry
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the persisted index and reconcile it with the games folder"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("games"), dict):
+                self._entries = data["games"]
+        except (OSError, ValueError):
+            self._entries = {}
+        self.reconcile()
+
+    def reconcile(self):
+        """Pick up games added, changed or removed outside the API. Returns True if anything changed."""
+        changed = False
+        present = set()
+        if os.path.isdir(self.base_dir):
+            for folder in os.listdir(self.base_dir):
+                blueprint_path = os.path.join(self.base_dir, folder, "blueprint.json")
+                try:
+                    mtime = os.path.getmtime(blueprint_path)
+                except OSError:
+                    continue
+                present.add(folder)
+                entry = self._entries.get(folder)
+                if entry is None or entry.get("blueprint_mtime") != mtime:
+                    new_entry = self._read_entry(folder, blueprint_path, mtime)
+                    if new_entry is not None:
+                        with self._lock:
+                            self._entries[folder] = new_entry
+                        changed = True
+        with self._lock:
+            for folder in list(self._entries):
+                if folder not in present:
+                    del self._entries[folder]
+                    changed = True
+        if changed:
+            self.save()
+        return changed
+
+    def _read_entry(self, folder, blueprint_path, mtime):
+        try:
+            with open(blueprint_path, "r", encoding="utf-8") as f:
+                blueprint = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping {folder} in catalog: {e}")
+            return None
+        return {
+            "id": folder,
+            "title": blueprint.get("meta", {}).get("title", folder),
+            "genre": blueprint.get("gameplay", {}).get("genre", "Custom"),
+            "description": blueprint.get("meta", {}).get("description", ""),
+            "thumbnail": "/assets/placeholder.png",
+            "blueprint_mtime": mtime,
+        }
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Held through the write: deletes (worker threads) and generations (event loop) share the temp file
+        with self._lock:
+            data = json.dumps({"games": self._entries}, indent=2)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+
+    def upsert(self, game_id):
+        """Refresh one game's entry after it was generated or modified"""
+        blueprint_path = os.path.join(self.base_dir, game_id, "blueprint.json")
+        try:
+            mtime = os.path.getmtime(blueprint_path)
+        except OSError:
+            return self.remove(game_id)
+        entry = self._read_entry(game_id, blueprint_path, mtime)
+        if entry is not None:
+            with self._lock:
+                self._entries[game_id] = entry
+            self.save()
+        return entry
+
+    def remove(self, game_id):
+        with self._lock:
+            removed = self._entries.pop(game_id, None)
+        if removed is not None:
+            self.save()
+        return None
+
+    def load_blueprint(self, game_id):
+        with open(os.path.join(self.base_dir, game_id, "blueprint.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def list(self, offset=0, limit=None, genre=None, fields=DEFAULT_FIELDS):
+        """Returns (total matching, page of projected entries) ordered by title"""
+        with self._lock:
+            entries = list(self._entries.values())
+        if genre:
+            wanted = genre.lower()
+            entries = [e for e in entries if str(e.get("genre", "")).lower() == wanted]
+        entries.sort(key=lambda e: (str(e.get("title", "")).lower(), e["id"]))
+        total = len(entries)
+        page = entries[offset:offset + limit] if limit is not None else entries[offset:]
+
+        items = []
+        for entry in page:
+            item = {field: entry.get(field) for field in fields if field != "config"}
+            if "config" in fields:
+                try:
+                    item["config"] = self.load_blueprint(entry["id"])
+                except (OSError, ValueError):
+                    item["config"] = None
+            items.append(item)
+        return total, items
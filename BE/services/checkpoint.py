@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from PIL import Image
+
+# Per-game record of finished pipeline stages, so a failed or interrupted run can resume
+CHECKPOINT_NAME = "checkpoint.json"
+# Pipeline stages in order; re-running one invalidates every stage after it
+STAGES = ("blueprint", "plan", "assets", "optimize", "phaser_files")
+# Images with at most this many colours are placeholders left by a failed generation
+PLACEHOLDER_COLORS = 16
+
+
+def prompt_hash(prompt):
+    """Stable hash of one asset_prompts entry (a string or a nested dict)"""
+    data = json.dumps(prompt, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def is_valid_image(path):
+    """True if path holds a complete, decodable image"""
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        return True
+    except Exception:
+        return False
+
+
+def is_placeholder_image(path):
+    """True if the image at path is a flat fill, like the grey placeholder for failed assets"""
+    try:
+        with Image.open(path) as img:
+            img.thumbnail((128, 128))
+            return img.convert("RGB").getcolors(PLACEHOLDER_COLORS) is not None
+    except Exception:
+        return False
+
+
+class Checkpoint:
+    """
+    checkpoint.json in a game folder: {"prompt", "stages": {stage: {"at", ...}},
+    "assets": {"<folder>/<file>": {"prompt_hash", "ok", "at", "edited"?}}, "modules": {name: code hash},
+    "assets_adopted"?}.
+    Every change is written straight away (temp file + rename), so a crash loses at
+    most the step in flight.
+    """
+
+    def __init__(self, folder, data=None):
+        self.folder = folder
+        self.path = os.path.join(folder, CHECKPOINT_NAME)
+        self.data = data or {}
+        self.data.setdefault("stages", {})
+        self.data.setdefault("assets", {})
+        self.data.setdefault("modules", {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, folder):
+        try:
+            with open(os.path.join(folder, CHECKPOINT_NAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                data = None
+        except (OSError, ValueError):
+            data = None
+        return cls(folder, data)
+
+    def save(self):
+        # Held through the write, so saves from worker threads never share the temp file
+        with self._lock:
+            data = json.dumps(self.data, indent=2)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+
+    @property
+    def prompt(self):
+        return self.data.get("prompt")
+
+    def set_prompt(self, prompt):
+        self.data["prompt"] = prompt
+        self.save()
+
+    def is_done(self, stage):
+        return stage in self.data["stages"]
+
+    def fell_back(self, stage):
+        """True if the stage finished with placeholder output (e.g. a dummy blueprint)"""
+        return bool(self.data["stages"].get(stage, {}).get("fallback"))
+
+    def complete(self, stage, **info):
+        with self._lock:
+            self.data["stages"][stage] = dict(info, at=time.time())
+        self.save()
+
+    def invalidate(self, stage):
+        """Forget stage and every stage after it"""
+        with self._lock:
+            for name in STAGES[STAGES.index(stage):]:
+                self.data["stages"].pop(name, None)
+        self.save()
+
+    def record_asset(self, rel_path, digest, ok):
+        with self._lock:
+            self.data["assets"][rel_path] = {"prompt_hash": digest, "ok": ok, "at": time.time()}
+        self.save()
+
+    def mark_edited(self, rel_path):
+        """The asset was replaced by a user edit, so it no longer shows what its prompt describes"""
+        with self._lock:
+            self.data["assets"].setdefault(rel_path, {})["edited"] = True
+        self.save()
+
+    @property
+    def assets_adopted(self):
+        """True once edits made in phaser/assets by older versions were copied back into assets/"""
+        return bool(self.data.get("assets_adopted"))
+
+    def mark_assets_adopted(self):
+        self.data["assets_adopted"] = True
+        self.save()
+
+    def forget_asset(self, rel_path):
+        with self._lock:
+            self.data["assets"].pop(rel_path, None)
+        self.save()
+
+    def asset_ready(self, rel_path, digest):
+        """
+        True if the asset was generated (not a placeholder) from this prompt and is still
+        a valid image. Assets with no recorded prompt (games from before checkpoints) are
+        taken as generated from the current one when they hold a real image.
+        """
+        path = os.path.join(self.folder, "assets", rel_path)
+        entry = self.data["assets"].get(rel_path)
+        if entry is None or "prompt_hash" not in entry:
+            if not is_valid_image(path) or is_placeholder_image(path):
+                return False
+            with self._lock:
+                self.data["assets"][rel_path] = dict(entry or {}, prompt_hash=digest, ok=True, at=time.time())
+            self.save()
+            return True
+        if not entry.get("ok") or entry.get("prompt_hash") != digest:
+            return False
+        return is_valid_image(path)
+
+    def changed_modules(self, phaser_modules):
+        """Names of modules whose code differs from what was last written"""
+        recorded = self.data["modules"]
+        return [name for name, code in phaser_modules.items() if recorded.get(name) != prompt_hash(code)]
+
+    def record_modules(self, phaser_modules):
+        with self._lock:
+            self.data["modules"] = {name: prompt_hash(code) for name, code in phaser_modules.items()}
+        self.save()
@@ -0,0 +1,268 @@
+import os
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageChops
+from services.resize import sheet_grids
+from services.logs import get_logger
+
+# Spritesheets in these phaser/assets folders are analyzed
+FRAME_FOLDERS = ("characters", "effects")
+# Pixels with alpha above this count as content
+ALPHA_THRESHOLD = int(os.getenv("FRAMES_ALPHA_THRESHOLD", "16"))
+# Cells with less content than this fraction of their area are empty
+EMPTY_COVERAGE = float(os.getenv("FRAMES_EMPTY_COVERAGE", "0.002"))
+# Content runs narrower than this many pixels are noise, not a sprite
+MIN_SPAN = 4
+MANIFEST_JS = "frameManifest.js"
+LOADER_JS = "frameLoader.js"
+REPORT_NAME = "frame_manifest.json"
+FRAMES_WORKERS = max(1, int(os.getenv("FRAMES_WORKERS", "4")))
+# Above this content fraction the sheet has no transparent background to analyze
+OPAQUE_COVERAGE = 0.98
+# Max channel difference from the background colour that still counts as background
+BACKGROUND_DISTANCE = int(os.getenv("FRAMES_BACKGROUND_DISTANCE", "24"))
+
+logger = get_logger("frames")
+
+# Wraps window.loadAssets (before atlasLoader.js does): spritesheets whose declared
+# frame size cuts through sprites get the detected size, and generateFrameNumbers
+# drops empty cells, falling back to the nearest drawn frame so no animation is blank.
+FRAME_LOADER_TEMPLATE = '''// Auto-generated by backend: fixes spritesheet frame sizes and skips empty frames
+// using the grid detected from each sheet's alpha channel.
+// Requires frameManifest.js and loadAssets.js to be loaded first, atlasLoader.js after.
+(function () {
+    var manifest = window.FRAME_MANIFEST;
+    var loadAssets = window.loadAssets;
+    if (!manifest || !loadAssets) return;
+    var sheets = {};
+
+    function normalize(url) {
+        return typeof url === 'string' ? url.replace(/^\\.?\\//, '').split('?')[0] : url;
+    }
+    function nearestFrame(entry, index) {
+        var best = null;
+        entry.filled.forEach(function (frame) {
+            if (best === null || Math.abs(frame - index) < Math.abs(best - index)) best = frame;
+        });
+        return best;
+    }
+    function patchAnimations(anims) {
+        if (anims.__frameManifest) return;
+        anims.__frameManifest = true;
+        var generate = anims.generateFrameNumbers;
+        anims.generateFrameNumbers = function (key, config) {
+            var frames = generate.apply(anims, arguments);
+            var entry = sheets[key];
+            if (!entry || !entry.filled.length) return frames;
+            var kept = frames.filter(function (f) { return entry.filled.indexOf(f.frame) >= 0; });
+            if (kept.length) return kept;
+            var start = (config && (config.frames ? config.frames[0] : config.start)) || 0;
+            return [{ key: key, frame: nearestFrame(entry, start) }];
+        };
+    }
+
+    window.loadAssets = function (scene) {
+        var load = scene.load;
+        var spritesheet = load.spritesheet;
+        patchAnimations(scene.anims);
+
+        load.spritesheet = function (key, url, config) {
+            var entry = manifest.sheets[normalize(url)];
+            if (typeof key === 'string' && entry) {
+                sheets[key] = entry;
+                if (entry.override) {
+                    config = Object.assign({}, config || {}, {
+                        frameWidth: entry.frameWidth, frameHeight: entry.frameHeight });
+                }
+                return spritesheet.call(load, key, url, config);
+            }
+            return spritesheet.apply(load, arguments);
+        };
+        try {
+            loadAssets(scene);
+        } finally {
+            load.spritesheet = spritesheet;
+        }
+    };
+})();
+'''
+
+
+def _spans(occupied):
+    """(start, end) of each run of True in a 1-D mask, ignoring runs shorter than MIN_SPAN"""
+    padded = np.concatenate(([False], occupied, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return [(int(s), int(e)) for s, e in zip(edges[::2], edges[1::2]) if e - s >= MIN_SPAN]
+
+
+def _cuts(occupied, step):
+    """Number of cell borders every step pixels that run through content"""
+    borders = np.arange(step, len(occupied), step)
+    return int(np.count_nonzero(occupied[borders - 1] & occupied[borders]))
+
+
+def _fits(spans, cell):
+    """True if every span lies inside a single cell of width cell (1px slack)"""
+    centres = np.array([(start + end) / 2 for start, end in spans])
+    index = np.floor(centres / cell)
+    starts = np.array([start for start, _ in spans])
+    ends = np.array([end for _, end in spans])
+    return bool(np.all(starts >= index * cell - 1) and np.all(ends <= (index + 1) * cell + 1))
+
+
+def _even_grid(spans, length):
+    """
+    Cell size of the even division of an axis that puts every span inside a single
+    cell, or None. The cell count is guessed from the spacing of span centres, so
+    rows or columns left partly empty still line up.
+    """
+    if not spans:
+        return None
+    centres = np.array([(start + end) / 2 for start, end in spans])
+    pitch = np.median(np.diff(centres)) if len(spans) > 1 else length
+    guess = max(1, round(length / pitch)) if pitch > 0 else 1
+    for count in (guess, guess + 1, guess - 1):
+        if count >= len(spans) and _fits(spans, length / count):
+            return int(length / count)
+    return None
+
+
+def content_mask(image):
+    """
+    Boolean mask of drawn pixels. Uses alpha when the sheet has a transparent
+    background, otherwise distance from the background colour sampled at the
+    corners (image models often ignore "transparent background").
+    """
+    if "A" in image.getbands() or "transparency" in image.info:
+        mask = np.asarray(image.convert("RGBA").getchannel("A")) > ALPHA_THRESHOLD
+        if mask.mean() <= OPAQUE_COVERAGE:
+            return mask
+    rgb = image.convert("RGB")
+    pixels = np.asarray(rgb)
+    corners = np.concatenate([pixels[:4, :4], pixels[:4, -4:], pixels[-4:, :4], pixels[-4:, -4:]]).reshape(-1, 3)
+    background = tuple(int(c) for c in np.median(corners, axis=0))
+    # Per-channel |pixel - background| and the max over channels, done in Pillow's C loops
+    red, green, blue = ImageChops.difference(rgb, Image.new("RGB", rgb.size, background)).split()
+    distance = ImageChops.lighter(ImageChops.lighter(red, green), blue)
+    return np.asarray(distance) > BACKGROUND_DISTANCE
+
+
+def detect_grid(mask):
+    """
+    (frame_w, frame_h) of the evenly spaced grid the drawn content sits in, or None.
+    Rows are split on empty horizontal gutters first, then columns inside each row,
+    since sprites in different rows rarely leave a gutter through the whole sheet.
+    """
+    height, width = mask.shape
+    cell_h = _even_grid(_spans(mask.any(axis=1)), height)
+    if not cell_h:
+        return None
+    rows = max(1, height // cell_h)
+    bands = [_spans(mask[row * cell_h:(row + 1) * cell_h].any(axis=0)) for row in range(rows)]
+    bands = [spans for spans in bands if spans]
+    candidates = sorted({cell for cell in (_even_grid(spans, width) for spans in bands) if cell})
+    for cell_w in candidates:
+        if all(_fits(spans, cell_w) for spans in bands):
+            return cell_w, cell_h
+    return None
+
+
+def analyze_mask(mask, declared=None):
+    """
+    Frame grid of a spritesheet from its content mask. The detected grid is used
+    when nothing is declared, or when the declared (frame_w, frame_h) cuts through
+    more sprites than the detected one does. Returns the grid and its empty cells.
+    """
+    height, width = mask.shape
+    columns_used = mask.any(axis=0)
+    rows_used = mask.any(axis=1)
+    detected = detect_grid(mask)
+
+    source = "whole"
+    frame = (width, height)
+    if declared and declared[0] <= width and declared[1] <= height:
+        frame, source = tuple(declared), "declared"
+        declared_cuts = _cuts(columns_used, frame[0]) + _cuts(rows_used, frame[1])
+        # A 1x1 "grid" only means the sprites touch, not that the sheet holds one frame
+        if declared_cuts and detected and detected != frame and detected != (width, height):
+            if _cuts(columns_used, detected[0]) + _cuts(rows_used, detected[1]) < declared_cuts:
+                frame, source = detected, "detected"
+    elif detected:
+        frame, source = detected, "detected"
+
+    frame_w, frame_h = frame
+    columns, rows = max(1, width // frame_w), max(1, height // frame_h)
+    # Content fraction of every cell in one pass: (rows, frame_h, columns, frame_w) -> (rows, columns)
+    cells = mask[:rows * frame_h, :columns * frame_w].reshape(rows, frame_h, columns, frame_w)
+    coverage = cells.mean(axis=(1, 3)).ravel()
+    # Nothing told apart from the background (e.g. a flat placeholder): no cell is known to be empty
+    empty = np.flatnonzero(coverage < EMPTY_COVERAGE) if mask.any() else np.array([], dtype=int)
+    return {
+        "frameWidth": int(frame_w),
+        "frameHeight": int(frame_h),
+        "columns": int(columns),
+        "rows": int(rows),
+        "frames": int(columns * rows),
+        "empty": [int(i) for i in empty],
+        "filled": [int(i) for i in np.setdiff1d(np.arange(columns * rows), empty)],
+        "source": source,
+        "declared": list(declared) if declared else None,
+        "override": bool(declared) and source == "detected",
+    }
+
+
+def analyze_sheet(path, declared=None):
+    """analyze_mask for the image at path"""
+    with Image.open(path) as img:
+        img.load()
+        mask = content_mask(img)
+    return analyze_mask(mask, declared)
+
+
+def build_frame_manifest(phaser_dir, plan, game_folder=None):
+    """
+    Analyze every character/effect image in phaser/assets and write frameManifest.js and
+    frameLoader.js into phaser_dir, plus frame_manifest.json into game_folder (defaults
+    to the parent of phaser_dir). Declared frame sizes come from the production plan.
+    Returns a summary dict.
+    """
+    game_folder = game_folder or os.path.dirname(phaser_dir)
+    grids = sheet_grids(plan) if isinstance(plan, dict) else {}
+    items = []
+    for folder in FRAME_FOLDERS:
+        folder_path = os.path.join(phaser_dir, "assets", folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            if name.lower().endswith(".png"):
+                items.append((f"{folder}/{name}", os.path.join(folder_path, name)))
+
+    def run(item):
+        rel, path = item
+        grid = grids.get(rel)
+        try:
+            return analyze_sheet(path, grid["frame"] if grid else None)
+        except Exception as e:
+            logger.warning(f"Could not analyze frames of {rel}: {e}")
+            return None
+
+    # PNG decoding and the NumPy reductions release the GIL, so threads scale across cores
+    with ThreadPoolExecutor(max_workers=FRAMES_WORKERS) as pool:
+        entries = list(pool.map(run, items))
+    sheets = {f"assets/{rel}": entry for (rel, _), entry in zip(items, entries) if entry is not None}
+
+    manifest = {"sheets": sheets}
+    with open(os.path.join(phaser_dir, MANIFEST_JS), "w", encoding="utf-8") as f:
+        f.write("// Auto-generated by backend: detected spritesheet frame grids\n")
+        f.write(f"window.FRAME_MANIFEST = {json.dumps(manifest, indent=2)};\n")
+    with open(os.path.join(phaser_dir, LOADER_JS), "w", encoding="utf-8") as f:
+        f.write(FRAME_LOADER_TEMPLATE)
+    with open(os.path.join(game_folder, REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return {
+        "sheets": len(sheets),
+        "overridden": sum(entry["override"] for entry in sheets.values()),
+        "empty_frames": sum(len(entry["empty"]) for entry in sheets.values()),
+    }
@@ -4,15 +4,247 @@ import requests
 import os
 import json
 import re
+import time
+import random
+import struct
+import asyncio
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from services.cache import response_cache
+from services.jobs import PRIORITY_BULK, PRIORITY_INTERACTIVE
+from services.ratelimit import PriorityTokenBucket, call_priority
+from services.metrics import gemini_request_seconds, gemini_retries_total, gemini_rate_limit_wait_seconds
+from services.resize import fit_image, grid_layout
+from services.logs import get_logger
 from google import genai
-from google.genai import types
+from google.genai import types, errors as genai_errors
+import httpx
 from PIL import Image
 from io import BytesIO
 import base64
 
 
 API_KEY = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=API_KEY)
+# Point both the REST calls and the genai client at another endpoint (e.g. benchmark.py's fake server)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+TEXT_MODEL = "gemini-2.5-flash"
+IMAGE_MODEL = "gemini-2.0-flash-preview-image-generation"
+
+# Worker pool for the *_async wrappers below, so blocking Gemini HTTP calls
+# never run on the FastAPI event loop
+GEMINI_WORKERS = max(1, int(os.getenv("GEMINI_WORKERS", "8")))
+_executor = ThreadPoolExecutor(max_workers=GEMINI_WORKERS, thread_name_prefix="gemini")
+# Interactive calls get their own threads so they never queue behind bulk generation
+_interactive_executor = ThreadPoolExecutor(
+    max_workers=max(1, int(os.getenv("GEMINI_INTERACTIVE_WORKERS", "2"))), thread_name_prefix="gemini-interactive")
+
+# Requests per minute (and burst) allowed per model, shared by every caller in this process.
+# Each retry takes a token as well. 0 disables the limit.
+GEMINI_TEXT_RPM = float(os.getenv("GEMINI_TEXT_RPM", "60"))
+GEMINI_TEXT_BURST = float(os.getenv("GEMINI_TEXT_BURST", "5"))
+GEMINI_IMAGE_RPM = float(os.getenv("GEMINI_IMAGE_RPM", "30"))
+GEMINI_IMAGE_BURST = float(os.getenv("GEMINI_IMAGE_BURST", "4"))
+text_limiter = PriorityTokenBucket(TEXT_MODEL, GEMINI_TEXT_RPM, GEMINI_TEXT_BURST)
+image_limiter = PriorityTokenBucket(IMAGE_MODEL, GEMINI_IMAGE_RPM, GEMINI_IMAGE_BURST)
+
+# Seconds to establish a connection / to wait for a response (generation is slow)
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "10"))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "180"))
+# Attempts per call after the first one, and the backoff window (full jitter)
+GEMINI_MAX_RETRIES = max(0, int(os.getenv("GEMINI_MAX_RETRIES", "4")))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
+# Retries across all calls may add at most this fraction on top of normal traffic,
+# so an outage doesn't turn every request into GEMINI_MAX_RETRIES + 1 requests
+GEMINI_RETRY_BUDGET_RATIO = float(os.getenv("GEMINI_RETRY_BUDGET_RATIO", "0.2"))
+GEMINI_RETRY_BUDGET_MIN = float(os.getenv("GEMINI_RETRY_BUDGET_MIN", "10"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = get_logger("gemini")
+
+# One keep-alive connection pool shared by all text calls
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=GEMINI_WORKERS))
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=GEMINI_WORKERS))
+
+client = genai.Client(api_key=API_KEY, http_options=types.HttpOptions(
+    base_url=GEMINI_BASE_URL, timeout=int((GEMINI_CONNECT_TIMEOUT + GEMINI_READ_TIMEOUT) * 1000)))
+
+
+class RetryBudget:
+    """
+    Token bucket for retries: every first attempt deposits ratio tokens, every retry
+    withdraws one. Starts (and is capped) at min_tokens so quiet periods can still retry.
+    """
+
+    def __init__(self, ratio=GEMINI_RETRY_BUDGET_RATIO, min_tokens=GEMINI_RETRY_BUDGET_MIN):
+        self.ratio = ratio
+        self.max_tokens = max(min_tokens, 1.0)
+        self.tokens = self.max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CallMetrics:
+    """Per-call-name counters and recent latencies for Gemini requests"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, ok, attempts):
+        with self._lock:
+            entry = self._calls.setdefault(name, {
+                "calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                "latencies": deque(maxlen=self.window)})
+            entry["calls"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["retries"] += attempts - 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["latencies"].append(seconds)
+
+    def stats(self):
+        result = {}
+        with self._lock:
+            for name, entry in self._calls.items():
+                latencies = sorted(entry["latencies"])
+                pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+                result[name] = {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "retries": entry["retries"],
+                    "avg_seconds": round(entry["total_seconds"] / entry["calls"], 3),
+                    "p50_seconds": pick(0.5),
+                    "p95_seconds": pick(0.95),
+                    "max_seconds": round(entry["max_seconds"], 3),
+                }
+        return result
+
+
+retry_budget = RetryBudget()
+call_metrics = CallMetrics()
+
+
+def _backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter; a server Retry-After wins if it is longer"""
+    delay = random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+    try:
+        return max(delay, min(GEMINI_BACKOFF_MAX, float(retry_after)))
+    except (TypeError, ValueError):
+        return delay
+
+
+def _retry_after(error):
+    """(retryable, Retry-After header) for an exception raised by a Gemini call"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRY_STATUSES, error.response.headers.get("Retry-After")
+    if isinstance(error, genai_errors.APIError):
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        return error.code in RETRY_STATUSES, headers.get("Retry-After")
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          httpx.TransportError)):
+        return True, None
+    return False, None
+
+
+def call_with_retries(name, func, *args, limiter=None, max_retries=None, **kwargs):
+    """
+    Run one Gemini request, retrying transient failures (429, 5xx, timeouts, dropped
+    connections) with jittered exponential backoff while the shared retry budget allows.
+    Every attempt first takes a token from limiter at the thread's call priority.
+    Latency (including time spent waiting for tokens) and attempt counts are recorded
+    in call_metrics under name.
+    """
+    max_retries = GEMINI_MAX_RETRIES if max_retries is None else max_retries
+    retry_budget.deposit()
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            if limiter is not None:
+                gemini_rate_limit_wait_seconds.observe(limiter.acquire(), model=limiter.name)
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            call_metrics.record(name, elapsed, True, attempt + 1)
+            gemini_request_seconds.observe(elapsed, call=name, outcome="ok")
+            return result
+        except Exception as e:
+            retryable, retry_after = _retry_after(e)
+            if not retryable or attempt >= max_retries or not retry_budget.withdraw():
+                elapsed = time.perf_counter() - start
+                call_metrics.record(name, elapsed, False, attempt + 1)
+                gemini_request_seconds.observe(elapsed, call=name, outcome="error")
+                raise
+            delay = _backoff_delay(attempt, retry_after)
+            logger.warning(f"{name} attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+            gemini_retries_total.inc(call=name)
+            time.sleep(delay)
+            attempt += 1
+
+
+def _post_json(url, body, headers):
+    res = session.post(url, json=body, headers=headers, timeout=(GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT))
+    logger.debug(f"Status code: {res.status_code}")
+    res.raise_for_status()
+    return res
+
+
+def _call_at_priority(priority, func, *args, **kwargs):
+    with call_priority(priority):
+        return func(*args, **kwargs)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _png_size(data):
+    """(width, height) from a PNG's IHDR chunk, without decoding the image"""
+    return struct.unpack(">II", data[16:24])
+
+def write_image_bytes(data: bytes, output_path: str, size=None, grid=None):
+    """
+    Save image bytes returned by Gemini to output_path as PNG, through a temp file and
+    rename so readers never see a partial file. PNG data that already has the wanted
+    size is written as-is; only other formats or a size mismatch are decoded and
+    resampled (premultiplied LANCZOS, snapped onto grid for spritesheets).
+    """
+    tmp_path = f"{output_path}.part"
+    try:
+        if data[:8] == PNG_SIGNATURE and len(data) >= 24:
+            png_size = _png_size(data)
+            wanted = grid_layout(grid, size or png_size)[1] if grid else size
+            as_is = wanted is None or png_size == tuple(wanted)
+        else:
+            as_is = False
+        if as_is:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        else:
+            with Image.open(BytesIO(data)) as image:
+                fit_image(image, size, grid).save(tmp_path, format="PNG")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+async def _run_in_pool(func, *args, priority=PRIORITY_BULK, **kwargs):
+    loop = asyncio.get_running_loop()
+    executor = _interactive_executor if priority <= PRIORITY_INTERACTIVE else _executor
+    return await loop.run_in_executor(executor, functools.partial(_call_at_priority, priority, func, *args, **kwargs))
 
 def safe_json_loads(json_text: str) -> dict:
     """
@@ -21,7 +253,7 @@ def safe_json_loads(json_text: str) -> dict:
     try:
         return json.loads(json_text)
     except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
+        logger.warning(f"Error parsing JSON: {e}")
         raise ValueError(f"Failed to parse JSON: {json_text[:500]}...") from e
 
 def extract_json_from_markdown(text: str) -> str:
@@ -41,15 +273,16 @@ def extract_json_from_markdown(text: str) -> str:
     # If no code blocks found, return the original text
     return text.strip()
 
-def generate_game_blueprint(prompt: str) -> dict:
+def generate_game_blueprint(prompt: str, use_cache: bool = True) -> dict:
     """
     Generates a game blueprint based on the provided prompt.
+    Identical prompts are answered from the response cache unless use_cache is False.
     """
-    print("[Gemini] Generating game blueprint...")
+    logger.debug("Generating game blueprint...")
     if not API_KEY:
         raise ValueError("API key not found in environment variables.")
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={API_KEY}"
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{TEXT_MODEL}:generateContent?key={API_KEY}"
 
     body = {
         "contents": [{
@@ -166,10 +399,15 @@ CRITICAL:
         "Content-Type": "application/json"
     }
 
+    cache_key = response_cache.key(TEXT_MODEL, body)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Cache hit {cache_key[:12]}")
+            return cached
+
     try:
-        res = requests.post(url, json=body, headers=headers)
-        print(f"[Gemini] Status code: {res.status_code}")
-        res.raise_for_status()
+        res = call_with_retries("blueprint", _post_json, url, body, headers, limiter=text_limiter)
         data = res.json()
 
         raw_text = data['candidates'][0]['content']['parts'][0]['text']
@@ -178,14 +416,15 @@ CRITICAL:
 
         try:
             parsed_json = safe_json_loads(json_text)
-            print(f"[Gemini] Successfully parsed JSON with keys: {list(parsed_json.keys())}")
+            logger.debug(f"Parsed blueprint JSON with keys: {list(parsed_json.keys())}")
+            response_cache.set(cache_key, parsed_json)
             return parsed_json
         except ValueError as e:
-            print(f"[Gemini] Error parsing extracted JSON: {e}")
+            logger.warning(f"Error parsing extracted blueprint JSON: {e}")
             raise
 
     except requests.exceptions.RequestException as e:
-        print(f"[Gemini] RequestException: {e}")
+        logger.warning(f"RequestException: {e}")
         error_message = f"An error occurred while making the API request: {e}"
         if hasattr(e, 'response') and e.response is not None:
             error_message += f". Response text: {e.response.text}"
@@ -193,11 +432,12 @@ CRITICAL:
 
 
 
-def generate_production_plan(blueprint: dict) -> dict:
+def generate_production_plan(blueprint: dict, use_cache: bool = True) -> dict:
     """
     Generates a production plan based on the provided blueprint.
+    Identical blueprints are answered from the response cache unless use_cache is False.
     """
-    print("[Gemini] Generating production plan...")
+    logger.debug("Generating production plan...")
     
     system_prompt = f"""
 You are a Game Tech Architect AI. You will receive a JSON-based blueprint for a 2D browser-based game. This blueprint defines characters, scenes, gameplay logic, and UI structure.
@@ -443,7 +683,7 @@ CRITICAL:
 """
 
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={API_KEY}"
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{TEXT_MODEL}:generateContent?key={API_KEY}"
 
     body = {
         "contents": [
@@ -459,33 +699,36 @@ CRITICAL:
         "Content-Type": "application/json"
     }
 
+    cache_key = response_cache.key(TEXT_MODEL, body)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Cache hit {cache_key[:12]}")
+            return cached
+
     try:
-        res = requests.post(url, json=body, headers=headers)
-        print(f"[Gemini] Status code: {res.status_code}")
-        # print(f"[Gemini] Response text: {res.text[:1000]}")  # Print up to 1000 chars
-        res.raise_for_status()
+        res = call_with_retries("production_plan", _post_json, url, body, headers, limiter=text_limiter)
         data = res.json()
         
         # Get the raw text response from Gemini
         raw_text = data['candidates'][0]['content']['parts'][0]['text']
-        # print(f"[Gemini] Raw text response: {raw_text[:500]}...")
         
         # Extract JSON from markdown code blocks
         json_text = extract_json_from_markdown(raw_text)
-        print(f"[Gemini] Extracted JSON length: {len(json_text)} characters")
+        logger.debug(f"Extracted production plan JSON: {len(json_text)} characters")
         
         # Parse the extracted JSON
         try:
             parsed_json = safe_json_loads(json_text)
-            print(f"[Gemini] Successfully parsed production plan JSON with keys: {list(parsed_json.keys())}")
+            logger.debug(f"Parsed production plan JSON with keys: {list(parsed_json.keys())}")
+            response_cache.set(cache_key, parsed_json)
             return parsed_json
         except Exception as e:
-            print(f"[Gemini] Error parsing production plan JSON: {e}")
-            print(f"[Gemini] First 1000 characters of extracted text: {json_text[:1000]}")
+            logger.warning(f"Error parsing production plan JSON: {e}; first 1000 characters: {json_text[:1000]}")
             raise ValueError(f"Failed to parse production plan JSON. Error: {str(e)}") from e
             
     except requests.exceptions.RequestException as e:
-        print(f"[Gemini] RequestException: {e}")
+        logger.warning(f"RequestException: {e}")
         error_message = f"An error occurred while making the API request: {e}"
         if hasattr(e, 'response') and e.response is not None:
             error_message += f". Response text: {e.response.text}"
@@ -497,8 +740,9 @@ def generate_image(prompt: str, output_path: str):
     contents = prompt
 
 
-    response = client.models.generate_content(
-        model="gemini-2.0-flash-preview-image-generation",
+    response = call_with_retries(
+        "image", client.models.generate_content, limiter=image_limiter,
+        model=IMAGE_MODEL,
         contents=contents,
         config=types.GenerateContentConfig(
             response_modalities=['TEXT', 'IMAGE']
@@ -507,38 +751,43 @@ def generate_image(prompt: str, output_path: str):
 
     found_image = False
     for part in response.candidates[0].content.parts:
-        # Log what we got for debugging
-        print("Gemini part..")
         if getattr(part, "inline_data", None) is not None:
             mime_type = getattr(part.inline_data, "mime_type", "")
             if mime_type.startswith("image/") and part.inline_data.data:
                 try:
-                    img_bytes = part.inline_data.data
-                    image = Image.open(BytesIO(img_bytes))
-                    image.save(output_path)
-                    print(f"Saved image to {output_path}")
+                    write_image_bytes(part.inline_data.data, output_path)
+                    logger.debug(f"Saved image to {output_path}")
                     found_image = True
+                    break
                 except Exception as e:
-                    print(f"Failed to decode or save image: {e}")
+                    logger.warning(f"Failed to decode or save image: {e}")
             else:
-                print(f"inline_data present but not an image (mime_type={mime_type})")
+                logger.debug(f"inline_data present but not an image (mime_type={mime_type})")
         elif getattr(part, "text", None) is not None:
-            print("Gemini text part:", part.text)
+            logger.debug(f"Text part: {part.text}")
 
     if not found_image:
         raise ValueError("No valid image data returned by Gemini for this prompt.")
 
-def generate_asset_image(description: str, output_path: str, width: int, height: int, asset_type: str):
+def generate_asset_image(description: str, output_path: str, width: int, height: int, asset_type: str,
+                         grid=None):
     """
     Generate an image using Gemini for a specific asset type (background, character, etc.)
-    and save it to output_path with the given width and height.
+    and save it to output_path with the given width and height. With a spritesheet grid
+    ({"frame": (w, h), "sheet": (w, h) or None}) the result is snapped onto whole frames.
     """
+    grid_line = ""
+    if grid:
+        (columns, rows), (width, height) = grid_layout(grid, (width, height))
+        frame_w, frame_h = grid["frame"]
+        grid_line = (f"\n- **Frame Grid**: {columns} columns x {rows} rows of evenly spaced {frame_w}x{frame_h} frames, "
+                     f"one pose per frame, nothing crossing frame borders")
     prompt = f"""
 You are a professional 2D game artist specializing in stylized asset creation for platformers, RPGs, and adventure games. Your task is to generate a visually appealing, production-quality image asset based on the following details:
 
 - **Asset Type**: {asset_type}
 - **Asset Description**: {description}
-- **Required Dimensions**: {width}x{height} pixels (exact)
+- **Required Dimensions**: {width}x{height} pixels (exact){grid_line}
 - **Style**: Consistent with modern 2D game aesthetics (e.g., clean lines, balanced color palette, stylized shading). The asset should match the visual coherence of a high-quality 2D game world.
 - **Purpose**: This asset will be used directly in a playable game, so it must blend seamlessly with other game assets of the same genre.
 - **Technical Constraints**:
@@ -552,8 +801,9 @@ Generate only one image without any explanation or text in the output. The resul
 
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.0-flash-preview-image-generation",
+    response = call_with_retries(
+        "asset_image", client.models.generate_content, limiter=image_limiter,
+        model=IMAGE_MODEL,
         contents=prompt,
         config=types.GenerateContentConfig(
             response_modalities=['TEXT', 'IMAGE']
@@ -565,19 +815,44 @@ Generate only one image without any explanation or text in the output. The resul
             mime_type = getattr(part.inline_data, "mime_type", "")
             if mime_type.startswith("image/") and part.inline_data.data:
                 try:
-                    img_bytes = part.inline_data.data
-                    image = Image.open(BytesIO(img_bytes))
-                    image = image.resize((width, height))
-                    image.save(output_path)
+                    write_image_bytes(part.inline_data.data, output_path, size=(width, height), grid=grid)
                     found_image = True
+                    break
                 except Exception as e:
-                    print(f"Failed to decode or save image: {e}")
+                    logger.warning(f"Failed to decode or save image: {e}")
             else:
-                print(f"inline_data present but not an image (mime_type={mime_type})")
+                logger.debug(f"inline_data present but not an image (mime_type={mime_type})")
         elif getattr(part, "text", None) is not None:
-            print("Gemini text part:", part.text)
+            logger.debug(f"Text part: {part.text}")
     if not found_image:
         raise ValueError("No valid image data returned by Gemini for this prompt.")
 
+async def generate_game_blueprint_async(prompt: str, use_cache: bool = True, priority: int = PRIORITY_BULK) -> dict:
+    """
+    Async variant of generate_game_blueprint, runs on the Gemini worker pool.
+    """
+    return await _run_in_pool(generate_game_blueprint, prompt, use_cache=use_cache, priority=priority)
+
+async def generate_production_plan_async(blueprint: dict, use_cache: bool = True, priority: int = PRIORITY_BULK) -> dict:
+    """
+    Async variant of generate_production_plan, runs on the Gemini worker pool.
+    """
+    return await _run_in_pool(generate_production_plan, blueprint, use_cache=use_cache, priority=priority)
+
+async def generate_image_async(prompt: str, output_path: str, priority: int = PRIORITY_BULK):
+    """
+    Async variant of generate_image, runs on the Gemini worker pool.
+    """
+    return await _run_in_pool(generate_image, prompt, output_path, priority=priority)
+
+async def generate_asset_image_async(description: str, output_path: str, width: int, height: int, asset_type: str,
+                                     grid=None, priority: int = PRIORITY_INTERACTIVE):
+    """
+    Async variant of generate_asset_image, runs on the Gemini worker pool.
+    Used for edits a user is waiting on, so it runs at interactive priority by default.
+    """
+    return await _run_in_pool(generate_asset_image, description, output_path, width, height, asset_type,
+                              grid=grid, priority=priority)
+
 # Example improved prompt for character sprite sheet generation:
 # "Create a 2D character sprite sheet for a fighting game. The character should be in a side view, with 12 columns and 5 rows (total 60 frames), each frame exactly 85x117 pixels. The character is [Character Name] (Dragon Ball Z, Super Saiyan), in anime style, with vibrant colors and high detail. Each row should represent a different action (idle, walk, punch, kick, special attack). Each frame should be evenly spaced, with a fully transparent background and no overlap between frames. The character should be centered in each frame, with consistent lighting and proportions. No background, only the character. The sprite sheet should be ready for use in a Phaser.js game."
\ No newline at end of file
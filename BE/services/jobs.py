@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from services.logs import get_logger
+
+# SQLite file that keeps the job queue across restarts
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join("data", "jobs.db"))
+# Number of jobs executed at the same time
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+# Extra workers that only take interactive jobs, so edits never wait behind bulk generation
+JOB_INTERACTIVE_WORKERS = max(0, int(os.getenv("JOB_INTERACTIVE_WORKERS", "1")))
+
+# Lower value runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+logger = get_logger("jobs")
+
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobQueue:
+    """
+    Small SQLite-backed job queue. Jobs are plain dicts with
+    id, kind, payload, status, priority, attempts, error, result and timestamps.
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        self.db_path = db_path
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, created_at)")
+        # Wakes idle workers when a job is enqueued
+        self._wakeup = None
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def enqueue(self, job_id, kind, payload, priority=PRIORITY_BULK):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, priority, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload), priority, time.time()))
+        self._notify()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def list(self, status=None, limit=50):
+        query = "SELECT * FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self):
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def claim(self, max_priority=None):
+        """Atomically move the next queued job (at most max_priority, if given) to running and return it"""
+        query = "SELECT id FROM jobs WHERE status = 'queued'"
+        params = []
+        if max_priority is not None:
+            query += " AND priority <= ?"
+            params.append(max_priority)
+        with self._lock, self._conn:
+            row = self._conn.execute(query + " ORDER BY priority, created_at LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, error = NULL WHERE id = ?",
+                (time.time(), row["id"]))
+        return self.get(row["id"])
+
+    def finish(self, job_id, status, error=None, result=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = COALESCE(?, result), finished_at = ? WHERE id = ?",
+                (status, error, json.dumps(result) if result is not None else None, time.time(), job_id))
+
+    def set_result(self, job_id, result):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET result = ? WHERE id = ?", (json.dumps(result), job_id))
+
+    def cancel(self, job_id):
+        """Mark a queued or running job as cancelled. Returns False if it already finished."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id))
+        return cur.rowcount > 0
+
+    def retry(self, job_id):
+        """Put a failed or cancelled job back on the queue. Returns False if it is still active."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', error = NULL, started_at = NULL, finished_at = NULL "
+                "WHERE id = ? AND status IN ('failed', 'cancelled')",
+                (job_id,))
+        if cur.rowcount:
+            self._notify()
+        return cur.rowcount > 0
+
+    def requeue_interrupted(self):
+        """Jobs left running by a previous process go back on the queue"""
+        with self._lock, self._conn:
+            cur = self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        return cur.rowcount
+
+
+class JobWorkerPool:
+    """
+    Runs queued jobs on N asyncio workers, plus interactive_workers that only take
+    jobs at PRIORITY_INTERACTIVE. handlers maps job kind -> async function(job)
+    whose return value is stored as the job result.
+    """
+
+    def __init__(self, queue, handlers, workers=JOB_WORKERS, poll_interval=5.0,
+                 interactive_workers=JOB_INTERACTIVE_WORKERS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.interactive_workers = interactive_workers
+        self.poll_interval = poll_interval
+        self._worker_tasks = []
+        self._running = {}  # job id -> asyncio.Task
+
+    def start(self):
+        self.queue._wakeup = asyncio.Event()
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted job(s)")
+        for i in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(i)))
+        for i in range(self.interactive_workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(self.workers + i, PRIORITY_INTERACTIVE)))
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def cancel(self, job_id):
+        """Cancel a job in the queue, interrupting it if a worker is running it"""
+        if not self.queue.cancel(job_id):
+            return False
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return True
+
+    async def _worker(self, index, max_priority=None):
+        wakeup = self.queue._wakeup
+        while True:
+            wakeup.clear()
+            job = self.queue.claim(max_priority)
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.queue.finish(job["id"], "failed", error=f"Unknown job kind: {job['kind']}")
+            return
+        logger.info(f"Running job {job['id']} ({job['kind']}, attempt {job['attempts']})")
+        task = asyncio.create_task(handler(job))
+        self._running[job["id"]] = task
+        try:
+            result = await task
+            self.queue.finish(job["id"], "completed", result=result)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # The worker itself is shutting down; leave the job running so it is requeued
+                task.cancel()
+                raise
+            self.queue.finish(job["id"], "cancelled")
+        except Exception as e:
+            self.queue.finish(job["id"], "failed", error=str(e))
+        finally:
+            self._running.pop(job["id"], None)
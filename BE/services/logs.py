@@ -0,0 +1,64 @@
+import os
+import queue
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Level for the app's loggers (DEBUG, INFO, WARNING, ...)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Below WARNING, loggers in SAMPLED_LOGGERS emit only every Nth record per message
+LOG_SAMPLE_EVERY = max(1, int(os.getenv("LOG_SAMPLE_EVERY", "50")))
+SAMPLED_LOGGERS = ("game_builder.progress",)
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+ROOT_LOGGER = "game_builder"
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class SampleFilter(logging.Filter):
+    """
+    Passes the first and then every Nth record per (logger, message template);
+    WARNING and above always pass. Log with %-style arguments so records for
+    different requests share a template.
+    """
+
+    def __init__(self, every=LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            seen = self._counts.get(key, 0)
+            self._counts[key] = seen + 1
+        return seen % self.every == 0
+
+
+def setup_logging(level=LOG_LEVEL):
+    """
+    Send game_builder.* records through a queue to a background thread that does the
+    console I/O, so request handlers never block on a slow terminal or pipe.
+    Returns the started QueueListener; stop() it on shutdown to flush.
+    """
+    records = queue.SimpleQueue()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = QueueListener(records, console, respect_handler_level=True)
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    root.handlers = [QueueHandler(records)]
+    root.propagate = False
+    for name in SAMPLED_LOGGERS:
+        logger = logging.getLogger(name)
+        if not any(isinstance(f, SampleFilter) for f in logger.filters):
+            logger.addFilter(SampleFilter())
+    listener.start()
+    return listener
@@ -0,0 +1,185 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from services.logs import get_logger
+
+# Latency buckets in seconds; generation calls range from sub-second cache hits to minutes
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+logger = get_logger("metrics")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_items(items))
+        return lines
+
+    def _render_items(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge or counter read at scrape time from collect(), which returns
+    [(labels dict, value), ...]. Used for state other objects already track.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), collect=None, kind="gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def render(self):
+        try:
+            samples = self.collect()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} could not be collected: {e}")
+            samples = []
+        with self._lock:
+            self._values = {self._key(labels): value for labels, value in samples}
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry["counts"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the with block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_items(self, items):
+        lines = []
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {entry['count']}")
+            plain = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{plain} {entry['count']}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format (0.0.4)"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def callback(self, name, documentation, collect, labelnames=(), kind="gauge"):
+        return self.register(CallbackMetric(name, documentation, labelnames, collect, kind))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Generation pipeline
+stage_seconds = registry.histogram(
+    "game_stage_duration_seconds", "Time spent in each generation stage that actually ran", ("stage",))
+asset_seconds = registry.histogram(
+    "game_asset_duration_seconds", "Time to generate one asset image", ("folder", "outcome"))
+fallbacks_total = registry.counter(
+    "game_fallbacks_total", "Stages that fell back to built-in dummy output", ("stage",))
+placeholders_total = registry.counter(
+    "game_placeholders_total", "Assets replaced by a placeholder image after generation failed", ("folder",))
+
+# Gemini API
+gemini_request_seconds = registry.histogram(
+    "gemini_request_duration_seconds", "Gemini call latency including retries and rate-limit waits",
+    ("call", "outcome"))
+gemini_retries_total = registry.counter(
+    "gemini_retries_total", "Gemini attempts retried after a transient failure", ("call",))
+gemini_rate_limit_wait_seconds = registry.histogram(
+    "gemini_rate_limit_wait_seconds", "Time spent waiting for a rate-limit token", ("model",),
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
@@ -0,0 +1,322 @@
+import os
+import json
+import math
+import threading
+import numpy as np
+from PIL import Image
+from services import blobs
+from services.checkpoint import CHECKPOINT_NAME
+from services.logs import get_logger
+
+# Perceptual hashes of every image under games/*/assets, cached by file digest
+PHASH_INDEX_PATH = os.getenv("PHASH_INDEX_PATH", os.path.join("data", "phash_index.json"))
+# Images whose 64-bit hashes differ in at most this many bits are near-duplicates
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "8"))
+# Near-duplicates must also have about the same aspect ratio (max ratio between them)
+PHASH_MAX_ASPECT = 1.1
+# Images with fewer colours are flat fills or placeholders, never reused
+FLAT_COLORS = 16
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+# Files other steps are still writing (optimizer candidates, edit and download temp files)
+TEMP_MARKERS = (".opt.", ".q.", ".tmp.", ".part")
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+
+logger = get_logger("phash")
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis as an (n, n) matrix, so a 2-D DCT is two matrix products"""
+    k = np.arange(n)[:, None]
+    basis = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * math.sqrt(2 / n)
+    basis[0] /= math.sqrt(2)
+    return basis
+
+
+_DCT = _dct_matrix(SAMPLE_SIZE)
+
+
+def perceptual_hash(image):
+    """
+    64-bit pHash: the lowest 8x8 DCT frequencies of a 32x32 greyscale thumbnail,
+    one bit per coefficient above their median. Transparent pixels are composited
+    onto mid-grey first, so sprites compare by their drawn content.
+    """
+    if "A" in image.getbands() or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        image = Image.alpha_composite(Image.new("RGBA", rgba.size, (128, 128, 128, 255)), rgba)
+    thumb = image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(thumb, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only measures overall brightness
+    bits = low > np.median(low[1:])
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def image_info(path):
+    """{"phash": 16 hex digits, "size": [w, h], "flat": bool} for the image at path"""
+    with Image.open(path) as img:
+        size = list(img.size)
+        # JPEGs can be decoded straight at a reduced scale
+        img.draft("RGB", (SAMPLE_SIZE * 4, SAMPLE_SIZE * 4))
+        img.load()
+        flat = img.convert("RGB").getcolors(FLAT_COLORS) is not None
+        return {"phash": f"{perceptual_hash(img):016x}", "size": size, "flat": flat}
+
+
+def distances(hashes, others=None):
+    """Hamming distances between two lists of integer hashes as an (n, m) array"""
+    a = np.array(hashes, dtype=np.uint64)
+    b = a if others is None else np.array(others, dtype=np.uint64)
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.uint8)
+    # XOR every pair, then count set bits over the 8 bytes of each result
+    xor = (a[:, None] ^ b[None, :]).view(np.uint8).reshape(len(a), len(b), 8)
+    return np.unpackbits(xor, axis=2).sum(axis=2, dtype=np.uint8)
+
+
+def _similar_shape(a, b):
+    ratio_a, ratio_b = a[0] / max(1, a[1]), b[0] / max(1, b[1])
+    return max(ratio_a, ratio_b) / max(1e-9, min(ratio_a, ratio_b)) <= PHASH_MAX_ASPECT
+
+
+def _asset_prompts(game_folder):
+    """{"<folder>/<file>": {"prompt_hash", "ok", "at", "edited"?}} from the game's checkpoint, if any"""
+    try:
+        with open(os.path.join(game_folder, CHECKPOINT_NAME), "r", encoding="utf-8") as f:
+            assets = json.load(f).get("assets", {})
+        return assets if isinstance(assets, dict) else {}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+class PerceptualIndex:
+    """
+    data/phash_index.json: {"files": {path: {"mtime_ns", "bytes", "sha256"}},
+    "hashes": {sha256: image_info}}. A file is only re-read when its size or mtime
+    changes, and only hashed perceptually when its content is new, so rescanning
+    every game is cheap.
+    """
+
+    def __init__(self, path=PHASH_INDEX_PATH):
+        self.path = path
+        self.data = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                self.data = {}
+            self.data.setdefault("files", {})
+            self.data.setdefault("hashes", {})
+        return self.data
+
+    def save(self):
+        # Held through the write, since concurrent generations share the temp file name
+        with self._lock:
+            data = json.dumps(self._load())
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+
+    def lookup(self, path):
+        """Digest and image info for the file at path, computing only what is not cached"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            data = self._load()
+            cached = data["files"].get(key)
+        if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["bytes"] == stat.st_size:
+            digest = cached["sha256"]
+        else:
+            digest = blobs.file_digest(path)
+        with self._lock:
+            info = self.data["hashes"].get(digest)
+        if info is None:
+            info = image_info(path)
+        with self._lock:
+            self.data["files"][key] = {"mtime_ns": stat.st_mtime_ns, "bytes": stat.st_size, "sha256": digest}
+            self.data["hashes"][digest] = info
+        return dict(info, sha256=digest, bytes=stat.st_size)
+
+    def scan(self, base_dir="games"):
+        """
+        One entry per image under <base_dir>/*/assets: {"game", "file", "path", "sha256",
+        "bytes", "phash", "size", "flat", "prompt_hash", "ok"}. Saves the index.
+        """
+        entries = []
+        seen = set()
+        for game in sorted(os.listdir(base_dir)) if os.path.isdir(base_dir) else []:
+            assets_dir = os.path.join(base_dir, game, "assets")
+            if not os.path.isdir(assets_dir):
+                continue
+            prompts = _asset_prompts(os.path.join(base_dir, game))
+            for folder in sorted(os.listdir(assets_dir)):
+                folder_path = os.path.join(assets_dir, folder)
+                if not os.path.isdir(folder_path):
+                    continue
+                for name in sorted(os.listdir(folder_path)):
+                    if not name.lower().endswith(IMAGE_EXTENSIONS) or any(m in name for m in TEMP_MARKERS):
+                        continue
+                    path = os.path.join(folder_path, name)
+                    rel = f"{folder}/{name}"
+                    try:
+                        entry = self.lookup(path)
+                    except FileNotFoundError:
+                        continue
+                    except Exception as e:
+                        logger.warning(f"Could not hash {game}/{rel}: {e}")
+                        continue
+                    seen.add(os.path.abspath(path))
+                    record = prompts.get(rel) or {}
+                    # An edited asset no longer shows what its prompt describes
+                    matches_prompt = bool(record) and not record.get("edited")
+                    entries.append(dict(entry, game=game, file=rel, path=path,
+                                        prompt_hash=record.get("prompt_hash") if matches_prompt else None,
+                                        ok=bool(record.get("ok")) if matches_prompt else None))
+        with self._lock:
+            data = self._load()
+            # Forget files that no longer exist and hashes nothing points at
+            data["files"] = {k: v for k, v in data["files"].items() if k in seen or not k.startswith(
+                os.path.abspath(base_dir) + os.sep)}
+            live = {v["sha256"] for v in data["files"].values()}
+            data["hashes"] = {k: v for k, v in data["hashes"].items() if k in live}
+        self.save()
+        return entries
+
+
+def near_duplicate_groups(entries, max_distance=PHASH_MAX_DISTANCE):
+    """
+    Clusters (lists of entry indexes, two or more each) of images whose hashes are
+    within max_distance bits and whose aspect ratios match, joined transitively.
+    """
+    count = len(entries)
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    hashes = [int(e["phash"], 16) for e in entries]
+    # Row blocks keep the pairwise matrix small for large trees
+    for start in range(0, count, 256):
+        block = distances(hashes[start:start + 256], hashes)
+        for i, j in zip(*np.nonzero(block <= max_distance)):
+            i += start
+            if j > i and _similar_shape(entries[i]["size"], entries[j]["size"]):
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def _canonical(members):
+    """The entry other group members should reuse: a real image, largest first"""
+    return min(members, key=lambda e: (e["flat"], -(e["size"][0] * e["size"][1]), -e["bytes"], e["game"], e["file"]))
+
+
+def duplicate_report(base_dir="games", max_distance=PHASH_MAX_DISTANCE, index=None):
+    """
+    Near-duplicate images across all games. Each group lists its members, the image
+    the others could reuse, whether the group is flat placeholders, and the bytes
+    reclaimable by linking every distinct file in it to the canonical one.
+    """
+    index = index or phash_index
+    entries = index.scan(base_dir)
+    groups = []
+    for members in near_duplicate_groups(entries, max_distance):
+        members = [entries[i] for i in members]
+        canonical = _canonical(members)
+        unique = {m["sha256"]: m["bytes"] for m in members}
+        hashes = [int(m["phash"], 16) for m in members]
+        groups.append({
+            "canonical": {"game": canonical["game"], "file": canonical["file"]},
+            "placeholders": all(m["flat"] for m in members),
+            "max_distance": int(distances(hashes).max()),
+            "reclaimable_bytes": sum(unique.values()) - unique[canonical["sha256"]],
+            "members": [{key: m[key] for key in ("game", "file", "sha256", "bytes", "phash", "size", "flat")}
+                        for m in members],
+        })
+    groups.sort(key=lambda g: -g["reclaimable_bytes"])
+    return {
+        "assets": len(entries),
+        "unique_images": len({e["sha256"] for e in entries}),
+        "max_distance": max_distance,
+        "groups": groups,
+        "near_duplicate_assets": sum(len(g["members"]) for g in groups),
+        "placeholder_assets": sum(1 for e in entries if e["flat"]),
+        "reclaimable_bytes": sum(g["reclaimable_bytes"] for g in groups if not g["placeholders"]),
+    }
+
+
+def reuse_duplicates(report, base_dir="games"):
+    """
+    Replace every non-placeholder group member that has the canonical image's exact
+    size with a hardlink to the canonical file (via a temp file and rename, like the
+    blob store). Members of another size are left alone, since the game draws them
+    at that size. Returns {game: [files replaced]}.
+    """
+    replaced = {}
+    for group in report["groups"]:
+        if group["placeholders"]:
+            continue
+        canonical = next(m for m in group["members"]
+                         if (m["game"], m["file"]) == (group["canonical"]["game"], group["canonical"]["file"]))
+        source = os.path.join(base_dir, canonical["game"], "assets", canonical["file"])
+        for member in group["members"]:
+            if member["flat"] or member["sha256"] == canonical["sha256"] or member["size"] != canonical["size"]:
+                continue
+            target = os.path.join(base_dir, member["game"], "assets", member["file"])
+            blobs.link_or_copy(source, target)
+            replaced.setdefault(member["game"], []).append(member["file"])
+    return replaced
+
+
+def find_prompt_match(entries, digest, folder):
+    """A real image in folder generated from exactly this prompt, unchanged since, or None"""
+    for entry in entries:
+        if entry["prompt_hash"] == digest and entry["ok"] and not entry["flat"] \
+                and entry["file"].split("/", 1)[0] == folder:
+            return entry
+    return None
+
+
+def near_matches(paths, entries, max_distance=PHASH_MAX_DISTANCE, index=None):
+    """
+    {path: [{"game", "file", "distance"}]} of indexed images each file at paths
+    nearly duplicates, closest first. Flat placeholders and byte-identical copies
+    (already shared through the blob store, or reused on purpose) are ignored.
+    """
+    index = index or phash_index
+    own = {os.path.abspath(p) for p in paths}
+    others = [e for e in entries if not e["flat"] and os.path.abspath(e["path"]) not in own]
+    matches = {}
+    for path in paths:
+        info = index.lookup(path)
+        if info["flat"] or not others:
+            continue
+        row = distances([int(info["phash"], 16)], [int(e["phash"], 16) for e in others])[0]
+        found = [{"game": e["game"], "file": e["file"], "distance": int(d)}
+                 for e, d in zip(others, row)
+                 if d <= max_distance and e["sha256"] != info["sha256"] and _similar_shape(info["size"], e["size"])]
+        if found:
+            matches[path] = sorted(found, key=lambda m: m["distance"])
+    return matches
+
+
+phash_index = PerceptualIndex()
+
+
+if __name__ == "__main__":
+    # python -m services.phash  (run from BE/) prints the near-duplicate report;
+    # POST /assets/duplicates/reuse applies it and rebuilds the affected games
+    print(json.dumps(duplicate_report(), indent=2))
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+# Events buffered per stream subscriber before the oldest are dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+# Progress entries expire this many seconds after their last update
+PROGRESS_TTL_SECONDS = int(os.getenv("PROGRESS_TTL_SECONDS", "3600"))
+# Hard cap on stored entries; the least recently updated are dropped first
+PROGRESS_MAX_ENTRIES = int(os.getenv("PROGRESS_MAX_ENTRIES", "10000"))
+
+
+class ProgressStore(OrderedDict):
+    """
+    Dict of request id -> latest progress, kept in update order. Every write moves
+    the entry to the end, so expired entries are always at the front and are
+    removed in amortized O(1) per update instead of scanning the whole store.
+    """
+
+    def __init__(self, ttl=PROGRESS_TTL_SECONDS, max_entries=PROGRESS_MAX_ENTRIES):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.max_entries:
+                self.popitem(last=False)
+
+    def expire(self, now=None):
+        """Drop entries older than ttl from the front. Returns how many were removed."""
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            while self:
+                key, value = next(iter(self.items()))
+                if now - value.get("timestamp", 0) <= self.ttl:
+                    break
+                super().__delitem__(key)
+                removed += 1
+        return removed
+
+    async def sweep_forever(self, interval=60):
+        """Background sweeper so idle servers also release expired entries"""
+        while True:
+            await asyncio.sleep(interval)
+            self.expire()
+
+
+class ProgressBroadcaster:
+    """
+    Fans progress updates out to server-sent-event subscribers, per request id.
+    publish() may be called from the event loop or from worker threads.
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # request id -> set of asyncio.Queue
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def subscribe(self, request_id):
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(request_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, request_id, queue):
+        with self._lock:
+            queues = self._subscribers.get(request_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[request_id]
+
+    def subscriber_count(self, request_id=None):
+        with self._lock:
+            if request_id is not None:
+                return len(self._subscribers.get(request_id, ()))
+            return sum(len(q) for q in self._subscribers.values())
+
+    def publish(self, request_id, event):
+        with self._lock:
+            queues = list(self._subscribers.get(request_id, ()))
+        if not queues or self._loop is None:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        for queue in queues:
+            if on_loop:
+                _put_latest(queue, event)
+            else:
+                self._loop.call_soon_threadsafe(_put_latest, queue, event)
+
+
+def _put_latest(queue, event):
+    """Enqueue event, dropping the oldest one if a slow client let the queue fill up"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+def format_sse(event):
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def is_final(event):
+    return event.get("status") == "error" or (event.get("step") == "complete" and event.get("status") == "completed")
+
+
+progress_broadcaster = ProgressBroadcaster()
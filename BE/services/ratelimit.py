@@ -0,0 +1,93 @@
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from services.jobs import PRIORITY_BULK
+
+# Priority of the Gemini calls made on the current thread (lower runs first)
+_local = threading.local()
+
+
+def current_priority():
+    return getattr(_local, "priority", PRIORITY_BULK)
+
+
+@contextmanager
+def call_priority(priority):
+    """Run the enclosed calls at priority on this thread"""
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class PriorityTokenBucket:
+    """
+    Thread-safe token bucket refilled at rate_per_minute, holding at most burst tokens.
+    Waiting callers are served strictly by (priority, arrival), so an interactive call
+    takes the next free token even when bulk calls have been queued longer.
+    rate_per_minute <= 0 disables limiting.
+    """
+
+    def __init__(self, name, rate_per_minute, burst=1):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self.acquired = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=None):
+        """Block until a token is available for this caller. Returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    first = self._waiters[0] == ticket
+                    if first and self.tokens >= 1:
+                        self.tokens -= 1
+                        heapq.heappop(self._waiters)
+                        waited = now - start
+                        self.acquired += 1
+                        self.total_wait += waited
+                        # The next caller in line may be able to go too
+                        self._cond.notify_all()
+                        return waited
+                    # Only the head of the line needs a timer; the rest are woken when it leaves
+                    self._cond.wait((1 - self.tokens) / self.rate if first else None)
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "burst": self.capacity,
+                "tokens": round(self.tokens, 2),
+                "waiting": len(self._waiters),
+                "acquired": self.acquired,
+                "total_wait_seconds": round(self.total_wait, 3),
+            }
@@ -0,0 +1,144 @@
+import os
+import re
+import math
+from PIL import Image
+
+# Filter used for every asset resize; LANCZOS keeps sprite edges sharp when scaling down
+RESAMPLE = Image.Resampling.LANCZOS
+
+_DIMENSIONS = re.compile(r"^\s*(\d+)\s*[x×]\s*(\d+)\s*$", re.IGNORECASE)
+_SPRITESHEET_CALL = re.compile(
+    r"load\.spritesheet\(\s*['\"][^'\"]+['\"]\s*,\s*['\"]([^'\"]+)['\"]\s*,\s*\{([^}]*)\}")
+_FRAME_OPTION = re.compile(r"frame(Width|Height)\s*:\s*(\d+)")
+
+
+def parse_dimensions(value):
+    """(width, height) from "512x512" style strings, or None"""
+    match = _DIMENSIONS.match(str(value or ""))
+    if not match:
+        return None
+    width, height = int(match.group(1)), int(match.group(2))
+    return (width, height) if width > 0 and height > 0 else None
+
+
+def _asset_rel(url):
+    """Path relative to assets/ of a loader or placeholder URL ("./assets/x.png", "/assets/x.png", ...)"""
+    return str(url).split("assets/", 1)[-1].lstrip("./")
+
+
+def sheet_grids(plan):
+    """
+    Frame grid of every spritesheet in a production plan, keyed by path relative to
+    assets/ ("characters/hero.png"): {"frame": (w, h), "sheet": (w, h) or None}.
+    Frame sizes passed to scene.load.spritesheet in loadAssets win over the
+    dynamic_loading_plan, since those are what Phaser slices the sheet by.
+    """
+    grids = {}
+    entries = plan.get("dynamic_loading_plan") or []
+    if isinstance(entries, dict):
+        entries = [entries]
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        frame = parse_dimensions(entry.get("frame_dimensions"))
+        url = str(entry.get("placeholder_url") or "")
+        if frame and url:
+            grids[_asset_rel(url)] = {"frame": frame, "sheet": parse_dimensions(entry.get("sheet_dimensions"))}
+
+    loader = (plan.get("phaser_modules") or {}).get("loadAssets") or ""
+    for url, options in _SPRITESHEET_CALL.findall(loader):
+        rel = _asset_rel(url)
+        values = dict(_FRAME_OPTION.findall(options))
+        if "Width" in values and "Height" in values:
+            frame = (int(values["Width"]), int(values["Height"]))
+            if frame[0] > 0 and frame[1] > 0:
+                sheet = grids.get(rel, {}).get("sheet")
+                grids[rel] = {"frame": frame, "sheet": sheet}
+    return grids
+
+
+def grid_layout(grid, size):
+    """
+    (columns, rows) and the sheet size for an image of size snapped onto grid.
+    sheet_dimensions is used when it is a whole number of frames; otherwise the
+    frame count is the nearest whole number that fits size.
+    """
+    frame_w, frame_h = grid["frame"]
+    sheet = grid.get("sheet")
+    if sheet and sheet[0] % frame_w == 0 and sheet[1] % frame_h == 0:
+        columns, rows = sheet[0] // frame_w, sheet[1] // frame_h
+    else:
+        columns = max(1, round(size[0] / frame_w))
+        rows = max(1, round(size[1] / frame_h))
+    return (columns, rows), (columns * frame_w, rows * frame_h)
+
+
+def resize_rgba(image, size, box=None):
+    """
+    LANCZOS resize that keeps transparency. Images with any alpha are resampled as
+    RGBA, which Pillow premultiplies internally, so colour hidden under transparent
+    pixels does not bleed into sprite edges. box crops the source region as part of
+    the same resample.
+    """
+    size = tuple(size)
+    if "A" not in image.getbands() and "transparency" not in image.info:
+        return image.convert("RGB").resize(size, RESAMPLE, box=box)
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    return image.resize(size, RESAMPLE, box=box)
+
+
+def snap_to_grid(image, grid, size=None):
+    """
+    Resample a spritesheet so it is an exact grid of grid["frame"] cells. Each output
+    frame is resampled only from its own source cell, so neighbouring poses never
+    bleed across frame borders. size is the wanted size before snapping (defaults
+    to the image size).
+    """
+    (columns, rows), sheet = grid_layout(grid, size or image.size)
+    frame_w, frame_h = grid["frame"]
+    if image.size == sheet:
+        return image
+    source = image if image.mode == "RGBA" else image.convert("RGBA")
+    cell_w, cell_h = image.width / columns, image.height / rows
+    output = Image.new("RGBA", sheet)
+    for row in range(rows):
+        for column in range(columns):
+            left, top = column * cell_w, row * cell_h
+            # Cropping first is ~3x faster than resizing the whole sheet with a box
+            x0, y0 = int(left), int(top)
+            x1, y1 = min(image.width, math.ceil(left + cell_w)), min(image.height, math.ceil(top + cell_h))
+            cell = source.crop((x0, y0, x1, y1))
+            box = (left - x0, top - y0, min(left + cell_w, x1) - x0, min(top + cell_h, y1) - y0)
+            output.paste(resize_rgba(cell, (frame_w, frame_h), box=box), (column * frame_w, row * frame_h))
+    return output
+
+
+def fit_image(image, size=None, grid=None):
+    """Image resized to size, or snapped onto grid when the asset is a spritesheet"""
+    if grid:
+        return snap_to_grid(image, grid, size)
+    if size is None or image.size == tuple(size):
+        return image
+    return resize_rgba(image, size)
+
+
+def normalize_asset(path, grid, size=None):
+    """
+    Snap the image at path onto grid in place (temp file + rename, so hardlinked
+    copies are never written through). Returns the new size, or None if the image
+    already fit.
+    """
+    with Image.open(path) as img:
+        img.load()
+        fitted = fit_image(img, size, grid)
+        if fitted is img:
+            return None
+    tmp_path = f"{path}.part"
+    try:
+        fitted.save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return fitted.size
@@ -0,0 +1,148 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used when brotli isn't installed
+    brotli = None
+
+# Text files worth compressing on the fly
+COMPRESSIBLE_EXTENSIONS = {".js", ".html", ".json", ".css", ".svg", ".txt"}
+# Upper bound for the in-memory cache of compressed bodies
+COMPRESSED_CACHE_BYTES = int(os.getenv("STATIC_COMPRESSED_CACHE_MB", "32")) * 1024 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+class _LRU:
+    """Small thread-safe LRU keyed by tuples, bounded by total value size"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, size):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+
+
+_hash_cache = _LRU(max_bytes=16384)  # entry "size" is 1, so this holds 16k hashes
+_compressed_cache = _LRU(max_bytes=COMPRESSED_CACHE_BYTES)
+
+
+def content_hash(path, stat_result=None):
+    """sha256 of a file, cached by (path, mtime, size) so unchanged files are hashed once"""
+    stat_result = stat_result or os.stat(path)
+    key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+    cached = _hash_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _hash_cache.set(key, digest, 1)
+    return digest
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in candidates
+
+
+def _not_modified_since(header, mtime):
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _pick_encoding(accept_encoding):
+    accepted = {part.split(";")[0].strip() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compressed_body(path, digest, encoding):
+    key = (digest, encoding)
+    cached = _compressed_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    with open(path, "rb") as f:
+        raw = f.read()
+    if encoding == "br":
+        body = brotli.compress(raw, quality=9)
+    else:
+        body = gzip.compress(raw, compresslevel=9, mtime=0)
+    _compressed_cache.set(key, body, len(body))
+    return body
+
+
+def serve_file(request, path, immutable=False):
+    """
+    FileResponse with a strong content-hash ETag, Last-Modified, conditional GET (304)
+    and on-the-fly gzip/brotli for text files. Range requests are handled by FileResponse.
+    immutable=True marks the response as cacheable forever (content-addressed URLs).
+    """
+    stat_result = os.stat(path)
+    digest = content_hash(path, stat_result)
+    # ?v=<hash prefix> pins the URL to this exact content
+    version = request.query_params.get("v")
+    if version and len(version) >= 8 and digest.startswith(version):
+        immutable = True
+
+    headers = {
+        "ETag": f'"{digest[:32]}"',
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+
+    ext = os.path.splitext(path)[1].lower()
+    encoding = None
+    if ext in COMPRESSIBLE_EXTENSIONS and "range" not in request.headers:
+        encoding = _pick_encoding(request.headers.get("accept-encoding"))
+        headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            # Each representation needs its own strong validator
+            headers["ETag"] = f'"{digest[:32]}-{encoding}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if _etag_matches(if_none_match, headers["ETag"]) or (
+            if_none_match is None and _not_modified_since(request.headers.get("if-modified-since"), stat_result.st_mtime)):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        body = _compressed_body(path, digest, encoding)
+        headers["Content-Encoding"] = encoding
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return Response(content=body, media_type=media_type, headers=headers)
+    return FileResponse(path, headers=headers, stat_result=stat_result)
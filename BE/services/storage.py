@@ -1,13 +1,22 @@
-import os, json
+import os, json, shutil, filecmp
 
 def safe_filename(name):
     return "".join(c if c.isalnum() or c in "-_ " else "_" for c in name).strip().replace(" ", "_")
 
 def save_game_blueprint(blueprint, base_dir="games"):
+    """Save blueprint.json into a new folder named after the title (Title_2, Title_3, ... if taken)"""
     title = blueprint.get("meta", {}).get("title", "Untitled Game")
     folder_name = safe_filename(title)
-    game_folder = os.path.join(base_dir, folder_name)
-    os.makedirs(game_folder, exist_ok=True)
+    os.makedirs(base_dir, exist_ok=True)
+    suffix = 1
+    while True:
+        game_folder = os.path.join(base_dir, folder_name if suffix == 1 else f"{folder_name}_{suffix}")
+        try:
+            # Never write into an existing game, even when a cached blueprint repeats its title
+            os.mkdir(game_folder)
+            break
+        except FileExistsError:
+            suffix += 1
 
     path = os.path.join(game_folder, "blueprint.json")
     with open(path, "w", encoding="utf-8") as f:
@@ -21,3 +30,99 @@ def save_production_plan(folder, plan):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(plan, f, indent=2)
     return path
+
+
+# How assets/ is published into phaser/assets/: "hardlink", "symlink" or "copy"
+ASSET_PUBLISH_MODE = os.getenv("ASSET_PUBLISH_MODE", "hardlink")
+
+def _publish_file(src, dst, mode):
+    tmp = f"{dst}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    if mode == "hardlink":
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+    else:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+def _is_current(src, dst):
+    """True if dst already holds src's content (same inode, or same size and mtime for copies)"""
+    try:
+        if os.path.samefile(src, dst):
+            return True
+        s, d = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    return s.st_size == d.st_size and int(s.st_mtime) == int(d.st_mtime)
+
+def publish_assets(src_dir, dst_dir, mode=None):
+    """
+    Make dst_dir mirror src_dir, touching only files that changed.
+    "hardlink" links each file (falls back to copying across devices), "symlink"
+    points dst_dir at src_dir, "copy" copies changed files. Returns counts per action.
+    """
+    mode = mode or ASSET_PUBLISH_MODE
+    stats = {"published": 0, "unchanged": 0, "removed": 0}
+    if mode == "symlink":
+        target = os.path.relpath(src_dir, os.path.dirname(dst_dir))
+        if os.path.islink(dst_dir) and os.readlink(dst_dir) == target:
+            return stats
+        if os.path.islink(dst_dir):
+            os.remove(dst_dir)
+        elif os.path.isdir(dst_dir):
+            shutil.rmtree(dst_dir)
+        os.symlink(target, dst_dir, target_is_directory=True)
+        stats["published"] = 1
+        return stats
+
+    if os.path.islink(dst_dir):
+        os.remove(dst_dir)
+    wanted = set()
+    for root, _, names in os.walk(src_dir):
+        rel_root = os.path.relpath(root, src_dir)
+        out_root = os.path.normpath(os.path.join(dst_dir, rel_root))
+        os.makedirs(out_root, exist_ok=True)
+        for name in names:
+            src = os.path.join(root, name)
+            dst = os.path.join(out_root, name)
+            wanted.add(os.path.normpath(dst))
+            if _is_current(src, dst):
+                stats["unchanged"] += 1
+                continue
+            _publish_file(src, dst, mode)
+            stats["published"] += 1
+
+    # Drop files that no longer exist in src_dir
+    for root, _, names in os.walk(dst_dir):
+        for name in names:
+            dst = os.path.normpath(os.path.join(root, name))
+            if dst not in wanted:
+                os.remove(dst)
+                stats["removed"] += 1
+    return stats
+
+def adopt_published_assets(src_dir, dst_dir):
+    """
+    Copy every file in dst_dir that is missing from src_dir or differs from it back
+    into src_dir. Older versions edited phaser/assets in place, and publish_assets
+    would overwrite those edits. Returns the copied paths relative to src_dir.
+    """
+    if os.path.islink(dst_dir) or not os.path.isdir(dst_dir):
+        return []
+    adopted = []
+    for root, _, names in os.walk(dst_dir):
+        rel_root = os.path.relpath(root, dst_dir)
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            dst = os.path.join(root, name)
+            src = os.path.normpath(os.path.join(src_dir, rel_root, name))
+            if os.path.isfile(src) and (os.path.samefile(src, dst) or filecmp.cmp(src, dst, shallow=False)):
+                continue
+            os.makedirs(os.path.dirname(src), exist_ok=True)
+            _publish_file(dst, src, "copy")
+            adopted.append(os.path.relpath(src, src_dir).replace(os.sep, "/"))
+    return sorted(adopted)
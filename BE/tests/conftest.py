@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Tests import the backend the way main.py does (from services...), run from BE/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main.py opens its job queue and the Gemini client on import
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="jobs-"), "jobs.db"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty BE-like folder: games/ and data/ resolve under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,64 @@
+from services.atlas import _candidate_sizes, _shelf_pack, plan_atlases
+
+
+def _overlaps(a, b, padding):
+    (ax, ay), (aw, ah) = a["position"], a["size"]
+    (bx, by), (bw, bh) = b["position"], b["size"]
+    return ax < bx + bw + padding and bx < ax + aw + padding and ay < by + bh + padding and by < ay + ah + padding
+
+
+def test_candidate_sizes_are_powers_of_two_smallest_first():
+    sizes = _candidate_sizes(256)
+
+    assert sizes[0] == (64, 64)
+    assert sizes[-1] == (256, 256)
+    areas = [w * h for w, h in sizes]
+    assert areas == sorted(areas)
+    for w, h in sizes:
+        assert w & (w - 1) == 0 and h & (h - 1) == 0
+        assert h <= w <= 2 * h
+
+
+def test_shelf_pack_places_items_without_overlap():
+    items = [{"name": f"s{i}", "size": (30, 20)} for i in range(8)]
+
+    placed, rest = _shelf_pack(items, 64, 64, padding=2)
+
+    # Two per shelf, three shelves of 20 px plus padding
+    assert len(placed) == 6 and len(rest) == 2
+    for i, a in enumerate(placed):
+        x, y = a["position"]
+        assert x + a["size"][0] <= 64 and y + a["size"][1] <= 64
+        for b in placed[i + 1:]:
+            assert not _overlaps(a, b, 2)
+
+
+def test_shelf_pack_starts_new_shelf_below_tallest_item():
+    items = [{"name": "tall", "size": (40, 30)}, {"name": "short", "size": (20, 10)},
+             {"name": "next", "size": (40, 10)}]
+
+    placed, rest = _shelf_pack(items, 64, 64, padding=2)
+
+    assert not rest
+    assert [p["position"] for p in placed] == [(0, 0), (42, 0), (0, 32)]
+
+
+def test_plan_atlases_picks_smallest_size_that_fits():
+    items = [{"name": f"s{i}", "size": (16, 16)} for i in range(4)]
+
+    atlases = plan_atlases(items, max_size=512, padding=0)
+
+    assert len(atlases) == 1
+    assert atlases[0]["size"] == (64, 64)
+
+
+def test_plan_atlases_splits_when_one_atlas_is_full():
+    items = [{"name": f"s{i}", "size": (100, 100)} for i in range(6)]
+
+    atlases = plan_atlases(items, max_size=256, padding=2)
+
+    assert len(atlases) == 2
+    names = [frame["name"] for atlas in atlases for frame in atlas["frames"]]
+    assert sorted(names) == sorted(item["name"] for item in items)
+    for atlas in atlases:
+        assert max(atlas["size"]) <= 256
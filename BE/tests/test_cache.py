@@ -0,0 +1,58 @@
+import os
+import time
+from services.cache import ResponseCache
+
+
+def test_roundtrip_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=10_000)
+    key = cache.key("model", {"prompt": "p"})
+
+    assert cache.get(key) is None
+    cache.set(key, {"title": "Game"})
+
+    assert cache.get(key) == {"title": "Game"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_key_ignores_dict_order_but_not_model():
+    body_a, body_b = {"a": 1, "b": 2}, {"b": 2, "a": 1}
+
+    assert ResponseCache.key("m", body_a) == ResponseCache.key("m", body_b)
+    assert ResponseCache.key("m", body_a) != ResponseCache.key("other", body_a)
+
+
+def test_expired_entries_are_removed(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60, max_bytes=10_000)
+    cache.set("old", {"v": 1})
+    path = os.path.join(str(tmp_path), "old.json")
+    past = time.time() - 120
+    os.utime(path, (past, past))
+
+    assert cache.get("old") is None
+    assert not os.path.exists(path)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=3600, max_bytes=40)  # room for two ~17 byte entries
+    for i, key in enumerate(("a", "b")):
+        cache.set(key, {"v": "x" * 10})
+        stamp = time.time() - 100 + i
+        os.utime(os.path.join(str(tmp_path), f"{key}.json"), (stamp, stamp))
+    cache.get("a")  # a is now the most recently used
+
+    cache.set("c", {"v": "x" * 10})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 40
+
+
+def test_sizes_are_rebuilt_from_disk(tmp_path):
+    ResponseCache(str(tmp_path)).set("a", {"v": 1})
+
+    reopened = ResponseCache(str(tmp_path))
+
+    assert reopened.stats()["entries"] == 1
+    assert reopened.get("a") == {"v": 1}
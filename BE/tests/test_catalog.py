@@ -0,0 +1,131 @@
+import os
+import json
+import threading
+from services.catalog import GameCatalog
+
+
+def add_game(base, game_id, title, genre="Action"):
+    folder = base / game_id
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / "blueprint.json").write_text(json.dumps(
+        {"meta": {"title": title, "description": f"{title} game"}, "gameplay": {"genre": genre}}))
+    return folder
+
+
+def catalog(tmp_path):
+    return GameCatalog(base_dir=str(tmp_path / "games"), path=str(tmp_path / "data" / "games.json"))
+
+
+def test_load_indexes_games_and_creates_the_file(tmp_path):
+    add_game(tmp_path / "games", "b", "Beta")
+    add_game(tmp_path / "games", "a", "Alpha", genre="Puzzle")
+    (tmp_path / "games" / "not_a_game").mkdir()
+    games = catalog(tmp_path)
+
+    games.load()
+
+    total, items = games.list()
+    assert total == 2
+    assert [item["title"] for item in items] == ["Alpha", "Beta"]
+    assert (tmp_path / "data" / "games.json").exists()
+
+
+def test_reconcile_picks_up_changed_and_removed_games(tmp_path):
+    add_game(tmp_path / "games", "a", "Alpha")
+    folder = add_game(tmp_path / "games", "b", "Beta")
+    games = catalog(tmp_path)
+    games.load()
+
+    add_game(tmp_path / "games", "a", "Alpha Two")
+    blueprint = tmp_path / "games" / "a" / "blueprint.json"
+    os.utime(blueprint, (1, 1))
+    os.remove(folder / "blueprint.json")
+
+    assert games.reconcile() is True
+    assert [item["title"] for item in games.list()[1]] == ["Alpha Two"]
+    assert games.reconcile() is False
+
+
+def test_persisted_index_is_reused(tmp_path):
+    add_game(tmp_path / "games", "a", "Alpha")
+    catalog(tmp_path).load()
+    # An entry whose blueprint mtime matches is not re-read
+    index = json.loads((tmp_path / "data" / "games.json").read_text())
+    index["games"]["a"]["title"] = "From index"
+    (tmp_path / "data" / "games.json").write_text(json.dumps(index))
+
+    games = catalog(tmp_path)
+    games.load()
+
+    assert games.list()[1][0]["title"] == "From index"
+
+
+def test_list_filters_pages_and_projects(tmp_path):
+    for i, genre in enumerate(["Action", "Puzzle", "action", "RPG"]):
+        add_game(tmp_path / "games", f"g{i}", f"Game {i}", genre=genre)
+    games = catalog(tmp_path)
+    games.load()
+
+    total, items = games.list(genre="ACTION", fields=("id", "genre"))
+    assert total == 2 and items == [{"id": "g0", "genre": "Action"}, {"id": "g2", "genre": "action"}]
+
+    total, items = games.list(offset=1, limit=2, fields=("id",))
+    assert total == 4 and items == [{"id": "g1"}, {"id": "g2"}]
+
+    _, items = games.list(limit=1, fields=("id", "config"))
+    assert items[0]["config"]["meta"]["title"] == "Game 0"
+
+
+def test_upsert_and_remove(tmp_path):
+    games = catalog(tmp_path)
+    games.load()
+    add_game(tmp_path / "games", "new", "New Game")
+
+    assert games.upsert("new")["title"] == "New Game"
+    games.remove("new")
+
+    assert games.list()[0] == 0
+    assert json.loads((tmp_path / "data" / "games.json").read_text()) == {"games": {}}
+
+
+def test_concurrent_saves_do_not_collide(tmp_path):
+    for i in range(20):
+        add_game(tmp_path / "games", f"g{i}", f"Game {i}")
+    games = catalog(tmp_path)
+    games.load()
+    errors = []
+
+    def churn(ids):
+        try:
+            for game_id in ids * 5:
+                games.upsert(game_id)
+                games.remove(game_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=churn, args=([f"g{i}" for i in range(n, 20, 4)],)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert json.loads((tmp_path / "data" / "games.json").read_text()) == {"games": {}}
+
+
+def test_games_endpoint_returns_every_game_by_default(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+    for i in range(120):
+        add_game(tmp_path / "games", f"g{i:03d}", f"Game {i:03d}")
+    games = catalog(tmp_path)
+    games.load()
+    monkeypatch.setattr(main, "game_catalog", games)
+    client = TestClient(main.app)
+
+    everything = client.get("/games")
+    page = client.get("/games", params={"offset": 100, "limit": 50})
+
+    assert len(everything.json()) == 120
+    assert everything.headers["X-Total-Count"] == "120"
+    assert [game["id"] for game in page.json()] == [f"g{i:03d}" for i in range(100, 120)]
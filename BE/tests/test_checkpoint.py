@@ -0,0 +1,97 @@
+import json
+import numpy as np
+from PIL import Image
+from services.checkpoint import Checkpoint, STAGES, is_placeholder_image, prompt_hash
+
+
+def real_image(path, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 255, (32, 32, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+
+
+def placeholder_image(path):
+    image = Image.new("RGB", (256, 256), "#cccccc")
+    image.paste((153, 153, 153), (50, 50, 206, 206))
+    image.save(path)
+
+
+def test_prompt_hash_is_stable_for_nested_prompts():
+    assert prompt_hash({"a": 1, "b": [2]}) == prompt_hash({"b": [2], "a": 1})
+    assert prompt_hash("hero") != prompt_hash("hero ")
+
+
+def test_stages_are_saved_and_invalidated_downstream(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path))
+    for stage in STAGES:
+        checkpoint.complete(stage, seconds=1)
+
+    checkpoint.invalidate("assets")
+
+    reloaded = Checkpoint.load(str(tmp_path))
+    assert [s for s in STAGES if reloaded.is_done(s)] == ["blueprint", "plan"]
+
+
+def test_fallback_stages_are_flagged(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path))
+    checkpoint.complete("blueprint", fallback=True)
+    checkpoint.complete("plan", fallback=False)
+
+    assert checkpoint.fell_back("blueprint") and not checkpoint.fell_back("plan")
+
+
+def test_asset_ready_needs_same_prompt_ok_and_valid_image(tmp_path):
+    (tmp_path / "assets" / "characters").mkdir(parents=True)
+    real_image(tmp_path / "assets" / "characters" / "hero.png")
+    checkpoint = Checkpoint.load(str(tmp_path))
+    checkpoint.record_asset("characters/hero.png", "p1", True)
+    checkpoint.record_asset("characters/failed.png", "p1", False)
+
+    assert checkpoint.asset_ready("characters/hero.png", "p1")
+    assert not checkpoint.asset_ready("characters/hero.png", "p2")
+    assert not checkpoint.asset_ready("characters/failed.png", "p1")
+    (tmp_path / "assets" / "characters" / "hero.png").write_bytes(b"truncated")
+    assert not checkpoint.asset_ready("characters/hero.png", "p1")
+
+
+def test_unrecorded_real_images_are_adopted(tmp_path):
+    folder = tmp_path / "assets" / "characters"
+    folder.mkdir(parents=True)
+    real_image(folder / "hero.png")
+    placeholder_image(folder / "grey.png")
+    checkpoint = Checkpoint.load(str(tmp_path))
+
+    assert checkpoint.asset_ready("characters/hero.png", "p1")
+    assert not checkpoint.asset_ready("characters/grey.png", "p1")
+    assert not checkpoint.asset_ready("characters/missing.png", "p1")
+
+    saved = json.loads((tmp_path / "checkpoint.json").read_text())["assets"]
+    assert saved["characters/hero.png"]["prompt_hash"] == "p1" and saved["characters/hero.png"]["ok"]
+    assert "characters/grey.png" not in saved
+    # Once recorded, a changed prompt means the asset is regenerated
+    assert not checkpoint.asset_ready("characters/hero.png", "p2")
+
+
+def test_adopted_assets_keep_edited_flag(tmp_path):
+    (tmp_path / "assets" / "ui").mkdir(parents=True)
+    real_image(tmp_path / "assets" / "ui" / "button.png")
+    checkpoint = Checkpoint(str(tmp_path), {"assets": {"ui/button.png": {"edited": True}}})
+
+    assert checkpoint.asset_ready("ui/button.png", "p1")
+    assert checkpoint.data["assets"]["ui/button.png"]["edited"] is True
+
+
+def test_placeholder_detection(tmp_path):
+    placeholder_image(tmp_path / "grey.png")
+    real_image(tmp_path / "real.png")
+
+    assert is_placeholder_image(str(tmp_path / "grey.png"))
+    assert not is_placeholder_image(str(tmp_path / "real.png"))
+    assert not is_placeholder_image(str(tmp_path / "missing.png"))
+
+
+def test_changed_modules(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path))
+    checkpoint.record_modules({"loadAssets": "a", "createScene": "b"})
+
+    assert checkpoint.changed_modules({"loadAssets": "a", "createScene": "c", "setupControls": "d"}) == [
+        "createScene", "setupControls"]
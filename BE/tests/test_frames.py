@@ -0,0 +1,88 @@
+import numpy as np
+from PIL import Image
+from services.frames import analyze_mask, content_mask, detect_grid
+
+CELL = 32
+
+
+def sheet_mask(columns, rows, filled):
+    """Mask of a columns x rows sheet of CELL px frames with a sprite inside each filled cell"""
+    mask = np.zeros((rows * CELL, columns * CELL), dtype=bool)
+    for index in filled:
+        row, column = divmod(index, columns)
+        mask[row * CELL + 6:row * CELL + 26, column * CELL + 6:column * CELL + 26] = True
+    return mask
+
+
+def test_detect_grid_finds_frame_size():
+    assert detect_grid(sheet_mask(4, 2, range(8))) == (CELL, CELL)
+
+
+def test_detect_grid_with_partly_empty_row():
+    assert detect_grid(sheet_mask(4, 2, [0, 1, 2, 3, 4, 5])) == (CELL, CELL)
+
+
+def test_detect_grid_without_content():
+    assert detect_grid(np.zeros((64, 64), dtype=bool)) is None
+
+
+def test_analyze_mask_marks_empty_cells():
+    result = analyze_mask(sheet_mask(4, 2, [0, 1, 2, 3, 4, 5]))
+
+    assert (result["frameWidth"], result["frameHeight"]) == (CELL, CELL)
+    assert (result["columns"], result["rows"], result["frames"]) == (4, 2, 8)
+    assert result["empty"] == [6, 7]
+    assert result["filled"] == [0, 1, 2, 3, 4, 5]
+    assert result["source"] == "detected"
+    assert result["override"] is False
+
+
+def test_declared_grid_is_kept_when_it_cuts_no_sprites():
+    result = analyze_mask(sheet_mask(4, 2, range(8)), declared=(64, 32))
+
+    assert result["source"] == "declared"
+    assert (result["frameWidth"], result["columns"]) == (64, 2)
+    assert result["override"] is False
+
+
+def test_declared_grid_that_cuts_sprites_is_overridden():
+    result = analyze_mask(sheet_mask(4, 2, range(8)), declared=(48, 32))
+
+    assert result["source"] == "detected"
+    assert (result["frameWidth"], result["frameHeight"]) == (CELL, CELL)
+    assert result["override"] is True
+
+
+def test_declared_frame_larger_than_sheet_is_ignored():
+    result = analyze_mask(sheet_mask(4, 2, range(8)), declared=(256, 256))
+
+    assert (result["frameWidth"], result["frameHeight"]) == (CELL, CELL)
+    assert result["source"] == "detected"
+
+
+def test_empty_mask_marks_no_cell_empty():
+    result = analyze_mask(np.zeros((64, 128), dtype=bool), declared=(32, 32))
+
+    assert result["frames"] == 8
+    assert result["empty"] == []
+    assert result["filled"] == list(range(8))
+
+
+def test_content_mask_uses_alpha():
+    image = Image.new("RGBA", (64, 32), (0, 0, 0, 0))
+    image.paste((255, 0, 0, 255), (8, 8, 24, 24))
+
+    mask = content_mask(image)
+
+    assert mask[16, 16] and not mask[16, 48]
+    assert mask.sum() == 16 * 16
+
+
+def test_content_mask_keys_out_opaque_background():
+    image = Image.new("RGB", (64, 32), (20, 200, 20))
+    image.paste((200, 30, 30), (40, 8, 56, 24))
+
+    mask = content_mask(image)
+
+    assert mask[16, 48] and not mask[16, 16]
+    assert mask.sum() == 16 * 16
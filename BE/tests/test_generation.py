@@ -0,0 +1,211 @@
+import io
+import asyncio
+import json
+import os
+import shutil
+import numpy as np
+import pytest
+from PIL import Image
+import main
+
+
+def test_asset_tasks_keep_last_prompt_per_file():
+    prompts = {
+        "characters": {"Hero (big)": "first hero", "hero big": "second hero"},
+        "ui": {"Start Button": "ui prompt"},
+        "ui_image": {"start button": "ui_image prompt"},
+    }
+
+    tasks = main.asset_tasks(prompts, "assets")
+
+    assert sorted((rel, prompt) for _, prompt, _, rel, _ in tasks) == [
+        ("characters/hero_big.png", "second hero"),
+        ("ui/start_button.png", "ui_image prompt"),
+    ]
+
+PLAN = {
+    "asset_prompts": {
+        "characters": {"hero": "a hero sprite"},
+        "backgrounds": {"arena": "a desert arena"},
+    },
+    "phaser_modules": {module: f"function {module}(scene) {{}}" for module in main.PHASER_MODULES},
+}
+
+
+class FakeGemini:
+    """Stands in for every Gemini call main.py makes and counts them"""
+
+    def __init__(self, title="Test Game"):
+        self.title = title
+        self.plan = json.loads(json.dumps(PLAN))
+        self.calls = {"blueprint": [], "plan": [], "image": []}
+
+    async def blueprint(self, prompt, use_cache=True, priority=None):
+        self.calls["blueprint"].append(use_cache)
+        return {"meta": {"title": self.title, "description": prompt}, "gameplay": {"genre": "Action"}}
+
+    async def production_plan(self, blueprint, use_cache=True, priority=None):
+        self.calls["plan"].append(use_cache)
+        return json.loads(json.dumps(self.plan))
+
+    async def image(self, prompt, output_path, priority=None):
+        self.calls["image"].append(os.path.basename(output_path))
+        Image.new("RGB", (64, 64), (len(self.calls["image"]) * 40 % 256, 80, 160)).save(output_path)
+
+
+@pytest.fixture
+def gemini(workdir, monkeypatch):
+    fake = FakeGemini()
+    fake.root = workdir
+    monkeypatch.setattr(main, "generate_game_blueprint_async", fake.blueprint)
+    monkeypatch.setattr(main, "generate_production_plan_async", fake.production_plan)
+    monkeypatch.setattr(main, "generate_image_async", fake.image)
+    return fake
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_same_prompt_twice_creates_a_second_game(gemini):
+    first = run(main.run_generation("gen-1", "a fighting game"))
+    with open(os.path.join(first, "production_plan.json"), "w", encoding="utf-8") as f:
+        json.dump({"edited": True}, f)
+
+    second = run(main.run_generation("gen-2", "a fighting game", use_cache=False))
+
+    assert os.path.basename(first) == "Test_Game"
+    assert os.path.basename(second) == "Test_Game_2"
+    with open(os.path.join(first, "production_plan.json"), encoding="utf-8") as f:
+        assert json.load(f) == {"edited": True}
+    assert gemini.calls["blueprint"] == [True, False]
+    assert gemini.calls["plan"] == [True, False]
+
+
+def colourful_image(path, seed):
+    """A real (non-placeholder) image, unique per seed"""
+    rng = np.random.default_rng(seed)
+    Image.fromarray(rng.integers(0, 255, (48, 48, 3), dtype=np.uint8)).save(path)
+
+
+def legacy_game(base, game_id="Old_Game"):
+    """A game made before checkpoints: blueprint, plan and images, but no checkpoint.json"""
+    folder = base / "games" / game_id
+    for rel in ("assets/characters", "assets/backgrounds", "phaser/assets/characters", "phaser/assets/backgrounds"):
+        (folder / rel).mkdir(parents=True)
+    (folder / "blueprint.json").write_text(json.dumps({"meta": {"title": "Old Game", "description": "old"}}))
+    (folder / "production_plan.json").write_text(json.dumps(PLAN))
+    for seed, rel in enumerate(("characters/hero.png", "backgrounds/arena.png")):
+        colourful_image(folder / "assets" / rel, seed)
+        shutil.copy2(folder / "assets" / rel, folder / "phaser" / "assets" / rel)
+    return folder
+
+
+def edit_in_phaser_assets(folder, rel="backgrounds/arena.png"):
+    """Edit an image the old way, in phaser/assets only, so the two asset folders differ"""
+    colourful_image(folder / "phaser" / "assets" / rel, 99)
+    return (folder / "phaser" / "assets" / rel).read_bytes()
+
+
+def same_pixels(path, data):
+    with Image.open(io.BytesIO(data)) as old, Image.open(path) as new:
+        return np.array_equal(np.asarray(old.convert("RGB")), np.asarray(new.convert("RGB")))
+
+
+def file_bytes(folder):
+    return {rel: (folder / "assets" / rel).read_bytes() for rel in ("characters/hero.png", "backgrounds/arena.png")}
+
+
+def test_resume_keeps_images_of_games_without_checkpoint(gemini):
+    folder = legacy_game(gemini.root)
+    before = file_bytes(folder)
+
+    run(main.run_resume_job({"id": "resume-1", "payload": {"game_id": folder.name}}))
+
+    assert gemini.calls["image"] == []
+    checkpoint = main.Checkpoint.load(str(folder))
+    for _, _, _, rel, digest in main.asset_tasks(PLAN["asset_prompts"], "assets"):
+        assert checkpoint.data["assets"][rel]["prompt_hash"] == digest
+    # Optimization may re-encode the files, but they still show the same pixels
+    for rel, data in before.items():
+        with Image.open(io.BytesIO(data)) as old, Image.open(folder / "assets" / rel) as new:
+            assert np.array_equal(np.asarray(old.convert("RGB")), np.asarray(new.convert("RGB")))
+    assert (folder / "phaser" / "index.html").exists()
+
+
+def test_first_regeneration_of_old_game_keeps_its_images(gemini):
+    folder = legacy_game(gemini.root)
+
+    run(main.run_regeneration("regen-1", str(folder)))
+
+    assert gemini.calls["image"] == []
+    assert set(main.Checkpoint.load(str(folder)).data["assets"]) == {"characters/hero.png", "backgrounds/arena.png"}
+
+
+def test_changed_prompt_regenerates_only_that_asset(gemini):
+    folder = legacy_game(gemini.root)
+    run(main.run_regeneration("regen-1", str(folder)))
+    plan = json.loads((folder / "production_plan.json").read_text())
+    plan["asset_prompts"]["backgrounds"]["arena"] = "a snowy arena"
+    (folder / "production_plan.json").write_text(json.dumps(plan))
+
+    run(main.run_regeneration("regen-2", str(folder)))
+
+    assert gemini.calls["image"] == ["arena.png"]
+
+
+def test_corrected_loader_frame_size_reaches_frame_manifest(gemini):
+    folder = legacy_game(gemini.root)
+    run(main.run_regeneration("regen-1", str(folder)))
+    plan = json.loads((folder / "production_plan.json").read_text())
+    plan["phaser_modules"]["loadAssets"] = (
+        "function loadAssets(scene) {\n"
+        "  scene.load.spritesheet('hero', 'assets/characters/hero.png', { frameWidth: 24, frameHeight: 48 });\n}")
+    (folder / "production_plan.json").write_text(json.dumps(plan))
+
+    run(main.run_regeneration("regen-2", str(folder)))
+
+    manifest = json.loads((folder / "frame_manifest.json").read_text())
+    assert manifest["sheets"]["assets/characters/hero.png"]["declared"] == [24, 48]
+    assert gemini.calls["image"] == []
+
+
+def test_phaser_steps_are_timed_separately(gemini):
+    run(main.run_generation("gen-metrics", "a timed game"))
+
+    text = main.metrics_registry.render()
+    for stage in ("phaser_publish", "phaser_modules", "phaser_templates", "phaser_frames", "phaser_atlas",
+                  "phaser_blobs"):
+        assert f'game_stage_duration_seconds_count{{stage="{stage}"}}' in text
+
+
+def test_asset_edit_keeps_older_edits_made_in_phaser_assets(gemini, monkeypatch):
+    folder = legacy_game(gemini.root)
+    edited = edit_in_phaser_assets(folder)
+
+    async def fake_edit(description, output_path, width, height, **kwargs):
+        colourful_image(output_path, 7)
+    monkeypatch.setattr(main, "generate_asset_image_async", fake_edit)
+
+    run(main.run_asset_edits("edit-1", folder.name, [
+        {"folder": "characters", "file": "hero.png", "description": "a red hero"}]))
+
+    for root in ("assets", "phaser/assets"):
+        assert (folder / root / "backgrounds" / "arena.png").read_bytes() == edited
+    assert main.Checkpoint.load(str(folder)).data["assets"]["backgrounds/arena.png"]["edited"] is True
+
+
+@pytest.mark.parametrize("pipeline", ["resume", "regenerate"])
+def test_first_run_on_old_game_keeps_edits_made_in_phaser_assets(gemini, pipeline):
+    folder = legacy_game(gemini.root)
+    edited = edit_in_phaser_assets(folder)
+
+    if pipeline == "resume":
+        run(main.run_resume_job({"id": "resume-1", "payload": {"game_id": folder.name}}))
+    else:
+        run(main.run_regeneration("regen-1", str(folder)))
+
+    assert gemini.calls["image"] == []
+    # Optimization may re-encode the adopted file, but it keeps the edited pixels
+    for root in ("assets", "phaser/assets"):
+        assert same_pixels(folder / root / "backgrounds" / "arena.png", edited)
@@ -0,0 +1,94 @@
+import itertools
+import pytest
+from services import jobs
+from services.jobs import JobQueue, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Strictly increasing timestamps, so jobs enqueued back to back keep their order
+    clock = itertools.count(1000)
+    monkeypatch.setattr(jobs.time, "time", lambda: float(next(clock)))
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_claim_runs_interactive_before_older_bulk_jobs(queue):
+    queue.enqueue("bulk-1", "generate", {})
+    queue.enqueue("bulk-2", "generate", {})
+    queue.enqueue("edit-1", "modify_asset", {"game_id": "g"}, priority=PRIORITY_INTERACTIVE)
+
+    claimed = [queue.claim()["id"] for _ in range(3)]
+
+    assert claimed == ["edit-1", "bulk-1", "bulk-2"]
+    assert queue.claim() is None
+
+
+def test_claim_marks_running_and_counts_attempts(queue):
+    queue.enqueue("a", "generate", {"prompt": "p"})
+
+    job = queue.claim()
+
+    assert job["status"] == "running"
+    assert job["attempts"] == 1
+    assert job["payload"] == {"prompt": "p"}
+    assert queue.counts() == {"running": 1}
+
+
+def test_claim_with_max_priority_skips_bulk_jobs(queue):
+    queue.enqueue("bulk", "generate", {})
+
+    assert queue.claim(max_priority=PRIORITY_INTERACTIVE) is None
+    queue.enqueue("edit", "modify_asset", {}, priority=PRIORITY_INTERACTIVE)
+    assert queue.claim(max_priority=PRIORITY_INTERACTIVE)["id"] == "edit"
+    assert queue.claim(max_priority=PRIORITY_BULK)["id"] == "bulk"
+
+
+def test_cancel_only_active_jobs(queue):
+    queue.enqueue("queued", "generate", {})
+    queue.enqueue("done", "generate", {})
+    queue.finish("done", "completed")
+
+    assert queue.cancel("queued") is True
+    assert queue.get("queued")["status"] == "cancelled"
+    assert queue.cancel("done") is False
+    assert queue.cancel("missing") is False
+    assert queue.claim() is None
+
+
+def test_retry_requeues_failed_and_cancelled_jobs(queue):
+    queue.enqueue("a", "generate", {})
+    queue.claim()
+    queue.finish("a", "failed", error="boom")
+
+    assert queue.retry("a") is True
+    job = queue.get("a")
+    assert job["status"] == "queued"
+    assert job["error"] is None and job["finished_at"] is None
+
+    assert queue.claim()["attempts"] == 2
+    assert queue.retry("a") is False
+
+
+def test_requeue_interrupted_puts_running_jobs_back(queue):
+    queue.enqueue("a", "generate", {})
+    queue.enqueue("b", "generate", {})
+    queue.claim()
+
+    assert queue.requeue_interrupted() == 1
+    assert queue.counts() == {"queued": 2}
+
+
+def test_finish_keeps_earlier_result(queue):
+    queue.enqueue("a", "generate", {})
+    queue.set_result("a", {"folder": "games/a"})
+
+    queue.finish("a", "failed", error="boom")
+
+    assert queue.get("a")["result"] == {"folder": "games/a"}
+
+
+def test_queue_survives_reopening(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    JobQueue(path).enqueue("a", "generate", {"prompt": "p"})
+
+    assert JobQueue(path).get("a")["payload"] == {"prompt": "p"}
@@ -0,0 +1,44 @@
+import pytest
+from services.metrics import Registry
+
+
+def test_histogram_time_observes_the_block():
+    registry = Registry()
+    histogram = registry.histogram("work_seconds", "Work", ("step",), buckets=(1, 10))
+
+    with histogram.time(step="a"):
+        pass
+    with pytest.raises(RuntimeError):
+        with histogram.time(step="b"):
+            raise RuntimeError("failed steps are timed too")
+
+    text = registry.render()
+    assert 'work_seconds_bucket{step="a",le="1"} 1' in text
+    assert 'work_seconds_count{step="b"} 1' in text
+
+
+def test_counter_and_histogram_rendering():
+    registry = Registry()
+    counter = registry.counter("calls_total", "Calls", ("call",))
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.5, 2))
+    counter.inc(call='say "hi"')
+    counter.inc(2, call='say "hi"')
+    for value in (0.1, 1, 5):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE calls_total counter" in lines
+    assert 'calls_total{call="say \\"hi\\""} 3' in lines
+    assert 'latency_seconds_bucket{le="0.5"} 1' in lines
+    assert 'latency_seconds_bucket{le="2"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 6.1" in lines
+
+
+def test_duplicate_names_are_rejected():
+    registry = Registry()
+    registry.counter("x_total", "X")
+
+    with pytest.raises(ValueError):
+        registry.histogram("x_total", "X")
@@ -0,0 +1,124 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance
+from services.phash import (PHASH_MAX_DISTANCE, PerceptualIndex, distances, find_prompt_match,
+                            near_duplicate_groups, perceptual_hash)
+
+
+def scene(shapes, size=(256, 256)):
+    """Deterministic test image: coloured shapes on a gradient"""
+    gradient = np.linspace(40, 200, size[0], dtype=np.uint8)
+    image = Image.fromarray(np.tile(gradient, (size[1], 1))).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for kind, box, colour in shapes:
+        (draw.ellipse if kind == "ellipse" else draw.rectangle)(box, fill=colour)
+    return image
+
+
+HERO = [("ellipse", (40, 40, 140, 200), (220, 40, 40)), ("rectangle", (160, 120, 230, 240), (30, 30, 160))]
+TREE = [("rectangle", (0, 0, 255, 90), (20, 120, 20)), ("ellipse", (100, 140, 250, 250), (250, 250, 90))]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def test_distances_match_popcount():
+    hashes = [0, 0xFFFF, 0x0F0F0F0F0F0F0F0F, 2 ** 64 - 1]
+
+    result = distances(hashes)
+
+    assert result.shape == (4, 4)
+    for i, a in enumerate(hashes):
+        for j, b in enumerate(hashes):
+            assert result[i, j] == hamming(a, b)
+
+
+def test_distances_between_lists_and_empty_input():
+    assert distances([0b1011], [0, 0b1]).tolist() == [[3, 2]]
+    assert distances([], [1, 2]).shape == (0, 2)
+
+
+def test_same_image_edited_slightly_is_near():
+    image = scene(HERO)
+    edited = ImageEnhance.Brightness(image).enhance(1.1).resize((200, 200), Image.Resampling.LANCZOS)
+
+    assert hamming(perceptual_hash(image), perceptual_hash(edited)) <= PHASH_MAX_DISTANCE
+
+
+def test_different_images_are_far():
+    assert hamming(perceptual_hash(scene(HERO)), perceptual_hash(scene(TREE))) > PHASH_MAX_DISTANCE
+
+
+def test_transparent_pixels_do_not_change_the_hash():
+    sprite = Image.new("RGBA", (128, 128), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).ellipse((20, 20, 100, 100), fill=(200, 50, 50, 255))
+    hidden_colour = sprite.copy()
+    pixels = np.array(hidden_colour)
+    pixels[pixels[..., 3] == 0] = (0, 255, 0, 0)
+
+    assert perceptual_hash(sprite) == perceptual_hash(Image.fromarray(pixels))
+
+
+def entry(phash, size=(64, 64)):
+    return {"phash": f"{phash:016x}", "size": list(size)}
+
+
+def test_near_duplicate_groups_join_transitively():
+    a = 0
+    b = a ^ 0b111  # 3 bits from a
+    c = b ^ 0b111000  # 3 bits from b, 6 from a
+    far = 2 ** 64 - 1
+    entries = [entry(a), entry(far), entry(b), entry(c)]
+
+    groups = near_duplicate_groups(entries, max_distance=3)
+
+    assert sorted(sorted(g) for g in groups) == [[0, 2, 3]]
+
+
+def test_near_duplicate_groups_need_matching_aspect_ratio():
+    entries = [entry(0, (64, 64)), entry(1, (128, 64)), entry(3, (66, 64))]
+
+    groups = near_duplicate_groups(entries, max_distance=4)
+
+    assert sorted(sorted(g) for g in groups) == [[0, 2]]
+
+
+def test_find_prompt_match_requires_same_prompt_folder_and_real_image():
+    entries = [
+        {"prompt_hash": "p", "ok": True, "flat": True, "file": "characters/a.png"},
+        {"prompt_hash": "p", "ok": True, "flat": False, "file": "ui/b.png"},
+        {"prompt_hash": "p", "ok": False, "flat": False, "file": "characters/c.png"},
+        {"prompt_hash": "p", "ok": True, "flat": False, "file": "characters/d.png"},
+    ]
+
+    assert find_prompt_match(entries, "p", "characters")["file"] == "characters/d.png"
+    assert find_prompt_match(entries, "q", "characters") is None
+
+
+def test_index_caches_hashes_by_content(tmp_path):
+    index = PerceptualIndex(str(tmp_path / "index.json"))
+    first, second = tmp_path / "a.png", tmp_path / "b.png"
+    scene(HERO).save(first)
+    scene(HERO).save(second)
+
+    a, b = index.lookup(str(first)), index.lookup(str(second))
+    index.save()
+
+    assert a["sha256"] == b["sha256"] and a["phash"] == b["phash"]
+    assert a["size"] == [256, 256] and a["flat"] is False
+    assert len(PerceptualIndex(index.path)._load()["hashes"]) == 1
+
+
+def test_index_scan_reads_checkpoint_prompts(tmp_path):
+    assets = tmp_path / "games" / "g1" / "assets" / "characters"
+    assets.mkdir(parents=True)
+    scene(HERO).save(assets / "hero.png")
+    scene(TREE).save(assets / "hero.png.tmp.png")
+    (tmp_path / "games" / "g1" / "checkpoint.json").write_text(
+        '{"assets": {"characters/hero.png": {"prompt_hash": "p", "ok": true}}}')
+    index = PerceptualIndex(str(tmp_path / "index.json"))
+
+    entries = index.scan(str(tmp_path / "games"))
+
+    assert [(e["game"], e["file"], e["prompt_hash"], e["ok"]) for e in entries] == [
+        ("g1", "characters/hero.png", "p", True)]
@@ -0,0 +1,42 @@
+from services.progress import ProgressStore
+
+
+def test_cap_drops_least_recently_updated():
+    store = ProgressStore(ttl=60, max_entries=2)
+    store["a"] = {"timestamp": 1}
+    store["b"] = {"timestamp": 2}
+    store["a"] = {"timestamp": 3}  # a is now the newest
+
+    store["c"] = {"timestamp": 4}
+
+    assert list(store) == ["a", "c"]
+
+
+def test_expire_removes_only_entries_past_ttl():
+    store = ProgressStore(ttl=10, max_entries=100)
+    store["old"] = {"timestamp": 100}
+    store["older_but_updated"] = {"timestamp": 95}
+    store["older_but_updated"] = {"timestamp": 105}
+    store["new"] = {"timestamp": 108}
+
+    assert store.expire(now=112) == 1
+    assert list(store) == ["older_but_updated", "new"]
+    assert store.expire(now=112) == 0
+
+
+def test_expire_stops_at_first_live_entry():
+    store = ProgressStore(ttl=10, max_entries=100)
+    store["live"] = {"timestamp": 100}
+    # Out-of-order timestamp behind a live entry is left for a later sweep
+    store["stale"] = {"timestamp": 0}
+
+    assert store.expire(now=105) == 0
+    assert len(store) == 2
+
+
+def test_entries_without_timestamp_expire():
+    store = ProgressStore(ttl=10, max_entries=100)
+    store["bare"] = {"status": "running"}
+
+    assert store.expire(now=50) == 1
+    assert not store
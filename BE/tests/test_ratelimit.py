@@ -0,0 +1,58 @@
+import time
+import threading
+from services.jobs import PRIORITY_BULK, PRIORITY_INTERACTIVE
+from services.ratelimit import PriorityTokenBucket, call_priority, current_priority
+
+
+def test_burst_is_available_at_once():
+    bucket = PriorityTokenBucket("test", rate_per_minute=60, burst=3)
+
+    waits = [bucket.acquire() for _ in range(3)]
+
+    assert max(waits) < 0.05
+    assert bucket.stats()["acquired"] == 3
+
+
+def test_zero_rate_disables_limiting():
+    bucket = PriorityTokenBucket("test", rate_per_minute=0)
+
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+
+
+def test_waits_for_refill():
+    bucket = PriorityTokenBucket("test", rate_per_minute=1200, burst=1)  # one token per 50 ms
+    bucket.acquire()
+
+    assert bucket.acquire() >= 0.03
+
+
+def test_interactive_caller_overtakes_waiting_bulk_caller():
+    bucket = PriorityTokenBucket("test", rate_per_minute=600, burst=1)  # one token per 100 ms
+    bucket.acquire()
+    order = []
+
+    def take(name, priority):
+        bucket.acquire(priority)
+        order.append(name)
+
+    bulk = threading.Thread(target=take, args=("bulk", PRIORITY_BULK))
+    bulk.start()
+    while not bucket.stats()["waiting"]:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=take, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    bulk.join(2)
+    interactive.join(2)
+
+    assert order == ["interactive", "bulk"]
+    assert bucket.stats()["waiting"] == 0
+
+
+def test_call_priority_is_scoped_to_the_block():
+    assert current_priority() == PRIORITY_BULK
+    with call_priority(PRIORITY_INTERACTIVE):
+        assert current_priority() == PRIORITY_INTERACTIVE
+        with call_priority(PRIORITY_BULK):
+            assert current_priority() == PRIORITY_BULK
+        assert current_priority() == PRIORITY_INTERACTIVE
+    assert current_priority() == PRIORITY_BULK
@@ -0,0 +1,96 @@
+import gzip
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from services import static
+from services.static import serve_file, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+
+SCRIPT = b"function loadAssets(scene) {}\n" * 200
+IMAGE = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Only gzip, so the test does not depend on brotli being installed
+    monkeypatch.setattr(static, "brotli", None)
+    (tmp_path / "loadAssets.js").write_bytes(SCRIPT)
+    (tmp_path / "hero.png").write_bytes(IMAGE)
+    app = FastAPI()
+
+    @app.api_route("/files/{name}", methods=["GET", "HEAD"])
+    def serve(name: str, request: Request):
+        return serve_file(request, str(tmp_path / name))
+
+    return TestClient(app)
+
+
+def test_etag_and_conditional_get(client):
+    first = client.get("/files/hero.png")
+    etag = first.headers["etag"]
+
+    again = client.get("/files/hero.png", headers={"If-None-Match": etag})
+    by_date = client.get("/files/hero.png", headers={"If-Modified-Since": first.headers["last-modified"]})
+    stale = client.get("/files/hero.png", headers={"If-None-Match": '"other"'})
+
+    assert first.status_code == 200 and first.content == IMAGE
+    assert first.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert again.status_code == 304 and again.content == b""
+    assert by_date.status_code == 304
+    assert stale.status_code == 200
+
+
+def test_etag_changes_with_content(client, tmp_path):
+    before = client.get("/files/hero.png").headers["etag"]
+    (tmp_path / "hero.png").write_bytes(IMAGE[::-1] + b"x")
+
+    after = client.get("/files/hero.png", headers={"If-None-Match": before})
+
+    assert after.status_code == 200
+    assert after.headers["etag"] != before
+
+
+def test_text_files_are_gzipped_with_their_own_etag(client):
+    plain = client.get("/files/loadAssets.js", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/files/loadAssets.js", headers={"Accept-Encoding": "gzip"})
+
+    assert plain.headers.get("content-encoding") is None
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.content == SCRIPT  # the client decodes it
+    assert int(zipped.headers["content-length"]) == len(gzip.compress(SCRIPT, compresslevel=9, mtime=0))
+    assert zipped.headers["etag"] != plain.headers["etag"]
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    assert client.get("/files/loadAssets.js", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]}).status_code == 304
+
+
+def test_images_are_not_compressed(client):
+    response = client.get("/files/hero.png", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers.get("content-encoding") is None
+    assert "vary" not in response.headers
+
+
+def test_range_requests_return_partial_content(client):
+    response = client.get("/files/loadAssets.js", headers={"Range": "bytes=0-9", "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 206
+    assert response.content == SCRIPT[:10]
+    assert response.headers.get("content-encoding") is None
+
+
+def test_version_query_pins_the_url(client):
+    etag = client.get("/files/hero.png").headers["etag"].strip('"')
+
+    pinned = client.get("/files/hero.png", params={"v": etag[:16]})
+    wrong = client.get("/files/hero.png", params={"v": "0" * 16})
+
+    assert pinned.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert wrong.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_head_sends_headers_only(client):
+    response = client.head("/files/loadAssets.js", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert int(response.headers["content-length"]) == len(SCRIPT)
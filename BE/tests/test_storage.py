@@ -0,0 +1,84 @@
+import os
+import pytest
+from services.storage import publish_assets, adopt_published_assets
+
+
+@pytest.fixture
+def assets(tmp_path):
+    src = tmp_path / "assets"
+    (src / "characters").mkdir(parents=True)
+    (src / "characters" / "hero.png").write_bytes(b"hero")
+    (src / "ui").mkdir()
+    (src / "ui" / "button.png").write_bytes(b"button")
+    return src, tmp_path / "phaser" / "assets"
+
+
+def test_hardlink_mode_links_every_file(assets):
+    src, dst = assets
+
+    stats = publish_assets(str(src), str(dst), mode="hardlink")
+
+    assert stats == {"published": 2, "unchanged": 0, "removed": 0}
+    assert os.path.samefile(src / "characters" / "hero.png", dst / "characters" / "hero.png")
+
+
+def test_second_publish_touches_nothing(assets):
+    src, dst = assets
+    publish_assets(str(src), str(dst), mode="copy")
+
+    assert publish_assets(str(src), str(dst), mode="copy") == {"published": 0, "unchanged": 2, "removed": 0}
+
+
+def test_changed_and_deleted_files_are_mirrored(assets):
+    src, dst = assets
+    publish_assets(str(src), str(dst), mode="copy")
+    os.remove(src / "ui" / "button.png")
+    (src / "characters" / "hero.png").write_bytes(b"new hero, longer")
+
+    stats = publish_assets(str(src), str(dst), mode="copy")
+
+    assert stats == {"published": 1, "unchanged": 0, "removed": 1}
+    assert (dst / "characters" / "hero.png").read_bytes() == b"new hero, longer"
+    assert not (dst / "ui" / "button.png").exists()
+
+
+def test_replacing_a_hardlinked_file_does_not_write_through(assets):
+    src, dst = assets
+    publish_assets(str(src), str(dst), mode="hardlink")
+    shared = os.stat(src / "characters" / "hero.png").st_ino
+    (src / "characters" / "new.png").write_bytes(b"other")
+    os.replace(src / "characters" / "new.png", src / "characters" / "hero.png")
+
+    publish_assets(str(src), str(dst), mode="hardlink")
+
+    assert (dst / "characters" / "hero.png").read_bytes() == b"other"
+    assert os.stat(dst / "characters" / "hero.png").st_ino != shared
+
+
+def test_symlink_mode_points_at_source(assets):
+    src, dst = assets
+    publish_assets(str(src), str(dst), mode="copy")
+
+    stats = publish_assets(str(src), str(dst), mode="symlink")
+
+    assert stats["published"] == 1
+    assert os.path.islink(dst)
+    assert (dst / "ui" / "button.png").read_bytes() == b"button"
+    assert publish_assets(str(src), str(dst), mode="symlink")["published"] == 0
+    # Switching back replaces the link with real files
+    publish_assets(str(src), str(dst), mode="copy")
+    assert not os.path.islink(dst) and (dst / "ui" / "button.png").exists()
+
+
+def test_files_edited_in_published_copy_are_adopted(assets):
+    src, dst = assets
+    publish_assets(str(src), str(dst), mode="copy")
+    (dst / "characters" / "hero.png").write_bytes(b"hero edited in phaser")
+    (dst / "ui" / "extra.png").write_bytes(b"extra")
+
+    adopted = adopt_published_assets(str(src), str(dst))
+
+    assert adopted == ["characters/hero.png", "ui/extra.png"]
+    assert (src / "characters" / "hero.png").read_bytes() == b"hero edited in phaser"
+    assert (src / "ui" / "extra.png").read_bytes() == b"extra"
+    assert adopt_published_assets(str(src), str(dst)) == []
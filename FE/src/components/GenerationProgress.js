@@ -17,59 +17,92 @@ export default function GenerationProgress({ requestId, onComplete, onError }) {
       progress_percent: 0
     });
 
+    let finished = false;
+    let source = null;
+    let pollTimer = null;
+
+    // Returns true once generation has completed or failed
+    const handleProgress = (data) => {
+      setProgress(data);
+      setProgressPercent(data.progress_percent || 0);
+      setCurrentStep(data.message || '');
+
+      // Track completed steps
+      if (data.status === 'completed' && data.step !== 'complete') {
+        setCompletedSteps(prev => {
+          if (!prev.includes(data.message)) {
+            return [...prev, data.message];
+          }
+          return prev;
+        });
+      }
+
+      // Check if generation is complete
+      if (data.step === 'complete' && data.status === 'completed') {
+        console.log("🎉 Generation completed!");
+        onComplete && onComplete(data);
+        return true;
+      }
+
+      // Check for errors
+      if (data.status === 'error') {
+        console.error("❌ Generation error:", data.message);
+        onError && onError(data.message);
+        return true;
+      }
+      return false;
+    };
+
+    // Fallback when the event stream is unavailable
     const pollProgress = async () => {
+      if (finished) return;
       try {
-        console.log("🔄 Polling progress for:", requestId);
         const response = await fetch(`http://localhost:8000/progress/${requestId}`);
         const data = await response.json();
-        
-        console.log("📊 Progress data:", data);
-        
+
         if (data.status === 'not_found') {
-          console.log("❌ Progress not found, retrying...");
           // Retry after a short delay
-          setTimeout(pollProgress, 1000);
-          return;
-        }
-
-        setProgress(data);
-        setProgressPercent(data.progress_percent || 0);
-        setCurrentStep(data.message || '');
-
-        // Track completed steps
-        if (data.status === 'completed' && data.step !== 'complete') {
-          setCompletedSteps(prev => {
-            if (!prev.includes(data.message)) {
-              return [...prev, data.message];
-            }
-            return prev;
-          });
-        }
-
-        // Check if generation is complete
-        if (data.step === 'complete' && data.status === 'completed') {
-          console.log("🎉 Generation completed!");
-          onComplete && onComplete(data);
+          pollTimer = setTimeout(pollProgress, 1000);
           return;
         }
-
-        // Check for errors
-        if (data.status === 'error') {
-          console.error("❌ Generation error:", data.message);
-          onError && onError(data.message);
+        if (handleProgress(data)) {
+          finished = true;
           return;
         }
 
         // Continue polling
-        setTimeout(pollProgress, 1000);
+        pollTimer = setTimeout(pollProgress, 1000);
       } catch (error) {
         console.error('Error polling progress:', error);
         // Retry after 2 seconds on error
-        setTimeout(pollProgress, 2000);
+        pollTimer = setTimeout(pollProgress, 2000);
       }
     };
 
-    pollProgress();
+    if (window.EventSource) {
+      // Server pushes every progress update as it happens
+      source = new EventSource(`http://localhost:8000/progress/${requestId}/stream`);
+      source.onmessage = (event) => {
+        if (handleProgress(JSON.parse(event.data))) {
+          finished = true;
+          source.close();
+        }
+      };
+      source.onerror = () => {
+        if (finished) return;
+        console.warn("⚠️ Progress stream lost, falling back to polling");
+        source.close();
+        pollProgress();
+      };
+    } else {
+      pollProgress();
+    }
+
+    return () => {
+      finished = true;
+      if (source) source.close();
+      clearTimeout(pollTimer);
+    };
   }, [requestId, onComplete, onError]);
 
   if (!progress) {
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 
 export default function ModifyGameModal({ gameId, onClose }) {
   const [folders, setFolders] = useState([]);
@@ -6,6 +6,16 @@ export default function ModifyGameModal({ gameId, onClose }) {
   const [description, setDescription] = useState('');
   const [status, setStatus] = useState('');
   const [loading, setLoading] = useState(false);
+  // Open event stream / poll timer for the running edit job
+  const watcher = useRef({ source: null, timer: null });
+
+  const stopWatching = () => {
+    if (watcher.current.source) watcher.current.source.close();
+    if (watcher.current.timer) clearTimeout(watcher.current.timer);
+    watcher.current = { source: null, timer: null };
+  };
+
+  useEffect(() => stopWatching, []);
 
   // Fetch asset folders from backend
   useEffect(() => {
@@ -33,18 +43,60 @@ export default function ModifyGameModal({ gameId, onClose }) {
         body: JSON.stringify({ folder: selectedFolder, description }),
       });
       const data = await res.json();
-      if (res.ok) {
-        setStatus('✅ Asset replaced! Please reload the game to see changes.');
-      } else {
+      if (!res.ok) {
         setStatus('❌ ' + (data.detail || 'Failed to modify asset.'));
+        setLoading(false);
+        return;
       }
+      setStatus('⏳ Waiting in queue...');
+      watchEdit(data.request_id);
     } catch (err) {
       setStatus('❌ Error: ' + err.message);
-    } finally {
       setLoading(false);
     }
   };
 
+  // Follow the edit job on the progress stream (polling if streams are unavailable)
+  const watchEdit = (requestId) => {
+    stopWatching();
+    // Returns true once the job has finished
+    const handleProgress = (progress) => {
+      if (progress.step === 'complete' && progress.status === 'completed') {
+        setStatus('✅ ' + progress.message);
+      } else if (progress.status === 'error') {
+        setStatus('❌ ' + (progress.message || 'Failed to modify asset.'));
+      } else {
+        if (progress.message) setStatus('⏳ ' + progress.message);
+        return false;
+      }
+      stopWatching();
+      setLoading(false);
+      return true;
+    };
+    const poll = async () => {
+      try {
+        const res = await fetch(`http://localhost:8000/progress/${requestId}`);
+        if (handleProgress(await res.json())) return;
+      } catch (err) {
+        console.error('Error polling edit progress:', err);
+      }
+      watcher.current.timer = setTimeout(poll, 1000);
+    };
+    if (!window.EventSource) {
+      poll();
+      return;
+    }
+    const source = new EventSource(`http://localhost:8000/progress/${requestId}/stream`);
+    watcher.current.source = source;
+    source.onmessage = (event) => handleProgress(JSON.parse(event.data));
+    source.onerror = () => {
+      if (watcher.current.source !== source) return;
+      source.close();
+      watcher.current.source = null;
+      poll();
+    };
+  };
+
   return (
     <div className="fixed inset-0 bg-black bg-opacity-40 flex items-center justify-center z-50">
       <div className="bg-white rounded-lg shadow-lg p-8 w-full max-w-md relative">
@@ -49,55 +49,84 @@ export default function PromptForm({ setGames }) {
       const requestId = data.request_id;
       console.log("🆔 Got request ID:", requestId);
       
-      // Poll for completion
+      const handleCompleted = () => {
+        // Generation completed!
+        console.log("🎉 Generation completed!");
+        
+        // Create a basic game object for the success modal
+        const newGame = {
+          id: 'game_' + Date.now(),
+          title: prompt.length > 30 ? prompt.substring(0, 30) + "..." : prompt,
+          genre: 'Action',
+          description: prompt,
+          thumbnail: '/assets/placeholder.png',
+        };
+        
+        setGeneratedGame(newGame);
+        setLoading(false);
+        
+        // Show success modal
+        setCompletedSteps([
+          "Game blueprint generated",
+          "Production plan created", 
+          "Assets generated",
+          "Phaser files created",
+          "Game ready to play!"
+        ]);
+        setShowSuccess(true);
+      };
+
+      const handleFailed = (message) => {
+        console.error("❌ Generation error:", message);
+        alert(`Generation failed: ${message}`);
+        setLoading(false);
+      };
+
+      // Poll for completion (fallback when the event stream is unavailable)
       const pollForCompletion = async () => {
         try {
           const progressRes = await fetch(`http://localhost:8000/progress/${requestId}`);
           const progressData = await progressRes.json();
           
-          console.log("📊 Progress data:", progressData);
-          
           if (progressData.status === 'completed' && progressData.step === 'complete') {
-            // Generation completed!
-            console.log("🎉 Generation completed!");
-            
-            // Create a basic game object for the success modal
-            const newGame = {
-              id: 'game_' + Date.now(),
-              title: prompt.length > 30 ? prompt.substring(0, 30) + "..." : prompt,
-              genre: 'Action',
-              description: prompt,
-              thumbnail: '/assets/placeholder.png',
-            };
-            
-            setGeneratedGame(newGame);
-            setLoading(false);
-            
-            // Show success modal
-            setCompletedSteps([
-              "Game blueprint generated",
-              "Production plan created", 
-              "Assets generated",
-              "Phaser files created",
-              "Game ready to play!"
-            ]);
-            setShowSuccess(true);
+            handleCompleted();
             return;
           } else if (progressData.status === 'error') {
-            throw new Error(progressData.message || 'Generation failed');
+            handleFailed(progressData.message || 'Generation failed');
+            return;
           }
           
           // Continue polling
           setTimeout(pollForCompletion, 2000);
         } catch (error) {
-          console.error("❌ Polling error:", error);
-          alert(`Generation failed: ${error.message}`);
-          setLoading(false);
+          handleFailed(error.message);
         }
       };
       
-      // Start polling
-      pollForCompletion();
+      // Wait for completion via the progress event stream
+      if (window.EventSource) {
+        const source = new EventSource(`http://localhost:8000/progress/${requestId}/stream`);
+        let finished = false;
+        source.onmessage = (event) => {
+          const progressData = JSON.parse(event.data);
+          if (progressData.status === 'completed' && progressData.step === 'complete') {
+            finished = true;
+            source.close();
+            handleCompleted();
+          } else if (progressData.status === 'error') {
+            finished = true;
+            source.close();
+            handleFailed(progressData.message || 'Generation failed');
+          }
+        };
+        source.onerror = () => {
+          if (finished) return;
+          source.close();
+          pollForCompletion();
+        };
+      } else {
+        pollForCompletion();
+      }
       
     } catch (err) {
       console.error("❌ Detailed Error:", err);